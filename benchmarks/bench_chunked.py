@@ -0,0 +1,64 @@
+# ---------------------------
+# Real-time factor of single-stream vs parallel chunked transcription.
+#
+# RTF = wall time / audio duration, so lower is better and < 1 is faster than
+# real time. Model loading is excluded: each path is warmed up first.
+#
+#   python benchmarks/bench_chunked.py [audio] [--repeat 30] [--size medium] [--workers 2 4]
+import argparse
+
+import numpy as np
+
+from common import FIXTURE_VOCALS, timed, write_report
+
+def drain(info_and_segments):
+    _, segments = info_and_segments
+    return [segment for segment, _ in segments]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("audio", nargs="?", default=FIXTURE_VOCALS)
+    parser.add_argument("--repeat", type=int, default=30, help="Tile the clip to simulate a long track")
+    parser.add_argument("--size", default="medium")
+    parser.add_argument("--language", default=None)
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4])
+    parser.add_argument("--window", type=float, default=120)
+    parser.add_argument("--overlap", type=float, default=10)
+    parser.add_argument("--json", default=None)
+    args = parser.parse_args()
+
+    import chunked
+    from transcriber import transcribe_single
+
+    audio = np.tile(chunked.decode_audio(args.audio), args.repeat)
+    duration = len(audio) / chunked.SAMPLE_RATE
+    options = {"language": args.language} if args.language else {}
+    warmup = audio[: chunked.SAMPLE_RATE * 5]
+
+    results = {"audio": args.audio, "duration_s": round(duration, 1), "size": args.size, "runs": []}
+
+    drain(transcribe_single(warmup, args.size, **options))
+    segments, elapsed = timed(lambda: drain(transcribe_single(audio, args.size, **options)))
+    results["runs"].append({
+        "mode": "single", "workers": 1, "wall_s": round(elapsed, 2),
+        "rtf": round(elapsed / duration, 3), "segments": len(segments),
+    })
+
+    for workers in args.workers:
+        # Warm the pool so every worker process has loaded its model
+        drain(chunked.transcribe_chunked(
+            np.tile(warmup, int(args.window) // 5 * workers), args.size, workers=workers,
+            window=args.window, overlap=args.overlap, **options,
+        ))
+        segments, elapsed = timed(lambda: drain(chunked.transcribe_chunked(
+            audio, args.size, workers=workers, window=args.window, overlap=args.overlap, **options,
+        )))
+        results["runs"].append({
+            "mode": "chunked", "workers": workers, "wall_s": round(elapsed, 2),
+            "rtf": round(elapsed / duration, 3), "segments": len(segments),
+        })
+
+    single = results["runs"][0]["wall_s"]
+    for run in results["runs"]:
+        run["speedup"] = round(single / run["wall_s"], 2) if run["wall_s"] else None
+    write_report("chunked_transcription", results, args.json)
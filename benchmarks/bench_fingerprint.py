@@ -0,0 +1,148 @@
+# ---------------------------
+# Fingerprint lookup latency and accuracy against a large index.
+#
+# Indexes --real synthetic songs (a seeded melody, chords and percussion
+# each) plus filler songs with random peak-pair hashes drawn from the same
+# frequency distribution, up to --songs in total, in an SQLite index on disk
+# (fingerprint.py). Then queries it with re-encodings of the real songs
+# (gain and noise, a 22.05 kHz round trip, a 20 ms shift as from an
+# encoder's delay, and MP3 at --bitrates when ffmpeg is installed) and with
+# songs that were never indexed. Reports the time to build the index, the
+# fingerprinting and lookup latency per query (p50/p95), the share of
+# re-encodings matched to the right song and the false matches.
+#
+#   python benchmarks/bench_fingerprint.py --songs 20000
+#   python benchmarks/bench_fingerprint.py --songs 50000 --real 30 --bitrates 64 128 320
+import os
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+import numpy as np
+
+from common import timed, write_report
+
+SAMPLE_RATE = 44100
+
+def song(seconds, rng):
+    """A stereo song with its own tempo, melody, chords and hi-hat pattern."""
+    n = int(seconds * SAMPLE_RATE)
+    t = np.arange(n) / SAMPLE_RATE
+    beat = rng.uniform(0.35, 0.6)
+    out = np.zeros(n)
+    # A new melody note on every beat, a new chord every four
+    for i, start in enumerate(np.arange(0, seconds, beat)):
+        a, b = int(start * SAMPLE_RATE), min(n, int((start + beat) * SAMPLE_RATE))
+        env = np.exp(-np.arange(b - a) / SAMPLE_RATE * rng.uniform(2, 8))
+        note = 220 * 2 ** (rng.integers(0, 24) / 12)
+        out[a:b] += 0.3 * np.sin(2 * np.pi * note * t[a:b]) * env
+        if i % 4 == 0:
+            root = 110 * 2 ** (rng.integers(0, 12) / 12)
+            c = min(n, int((start + 4 * beat) * SAMPLE_RATE))
+            for ratio in (1, 1.26, 1.5):
+                out[a:c] += 0.1 * np.sin(2 * np.pi * root * ratio * t[a:c])
+        if rng.random() < 0.7:
+            hat = min(b, a + 2000)
+            out[a:hat] += 0.05 * rng.standard_normal(hat - a)
+    return np.stack([out, np.roll(out, 40)], axis=1).astype(np.float32) / np.abs(out).max()
+
+def reencodings(waveform, rng, bitrates, tmp):
+    """{name: waveform} of the same song as another upload would decode it."""
+    from audio import resample
+    yield "gain_noise", 0.7 * waveform + 0.005 * rng.standard_normal(waveform.shape).astype(np.float32)
+    yield "resampled_22k", np.stack([resample(resample(waveform[:, c], SAMPLE_RATE, 22050), 22050, SAMPLE_RATE)
+                                     for c in range(waveform.shape[1])], axis=1)
+    yield "shifted_20ms", np.concatenate([np.zeros((882, waveform.shape[1]), np.float32), waveform])
+    if not bitrates or not shutil.which("ffmpeg"):
+        return
+    from audio import write_wav, read_wav
+    wav = os.path.join(tmp, "query.wav")
+    write_wav(wav, waveform, SAMPLE_RATE)
+    for kbps in bitrates:
+        mp3, back = os.path.join(tmp, "query.mp3"), os.path.join(tmp, "decoded.wav")
+        subprocess.run(["ffmpeg", "-nostdin", "-v", "error", "-y", "-i", wav, "-b:a", f"{kbps}k", mp3], check=True)
+        subprocess.run(["ffmpeg", "-nostdin", "-v", "error", "-y", "-i", mp3, "-ar", str(SAMPLE_RATE), back],
+                       check=True)
+        yield f"mp3_{kbps}k", read_wav(back)[0]
+
+def filler(index, count, n_hashes, bin_weights, rng, batch=500):
+    """Adds count songs of random hashes whose peak bins follow bin_weights."""
+    import fingerprint
+    frames = int(fingerprint.SECONDS * fingerprint.RATE / fingerprint.HOP)
+
+    def songs(first, last):
+        for i in range(first, last):
+            f1, f2 = rng.choice(512, size=(2, n_hashes), p=bin_weights)
+            hashes = f1 << 15 | f2 << 6 | rng.integers(1, fingerprint.MAX_DT + 1, n_hashes)
+            yield f"filler-{i}", hashes, rng.integers(0, frames, n_hashes), rng.uniform(120, 360)
+
+    for first in range(0, count, batch):
+        index.add_songs(songs(first, min(count, first + batch)))
+
+def percentiles(values):
+    values = np.asarray(values) * 1000
+    return {"p50_ms": round(float(np.percentile(values, 50)), 2), "p95_ms": round(float(np.percentile(values, 95)), 2),
+            "max_ms": round(float(values.max()), 2)}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--songs", type=int, default=20000, help="Songs in the index, filler included")
+    parser.add_argument("--real", type=int, default=20, help="Synthetic songs indexed and queried")
+    parser.add_argument("--unknown", type=int, default=20, help="Queries of songs that are not indexed")
+    parser.add_argument("--seconds", type=float, default=40)
+    parser.add_argument("--bitrates", type=int, nargs="*", default=[128], help="MP3 bitrates (needs ffmpeg)")
+    parser.add_argument("--json", default=None)
+    args = parser.parse_args()
+
+    import fingerprint
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        index = fingerprint.FingerprintIndex(os.path.join(tmp, "fingerprints.sqlite"))
+        songs = [song(args.seconds, np.random.default_rng(1000 + i)) for i in range(args.real)]
+        prints = [fingerprint.fingerprint(waveform, SAMPLE_RATE) for waveform in songs]
+        bins = np.concatenate([hashes >> 15 for hashes, _ in prints])
+        weights = np.bincount(bins, minlength=512)[:512] + 1.0
+        n_hashes = int(np.mean([len(hashes) for hashes, _ in prints]))
+
+        started = time.perf_counter()
+        for i, (hashes, offsets) in enumerate(prints):
+            index.add_song(f"song-{i}", hashes, offsets, args.seconds)
+        filler(index, max(0, args.songs - args.real), n_hashes, weights / weights.sum(), rng)
+        build_s = time.perf_counter() - started
+
+        fingerprint_times, lookup_times, variants = [], [], {}
+        for i, waveform in enumerate(songs):
+            for name, encoded in reencodings(waveform, rng, args.bitrates, tmp):
+                (hashes, offsets), fp_s = timed(fingerprint.fingerprint, encoded, SAMPLE_RATE)
+                match, lookup_s = timed(index.match, hashes, offsets, len(encoded) / SAMPLE_RATE)
+                fingerprint_times.append(fp_s)
+                lookup_times.append(lookup_s)
+                stats = variants.setdefault(name, {"queries": 0, "matched": 0, "wrong": 0, "ratios": []})
+                stats["queries"] += 1
+                if match and match.key == f"song-{i}":
+                    stats["matched"] += 1
+                    stats["ratios"].append(match.ratio)
+                elif match:
+                    stats["wrong"] += 1
+        false_matches = 0
+        for i in range(args.unknown):
+            waveform = song(args.seconds, np.random.default_rng(5000 + i))
+            (hashes, offsets), fp_s = timed(fingerprint.fingerprint, waveform, SAMPLE_RATE)
+            match, lookup_s = timed(index.match, hashes, offsets, args.seconds)
+            fingerprint_times.append(fp_s)
+            lookup_times.append(lookup_s)
+            false_matches += match is not None
+        db_mb = sum(os.path.getsize(os.path.join(tmp, name)) for name in os.listdir(tmp)
+                    if name.startswith("fingerprints")) / 2 ** 20
+
+    for stats in variants.values():
+        ratios = stats.pop("ratios")
+        stats["hit_rate"] = round(stats["matched"] / stats["queries"], 3)
+        stats["median_ratio"] = round(float(np.median(ratios)), 3) if ratios else None
+    write_report("fingerprint", {
+        "songs": max(args.songs, args.real), "hashes_per_song": n_hashes, "index_mb": round(db_mb, 1),
+        "build_s": round(build_s, 2), "fingerprint": percentiles(fingerprint_times), "lookup": percentiles(lookup_times),
+        "reencodings": variants, "unknown_queries": args.unknown, "false_matches": false_matches,
+    }, args.json)
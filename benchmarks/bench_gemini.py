@@ -0,0 +1,121 @@
+# ---------------------------
+# Throughput and latency of the LLM cleanup step, offline.
+#
+# Runs gemini.py against its LocalBackend (a sleep proportional to the
+# lyrics it has to rewrite, like a remote call), comparing one whole-song
+# prompt per song, as hindiapi used to send, with verse chunks sent
+# concurrently. The chunked
+# path is run with a cold and a warm response cache, and optionally with
+# injected failures to exercise the retries and blocked responses, which
+# are not retried. First checks that a song with one blocked chunk keeps
+# that chunk's raw text and still has the others cleaned.
+#
+#   python benchmarks/bench_gemini.py [--songs 8] [--latency 0.5] [--failure-rate 0.1] [--blocked-rate 0.05]
+import time
+import random
+import argparse
+import tempfile
+import statistics
+
+from common import timed, write_report
+from bench_romanize import make_vocabulary, make_line
+
+def make_song(rng, vocabulary, seconds_per_line=3.5, pause_s=3.0):
+    """Timestamped transcript: verse, chorus, verse, chorus, chorus with a pause between parts."""
+    chorus = [make_line(rng, vocabulary) for _ in range(4)]
+    lines, t = [], 0.0
+    for part in ("verse", "chorus", "verse", "chorus", "chorus"):
+        for line in chorus if part == "chorus" else [make_line(rng, vocabulary) for _ in range(6)]:
+            lines.append(f"[{t:.2f}-{t + seconds_per_line:.2f}] {line}")
+            t += seconds_per_line
+        t += pause_s
+    return "\n".join(lines)
+
+def check_blocked_chunk(text):
+    """Cleans text with its first chunk blocked; returns the stats, raising if any other chunk is lost."""
+    import gemini
+
+    class FirstChunkBlocked(gemini.LocalBackend):
+        def generate(self, prompt):
+            if first in prompt:
+                raise ValueError("blocked")
+            return super().generate(prompt)
+
+    chunks = gemini.chunk_verses(text)
+    first = chunks[0]
+    backend = FirstChunkBlocked(latency_s=0.0, per_char_s=0.0)
+    stats = {}
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cleaned = gemini.asyncio.run(gemini.clean_chunks_async(
+            chunks, backend, gemini.ResponseCache(cache_dir), requests_per_minute=0, stats=stats))
+    assert cleaned[0] is None and all(cleaned[1:]), "a blocked chunk must not fail the others"
+    assert stats["requests"] == len(chunks) - 1 and stats["failed"] == 1 and not stats["retries"], stats
+    return dict(stats, chunks=len(chunks))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--songs", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.5, help="Fixed seconds per request")
+    parser.add_argument("--per-char", type=float, default=0.004, help="Extra seconds per character of lyrics")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--blocked-rate", type=float, default=0.0, help="Share of responses blocked")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--rpm", type=float, default=600)
+    parser.add_argument("--json", default=None)
+    args = parser.parse_args()
+
+    import gemini
+
+    rng = random.Random(0)
+    vocabulary = make_vocabulary(rng, 3000)
+    songs = [make_song(rng, vocabulary) for _ in range(args.songs)]
+
+    backend = gemini.LocalBackend(args.latency, args.per_char, args.failure_rate, blocked_rate=args.blocked_rate)
+    gemini.set_backend(backend)
+    results = {"songs": args.songs, "lines_per_song": 26, "latency_s": args.latency,
+               "failure_rate": args.failure_rate, "blocked_rate": args.blocked_rate,
+               "blocked_chunk_check": check_blocked_chunk(songs[0]), "runs": []}
+
+    def whole_song():
+        latencies = []
+        for text in songs:
+            start = time.perf_counter()
+            try:
+                backend.generate(gemini.PROMPT.format(text=text))
+            except (RuntimeError, ValueError):
+                pass  # the old path had no retries: the song is simply not cleaned
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    latencies, elapsed = timed(whole_song)
+    results["runs"].append({
+        "mode": "whole_song_sequential", "wall_s": round(elapsed, 3),
+        "songs_per_min": round(args.songs / elapsed * 60, 1),
+        "song_p50_s": round(statistics.median(latencies), 3), "song_max_s": round(max(latencies), 3),
+    })
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = gemini.ResponseCache(cache_dir)
+        for mode in ("chunked_cold", "chunked_warm"):
+            stats, latencies = {}, []
+
+            def chunked():
+                for text in songs:
+                    start = time.perf_counter()
+                    gemini.asyncio.run(gemini.clean_chunks_async(
+                        gemini.chunk_verses(text), backend, cache, args.concurrency, args.rpm, stats=stats,
+                    ))
+                    latencies.append(time.perf_counter() - start)
+
+            _, elapsed = timed(chunked)
+            results["runs"].append(dict(
+                stats, mode=mode, wall_s=round(elapsed, 3),
+                songs_per_min=round(args.songs / elapsed * 60, 1),
+                song_p50_s=round(statistics.median(latencies), 3), song_max_s=round(max(latencies), 3),
+                chunks_per_song=round(sum(len(gemini.chunk_verses(t)) for t in songs) / args.songs, 1),
+            ))
+
+    baseline = results["runs"][0]["wall_s"]
+    for run in results["runs"]:
+        run["speedup"] = round(baseline / run["wall_s"], 1) if run["wall_s"] else None
+    write_report("gemini_cleanup", results, args.json)
@@ -0,0 +1,130 @@
+# ---------------------------
+# Throughput from 1 to N concurrent jobs, with and without the thread governor.
+#
+# Submits N identical jobs (separate a song, then transcribe its vocals) to a
+# Scheduler with N job slots and reports the wall time, songs per minute and
+# the speedup over one job, once with every library sizing its own thread
+# pools (LYRICS_GOVERNOR=0) and once with the governor splitting the cores
+# (governor.py). Without --stub the real Spleeter and faster-whisper models
+# run on the input; with --stub the separator is the NumPy stand-in and the
+# model spreads its work over cpu_threads threads like CTranslate2 does, so
+# the numbers only show the plumbing on a box without the models. Use
+# --cores to budget a share of a larger machine.
+#
+#   python benchmarks/bench_governor.py song.mp3 --size small --jobs 1 2 4
+#   python benchmarks/bench_governor.py --stub --repeat 6 --jobs 1 2 4
+import os
+import time
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# One BLAS thread per stub worker thread, so the stub's thread count is the one the governor set
+os.environ.setdefault("OPENBLAS_NUM_THREADS", "1")
+os.environ.setdefault("OMP_NUM_THREADS", "1")
+
+import numpy as np
+
+from common import FIXTURE_VOCALS, write_report
+from stubs import StubWhisperModel
+
+class ThreadedStubModel:
+    """Stub model whose decoding work is split over cpu_threads threads, num_workers calls at a time."""
+
+    def __init__(self, size, cpu_threads, num_workers, work_per_second=40):
+        self.inner = StubWhisperModel(size)
+        self.threads = cpu_threads or os.cpu_count() or 1
+        self.pool = ThreadPoolExecutor(self.threads)
+        self.calls = threading.Semaphore(num_workers)
+        self.work_per_second = work_per_second
+        self.block = np.random.default_rng(0).standard_normal((192, 192))
+
+    def _work(self, units):
+        block = self.block
+        for _ in range(units):
+            block = np.tanh(block @ self.block)
+        return units
+
+    def transcribe(self, audio, **options):
+        segments, info = self.inner.transcribe(audio, **options)
+
+        def decoded():
+            with self.calls:
+                for segment in segments:
+                    units = int(self.work_per_second * (segment.end - segment.start))
+                    # Every segment waits for its slowest thread, like an OpenMP parallel region
+                    share = [units // self.threads + (i < units % self.threads) for i in range(self.threads)]
+                    list(self.pool.map(self._work, share))
+                    yield segment
+
+        return decoded(), info
+
+def make_job(audio_path, size, repeat):
+    from audio import to_whisper_input
+    from separator import SAMPLE_RATE, load_audio, separate
+    from transcriber import transcribe_stream
+    mix = np.tile(load_audio(audio_path), (repeat, 1))
+
+    def run(spec, work_dir):
+        vocals = to_whisper_input(separate(mix)["vocals"], SAMPLE_RATE)
+        _, segments = transcribe_stream(vocals, size)
+        return sum(1 for _ in segments)
+
+    return run, len(mix) / SAMPLE_RATE
+
+def run_jobs(run, jobs, jobs_dir):
+    from scheduler import Scheduler
+    scheduler = Scheduler(run, max_jobs=jobs, max_queue=jobs, jobs_dir=jobs_dir)
+    started = time.perf_counter()
+    ids = [scheduler.submit({"kind": "bench"}) for _ in range(jobs)]
+    while True:
+        states = [scheduler.status(job_id)["state"] for job_id in ids]
+        if "error" in states:
+            raise RuntimeError(scheduler.status(ids[states.index("error")])["error"])
+        if all(state == "done" for state in states):
+            return time.perf_counter() - started
+        time.sleep(0.02)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("audio", nargs="?", default=FIXTURE_VOCALS)
+    parser.add_argument("--size", default="small")
+    parser.add_argument("--jobs", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--repeat", type=int, default=6, help="Tile the input to simulate a longer song")
+    parser.add_argument("--cores", type=int, default=None, help="Core budget (default: all cores)")
+    parser.add_argument("--stub", action="store_true", help="Use the stub separator and a threaded stub model")
+    parser.add_argument("--json", default=None)
+    args = parser.parse_args()
+
+    import transcriber
+    from governor import governor
+    if args.cores:
+        governor.cores = args.cores
+    if args.stub:
+        import stubs
+        stubs.install()
+        transcriber.model_factory = lambda size, device, compute_type, cpu_threads, num_workers=1: \
+            ThreadedStubModel(size, cpu_threads or governor.cores, num_workers)
+
+    run, audio_s = make_job(args.audio, args.size, args.repeat)
+    results = {"audio_s": round(audio_s, 1), "size": args.size, "stub": args.stub,
+               "cores": governor.cores, "runs": []}
+    with tempfile.TemporaryDirectory() as tmp:
+        run_jobs(run, 1, os.path.join(tmp, "warmup"))  # load the models outside the timings
+        for enabled in (False, True):
+            governor.enabled = enabled
+            mode = {"governor": enabled, "levels": []}
+            for jobs in args.jobs:
+                wall_s = run_jobs(run, jobs, os.path.join(tmp, f"{enabled}-{jobs}"))
+                threads, workers = governor.whisper_threads()  # as sized for the run's job slots
+                mode["levels"].append({
+                    "jobs": jobs, "wall_s": round(wall_s, 3),
+                    "songs_per_min": round(jobs / wall_s * 60, 2),
+                    "whisper_threads_per_job": threads or "all", "num_workers": workers,
+                })
+            base = mode["levels"][0]["songs_per_min"] / mode["levels"][0]["jobs"]
+            for level in mode["levels"]:
+                level["speedup"] = round(level["songs_per_min"] / base, 2)
+            results["runs"].append(mode)
+    write_report("governor", results, args.json)
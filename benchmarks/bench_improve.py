@@ -0,0 +1,94 @@
+# ---------------------------
+# Cost of "Try Improving": re-decoding the weak lines vs the whole song.
+#
+# Runs a first pass over the vocals, marks a share of its segments as weak
+# (--weak-fraction; the stub model's own scores are all confident), then
+# times improve.improve_segments against re-transcribing the whole song with
+# the larger model, which is what the retry used to do. Reports the fraction
+# of the audio decoded again and the retry's cost relative to the first pass.
+# With --stub the models are the stand-in from stubs.py, paced to
+# --decode-rtf seconds per audio second for the first pass and --improve-rtf
+# for the larger model and beam.
+#
+#   python benchmarks/bench_improve.py --stub --fixtures phrases:240 --weak-fraction 0.05 0.1 0.25
+import time
+import argparse
+
+import numpy as np
+
+from common import timed, write_report
+from bench_vad import PacedModel, load_fixture
+
+SAMPLE_RATE = 16000
+
+def first_pass(samples, size):
+    from main import lyrics_from_vocals
+    return lyrics_from_vocals(samples, on_segment=None, size=size)
+
+def full_retry(samples, size):
+    from main import lyrics_from_vocals
+    return lyrics_from_vocals(samples, on_segment=None, size=size, beam_size=10)
+
+def mark_weak(segments, fraction, seed=0):
+    """Copy of segments with about fraction of the rows given a low avg_logprob."""
+    from segments import Segments
+    marked = Segments.from_dict(segments.to_dict())
+    rng = np.random.default_rng(seed)
+    for i in np.flatnonzero(rng.random(len(marked)) < fraction):
+        marked.avg_logprob[i] = -1.5
+    return marked
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--fixtures", nargs="+", default=["fixture", "phrases:240"])
+    parser.add_argument("--size", default="small")
+    parser.add_argument("--weak-fraction", type=float, nargs="+", default=[0.05, 0.1, 0.25])
+    parser.add_argument("--stub", action="store_true", help="Use the stub Whisper model")
+    parser.add_argument("--decode-rtf", type=float, default=0.05,
+                        help="With --stub, first-pass decoding seconds per audio second")
+    parser.add_argument("--improve-rtf", type=float, default=0.15,
+                        help="With --stub, decoding seconds per audio second of the larger model and beam")
+    parser.add_argument("--json", default=None)
+    args = parser.parse_args()
+
+    import improve
+    import transcriber
+    from main import clean_text
+    if args.stub:
+        from stubs import stub_model_factory
+
+        def paced_factory(size, *rest):
+            rtf = args.improve_rtf if size == improve.IMPROVE_MODEL else args.decode_rtf
+            return PacedModel(stub_model_factory(size, *rest), rtf)
+
+        transcriber.model_factory = paced_factory
+    transcriber.load_model(args.size)
+    transcriber.load_model(improve.IMPROVE_MODEL)
+
+    runs = []
+    for name in args.fixtures:
+        samples = load_fixture(name)
+        duration = len(samples) / SAMPLE_RATE
+        lyrics, first_s = timed(first_pass, samples, args.size)
+        _, full_s = timed(full_retry, samples, improve.IMPROVE_MODEL)
+        result = {"fixture": name, "audio_s": round(duration, 2), "segments": len(lyrics),
+                  "first_pass_s": round(first_s, 3), "full_retry_s": round(full_s, 3), "retries": []}
+        for fraction in args.weak_fraction:
+            marked = mark_weak(lyrics, fraction)
+            weak = improve.weak_rows(marked)
+            spans = improve.weak_spans(marked, weak)
+            started = time.perf_counter()
+            improved = improve.improve_segments(samples, marked, clean_text, on_segment=None)
+            retry_s = time.perf_counter() - started
+            redecoded_s = float(np.minimum(spans[:, 1] + improve.PAD_S, duration).sum()
+                                - np.maximum(spans[:, 0] - improve.PAD_S, 0).sum()) if len(spans) else 0.0
+            result["retries"].append({
+                "weak_fraction": fraction, "weak_segments": int(weak.sum()), "spans": len(spans),
+                "redecoded_fraction": round(redecoded_s / duration, 4), "retry_s": round(retry_s, 3),
+                "vs_first_pass": round(retry_s / first_s, 3), "vs_full_retry": round(retry_s / full_s, 3),
+                "segments_after": len(improved),
+            })
+        runs.append(result)
+
+    write_report("improve", {"size": args.size, "improve_model": improve.IMPROVE_MODEL,
+                             "improve_beam": improve.IMPROVE_BEAM, "stub": args.stub, "runs": runs}, args.json)
@@ -0,0 +1,106 @@
+# ---------------------------
+# Transcript library: bulk insert throughput and search latency.
+#
+# Fills a fresh library (library.py) with a synthetic catalog of timestamped
+# Hindi/English lyrics (the corpus of bench_romanize.py), --batch songs per
+# transaction, and reports songs and lines stored per second, romanization
+# included, and the size on disk. Then times searches for lines that are in
+# the catalog, by a few words in Devanagari and in ITRANS, for text that is
+# not, and for two-character queries (too short for the trigram index, so
+# they scan), against a LIKE scan over the same lines without the index.
+#
+#   python benchmarks/bench_library.py --songs 10000
+import os
+import random
+import argparse
+import tempfile
+
+import numpy as np
+
+from common import timed, write_report
+from bench_romanize import make_vocabulary, make_line
+
+def make_songs(songs, vocabulary_size, seed=0):
+    """Segments of `songs` songs shaped like verse, chorus, verse, chorus, chorus, 3.5 s a line."""
+    from segments import Segments
+    rng = random.Random(seed)
+    vocabulary = make_vocabulary(rng, vocabulary_size)
+    for _ in range(songs):
+        chorus = [make_line(rng, vocabulary) for _ in range(4)]
+        lyrics = Segments()
+        for part in ("verse", "chorus", "verse", "chorus", "chorus"):
+            for line in chorus if part == "chorus" else [make_line(rng, vocabulary) for _ in range(6)]:
+                start = len(lyrics) * 3.5
+                lyrics.append(start, start + 3.5, line)
+        yield lyrics
+
+def excerpt(line, rng, words=3):
+    """A few consecutive words of a line."""
+    parts = line.split()
+    first = rng.randrange(max(1, len(parts) - words + 1))
+    return " ".join(parts[first:first + words])
+
+def latencies(fn, queries):
+    times, hits = [], 0
+    for query in queries:
+        found, seconds = timed(fn, query)
+        times.append(seconds)
+        hits += bool(found)
+    times = np.asarray(times) * 1000
+    return {"queries": len(queries), "found": hits, "p50_ms": round(float(np.percentile(times, 50)), 3),
+            "p95_ms": round(float(np.percentile(times, 95)), 3)}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--songs", type=int, default=10000)
+    parser.add_argument("--batch", type=int, default=500, help="Songs per transaction")
+    parser.add_argument("--vocabulary", type=int, default=5000, help="Distinct Hindi words in the catalog")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--scan-queries", type=int, default=20, help="Queries timed against a LIKE scan")
+    parser.add_argument("--json", default=None)
+    args = parser.parse_args()
+
+    import library
+    from romanize import romanize_line
+    rng = random.Random(1)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "library.sqlite")
+        store = library.Library(path)
+        sample = []
+        songs = make_songs(args.songs, args.vocabulary)
+        insert_s = 0.0
+        for first in range(0, args.songs, args.batch):
+            batch = [(f"song-{first + i}", lyrics, "hindi", f"song {first + i}.mp3")
+                     for i, lyrics in enumerate(next(songs) for _ in range(min(args.batch, args.songs - first)))]
+            sample += [lyrics.text[rng.randrange(len(lyrics))] for _, lyrics, _, _ in batch[:2]]
+            _, seconds = timed(store.add_many, batch)
+            insert_s += seconds
+        stats = store.stats()
+        size_mb = sum(os.path.getsize(os.path.join(tmp, name)) for name in os.listdir(tmp)) / 2 ** 20
+
+        lines = [sample[rng.randrange(len(sample))] for _ in range(args.queries)]
+        devanagari = [excerpt(line, rng) for line in lines]
+        itrans = [romanize_line(query) for query in devanagari]
+        missing = [f"{word} zzq" for word in devanagari]
+        short = [query.replace(" ", "")[:2] for query in devanagari]
+        results = {
+            "songs": stats["songs"], "lines": stats["lines"], "db_mb": round(size_mb, 1),
+            "insert": {"seconds": round(insert_s, 2), "songs_per_s": round(stats["songs"] / insert_s, 1),
+                       "lines_per_s": round(stats["lines"] / insert_s, 1), "batch": args.batch},
+            "find_songs": {
+                "devanagari": latencies(store.find_songs, devanagari),
+                "itrans": latencies(store.find_songs, itrans),
+                "not_in_catalog": latencies(store.find_songs, missing),
+                "two_chars_scan": latencies(lambda q: store.find_songs(q, limit=10), short[:args.scan_queries]),
+            },
+            "search_lines": latencies(store.search, devanagari),
+        }
+
+        def like_scan(query):
+            pattern = library._like(query)
+            with store._lock:
+                return store._db.execute("SELECT DISTINCT song_id FROM lines WHERE text LIKE ? ESCAPE '\\' "
+                                         "OR romanized LIKE ? ESCAPE '\\'", (pattern, pattern)).fetchall()
+
+        results["like_scan_baseline"] = latencies(like_scan, devanagari[:args.scan_queries])
+    write_report("library", results, args.json)
@@ -0,0 +1,93 @@
+# ---------------------------
+# Latency of overlapped separation and transcription within one song.
+#
+# Runs the English pipeline on a song twice from an empty stem cache: once
+# separating the whole song before transcribing it (LYRICS_OVERLAP=0), once
+# with the windows separated a step ahead of the transcriber (streaming.py).
+# Reports the time to the first lyric line and the total wall time, and
+# checks that the overlapped timestamps are in order and start inside the
+# active regions of the whole song's vocals. Without an input a synthetic
+# song is written (--seconds); with --stub the separator and model are the
+# stand-ins from stubs.py, paced to --separation-rtf and --decode-rtf
+# seconds per audio second.
+#
+#   python benchmarks/bench_overlap.py --stub --seconds 240
+#   python benchmarks/bench_overlap.py song.mp3 --size small
+import os
+import time
+import argparse
+import tempfile
+
+import numpy as np
+
+from common import write_report
+
+def run(audio_path, size, overlap):
+    import stem_cache
+    from separator import separate_vocals
+    from main import lyrics_from_vocals
+    with tempfile.TemporaryDirectory() as cache_dir:
+        stem_cache._cache = stem_cache.StemCache(root=cache_dir)
+        started = time.perf_counter()
+        first = []
+
+        def on_segment(line, progress):
+            if not first:
+                first.append(time.perf_counter() - started)
+
+        vocals = separate_vocals(audio_path, overlap=overlap)
+        lyrics = lyrics_from_vocals(vocals, on_segment=on_segment, size=size)
+        wall_s = time.perf_counter() - started
+        streamed = type(vocals).__name__ == "StreamedVocals"
+        if streamed:
+            vocals = vocals.head(vocals.duration_s)  # the cached vocals, for the timestamp check
+        else:
+            vocals = np.array(vocals)
+    return lyrics, vocals, {"first_lyric_s": round(first[0], 3) if first else None,
+                            "wall_s": round(wall_s, 3), "segments": len(lyrics), "overlapped": streamed}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("audio", nargs="?", default=None)
+    parser.add_argument("--seconds", type=float, default=240, help="Length of the synthetic song")
+    parser.add_argument("--size", default="small")
+    parser.add_argument("--stub", action="store_true", help="Use the stub separator and model")
+    parser.add_argument("--separation-rtf", type=float, default=0.05,
+                        help="With --stub, separation seconds per audio second")
+    parser.add_argument("--decode-rtf", type=float, default=0.05,
+                        help="With --stub, decoding seconds per audio second")
+    parser.add_argument("--json", default=None)
+    args = parser.parse_args()
+
+    import vad
+    import separator
+    import transcriber
+    if args.stub:
+        import stubs
+        from bench_preanalysis import PacedSeparator
+        from bench_vad import PacedModel
+        stubs.install()
+        separator.set_separator(PacedSeparator(stubs.StubSeparator(), args.separation_rtf))
+        transcriber.model_factory = lambda *a: PacedModel(stubs.stub_model_factory(*a), args.decode_rtf)
+    transcriber.load_model(args.size)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        audio_path = args.audio
+        if audio_path is None:
+            from bench_streaming import write_song
+            audio_path = os.path.join(tmp, "song.wav")
+            write_song(audio_path, args.seconds / 60)
+        _, whole_vocals, sequential = run(audio_path, args.size, overlap=False)
+        lyrics, _, overlapped = run(audio_path, args.size, overlap=True)
+
+    regions = vad.activity_map(whole_vocals)
+    starts = lyrics.as_numpy("start")
+    inside = ((starts[:, None] >= regions[:, 0] - 0.5) & (starts[:, None] <= regions[:, 1] + 0.5)).any(axis=1)
+    overlapped["timestamps_in_order"] = bool(np.all(np.diff(starts) >= 0))
+    overlapped["starts_in_active_regions"] = bool(inside.all()) if len(starts) else None
+    results = {"audio": args.audio or f"synthetic:{args.seconds:.0f}s", "size": args.size, "stub": args.stub,
+               "sequential": sequential, "overlapped": overlapped}
+    if sequential["first_lyric_s"] and overlapped["first_lyric_s"]:
+        results["first_lyric_change"] = round(overlapped["first_lyric_s"] / sequential["first_lyric_s"] - 1, 3)
+    results["wall_change"] = round(overlapped["wall_s"] / sequential["wall_s"] - 1, 3)
+    write_report("overlap", results, args.json)
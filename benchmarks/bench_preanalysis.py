@@ -0,0 +1,121 @@
+# ---------------------------
+# Separation time saved by the pre-analysis pass.
+#
+# Builds synthetic inputs (an a cappella take, spoken word, an instrumental,
+# a full mix and a song with long instrumental intro and outro), plus the
+# bundled test song remixed from its vocals and accompaniment stems when they
+# are there, and separates each one fully and through
+# separator.separate_where_needed, reporting the decision, the share of audio
+# that was separated and the wall times. Only the intro and outro are
+# trimmed; voice alone is separated in full, and a real mix must never come
+# out as "skip". With --stub the separator is the
+# NumPy stand-in slowed to --separation-rtf seconds per audio second, roughly
+# what Spleeter costs on CPU.
+#
+#   python benchmarks/bench_preanalysis.py --stub [--separation-rtf 0.1]
+import time
+import argparse
+
+import numpy as np
+
+from common import FIXTURE_VOCALS, timed, write_report
+
+SAMPLE_RATE = 44100
+
+# -----------------------
+# Fixtures: (n_samples, 2) float32 at 44.1 kHz
+def voice(seconds, rng, f0=180.0):
+    """A harmonic voice gated into syllables of 0.12-0.3 s, centred in the stereo field."""
+    n = int(seconds * SAMPLE_RATE)
+    t = np.arange(n) / SAMPLE_RATE
+    phase = 2 * np.pi * np.cumsum(f0 + 0.15 * f0 * np.sin(2 * np.pi * 0.3 * t)) / SAMPLE_RATE
+    tone = sum(np.sin(k * phase) / k for k in range(1, 12))
+    gate = np.zeros(n)
+    i = 0
+    while i < n:
+        on = int(rng.uniform(0.12, 0.3) * SAMPLE_RATE)
+        gate[i:i + on] = np.hanning(on)[:n - i]
+        i += on + int(rng.uniform(0.05, 0.15) * SAMPLE_RATE)
+    mono = 0.3 * tone * gate
+    return np.stack([mono, mono], axis=1)
+
+def music(seconds):
+    """Bass, a kick on every beat and a chord voiced differently left and right."""
+    n = int(seconds * SAMPLE_RATE)
+    t = np.arange(n) / SAMPLE_RATE
+    low = 0.3 * np.sin(2 * np.pi * 55 * t) + 0.4 * np.sin(2 * np.pi * 50 * t) * np.exp(-(t % 0.5) * 20)
+    left = sum(0.1 * np.sin(2 * np.pi * f * t) for f in (261.6, 329.6, 392.0))
+    right = sum(0.1 * np.sin(2 * np.pi * f * t + 1.3) for f in (261.6, 329.6, 392.0, 493.9))
+    return np.stack([low + left, low + right], axis=1)
+
+def make_fixtures(seconds, seed=0):
+    rng = np.random.default_rng(seed)
+    intro = seconds / 4
+    fixtures = {
+        "a_cappella": voice(seconds, rng),
+        "spoken_word": voice(seconds, rng, f0=120.0),
+        "instrumental": music(seconds),
+        "full_mix": music(seconds) + voice(seconds, rng),
+        "intro_song_outro": np.concatenate([
+            music(intro), music(seconds - 2 * intro) + voice(seconds - 2 * intro, rng), music(intro),
+        ]),
+    }
+    return {name: (waveform / np.abs(waveform).max()).astype(np.float32) for name, waveform in fixtures.items()}
+
+def real_mix():
+    """The bundled song's vocals and accompaniment summed back into a mix, or None."""
+    import os
+    from stubs import stub_load_audio
+    accompaniment = os.path.join(os.path.dirname(FIXTURE_VOCALS), "accompaniment.wav")
+    if not os.path.exists(accompaniment):
+        return None
+    vocals, music = stub_load_audio(FIXTURE_VOCALS), stub_load_audio(accompaniment)
+    n = min(len(vocals), len(music))
+    return vocals[:n] + music[:n]
+
+class PacedSeparator:
+    """Wraps a separator so each call also takes rtf seconds per second of audio."""
+
+    def __init__(self, inner, rtf):
+        self.inner = inner
+        self.rtf = rtf
+
+    def separate(self, waveform):
+        time.sleep(self.rtf * len(waveform) / SAMPLE_RATE)
+        return self.inner.separate(waveform)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seconds", type=float, default=180)
+    parser.add_argument("--stub", action="store_true", help="Use the NumPy stand-in separator")
+    parser.add_argument("--separation-rtf", type=float, default=0.1,
+                        help="With --stub, extra separation seconds per audio second")
+    parser.add_argument("--json", default=None)
+    args = parser.parse_args()
+
+    import separator
+    import preanalysis
+    if args.stub:
+        from stubs import StubSeparator
+        separator.set_separator(PacedSeparator(StubSeparator(), args.separation_rtf))
+    else:
+        separator.separate(np.zeros((SAMPLE_RATE, 2), dtype=np.float32))  # load the model first
+
+    fixtures = make_fixtures(args.seconds)
+    if real_mix() is not None:
+        fixtures["real_mix"] = real_mix()
+    runs = []
+    for name, waveform in fixtures.items():
+        _, full_s = timed(separator.separate, waveform)
+        plan = preanalysis.analyze(waveform, SAMPLE_RATE)
+        _, planned_s = timed(separator.separate_where_needed, waveform)
+        runs.append({
+            "fixture": name, "decision": plan.decision, "regions": plan.regions,
+            "separated_fraction": round(plan.separate_s / plan.duration_s, 3),
+            "analysis_s": plan.analysis_s, "full_s": round(full_s, 3), "preanalysis_s": round(planned_s, 3),
+            "saved_s": round(full_s - planned_s, 3),
+        })
+
+    write_report("preanalysis", {"seconds": args.seconds, "stub": args.stub,
+                                 "separation_rtf": args.separation_rtf if args.stub else None, "runs": runs},
+                 args.json)
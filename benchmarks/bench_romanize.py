@@ -0,0 +1,96 @@
+# ---------------------------
+# Romanization throughput: whole-line transliteration vs romanize.py.
+#
+# Builds a synthetic corpus shaped like song lyrics (a chorus repeated
+# between verses, Hindi lines with English words mixed in) and romanizes it
+# the old way (every line, or the whole text, through indic_transliteration)
+# and through romanize.romanize_lines with cold and warm caches. Timestamped
+# lines never repeat, so they only benefit from the word cache.
+#
+#   python benchmarks/bench_romanize.py [--songs 500] [--timestamps]
+import re
+import random
+import argparse
+
+from common import timed, write_report
+from stubs import LYRIC_LINES
+
+CONSONANTS = "कखगघचछजझटठडढतथदधनपफबभमयरलवशसह"
+MATRAS = ["", "ा", "ि", "ी", "ु", "ू", "े", "ै", "ो", "ौ", "ं"]
+ENGLISH = ["baby", "tell", "me", "why", "love", "you", "dance", "tonight", "forever", "oh", "yeah"]
+
+def make_vocabulary(rng, size):
+    words = {word for line in LYRIC_LINES for word in line.split() if not word.isascii()}
+    while len(words) < size:
+        words.add("".join(rng.choice(CONSONANTS) + rng.choice(MATRAS) for _ in range(rng.randint(1, 3))))
+    return sorted(words)
+
+def make_line(rng, vocabulary):
+    words = [rng.choice(vocabulary) for _ in range(rng.randint(3, 7))]
+    if rng.random() < 0.3:
+        words.insert(rng.randrange(len(words)), rng.choice(ENGLISH))
+    return " ".join(words)
+
+def make_corpus(songs, vocabulary_size, timestamps, seed=0):
+    """Lines of `songs` songs: verse, chorus, verse, chorus, chorus."""
+    rng = random.Random(seed)
+    vocabulary = make_vocabulary(rng, vocabulary_size)
+    lines = []
+    for _ in range(songs):
+        chorus = [make_line(rng, vocabulary) for _ in range(4)]
+        song = []
+        for part in ("verse", "chorus", "verse", "chorus", "chorus"):
+            song += chorus if part == "chorus" else [make_line(rng, vocabulary) for _ in range(6)]
+        if timestamps:
+            song = [f"[{i * 3.5:.2f}-{i * 3.5 + 3.5:.2f}] {line}" for i, line in enumerate(song)]
+        lines += song
+    return lines
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--songs", type=int, default=500)
+    parser.add_argument("--vocabulary", type=int, default=3000, help="Distinct Hindi words in the corpus")
+    parser.add_argument("--timestamps", action="store_true", help="Prefix lines with [start-end] like the raw transcripts")
+    parser.add_argument("--json", default=None)
+    args = parser.parse_args()
+
+    from indic_transliteration.sanscript import transliterate, DEVANAGARI, ITRANS
+    import romanize
+
+    lines = make_corpus(args.songs, args.vocabulary, args.timestamps)
+    text = "\n".join(lines)
+
+    def whole_lines():
+        return [
+            transliterate(line, DEVANAGARI, ITRANS).lower() if re.search(r'[\u0900-\u097F]', line) else line
+            for line in lines
+        ]
+
+    def whole_text():
+        return transliterate(text, DEVANAGARI, ITRANS).lower()
+
+    expected, baseline_s = timed(whole_lines)
+    _, blob_s = timed(whole_text)
+    romanize.clear_caches()
+    cold, cold_s = timed(romanize.romanize_lines, lines)
+    cold_cache = romanize.cache_info()
+    warm, warm_s = timed(romanize.romanize_lines, lines)
+
+    def run(name, seconds):
+        return {"mode": name, "wall_s": round(seconds, 4),
+                "lines_per_s": round(len(lines) / seconds), "speedup": round(baseline_s / seconds, 1)}
+
+    results = {
+        "lines": len(lines),
+        "distinct_lines": len(set(lines)),
+        "timestamps": args.timestamps,
+        "mismatches": sum(a != b for a, b in zip(expected, cold)) + sum(a != b for a, b in zip(expected, warm)),
+        "runs": [
+            run("whole_line", baseline_s),
+            run("whole_text", blob_s),
+            run("memoized_cold", cold_s),
+            run("memoized_warm", warm_s),
+        ],
+        "cache_after_cold_run": cold_cache,
+    }
+    write_report("romanize", results, args.json)
@@ -0,0 +1,70 @@
+# ---------------------------
+# Cold-start vs warm latency of vocal separation.
+#
+# "cli" runs `spleeter separate` in a subprocess (TensorFlow boot and checkpoint
+# restore every time, like the old extract_vocals). "in-process" uses
+# separator.separate, where only the first call pays for loading the model.
+#
+#   python benchmarks/bench_separation.py [audio] [--runs 3] [--seconds 30] [--json out.json]
+import os
+import argparse
+import tempfile
+import subprocess
+
+from common import FIXTURE_VOCALS, timed, write_report
+
+def bench_cli(audio_path, runs):
+    times = []
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as out_dir:
+            _, elapsed = timed(
+                subprocess.run,
+                ["spleeter", "separate", "-p", "spleeter:2stems", "-o", out_dir, audio_path],
+                check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )
+        times.append(elapsed)
+    return times
+
+def bench_in_process(waveform, runs):
+    import separator
+    times = []
+    for _ in range(runs):
+        _, elapsed = timed(separator.separate, waveform)
+        times.append(elapsed)
+    return times
+
+def summarize(times, duration):
+    warm = times[1:] or times
+    return {
+        "cold_s": round(times[0], 3),
+        "warm_mean_s": round(sum(warm) / len(warm), 3),
+        "cold_rtf": round(times[0] / duration, 3),
+        "warm_rtf": round(sum(warm) / len(warm) / duration, 3),
+        "runs": [round(t, 3) for t in times],
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("audio", nargs="?", default=FIXTURE_VOCALS)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--seconds", type=float, default=None, help="Trim the input to this many seconds")
+    parser.add_argument("--skip-cli", action="store_true")
+    parser.add_argument("--json", default=None)
+    args = parser.parse_args()
+
+    import separator
+    waveform = separator.load_audio(args.audio)
+    if args.seconds:
+        waveform = waveform[: int(args.seconds * separator.SAMPLE_RATE)]
+    duration = len(waveform) / separator.SAMPLE_RATE
+
+    # Both paths must see the same audio, so the CLI gets the trimmed clip too
+    with tempfile.TemporaryDirectory() as tmp:
+        clip = os.path.join(tmp, "clip.wav")
+        separator.get_audio_adapter().save(clip, waveform, separator.SAMPLE_RATE, "wav")
+        results = {"audio": args.audio, "duration_s": round(duration, 2)}
+        if not args.skip_cli:
+            results["cli"] = summarize(bench_cli(clip, args.runs), duration)
+        results["in_process"] = summarize(bench_in_process(waveform, args.runs), duration)
+
+    write_report("separation", results, args.json)
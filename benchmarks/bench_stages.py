@@ -0,0 +1,195 @@
+# ---------------------------
+# Stage-level benchmark suite.
+#
+# Runs each pipeline stage on fixture audio and reports wall time, real-time
+# factor (wall time / audio duration) and peak RSS as JSON. Every case runs in
+# a fresh interpreter so the peak RSS belongs to that stage alone.
+#
+# Fixtures: "fixture" is the bundled output/tpbilingualtesting/vocals.wav,
+# "tone:<seconds>" and "noise:<seconds>" are synthetic. With --stub the
+# Spleeter and Whisper stages use the stand-ins in stubs.py, so the suite runs
+# on a plain CPU box.
+#
+#   python benchmarks/bench_stages.py --stub --fixtures fixture tone:120
+#   python benchmarks/bench_stages.py --sizes medium large-v2 --compute-types int8 float32
+#   python benchmarks/bench_stages.py --stub --save-baseline benchmarks/stages_baseline.json
+#   python benchmarks/bench_stages.py --stub --baseline benchmarks/stages_baseline.json
+import os
+import sys
+import json
+import argparse
+import tempfile
+import contextlib
+import statistics
+import subprocess
+
+from common import FIXTURE_VOCALS, BACKEND_DIR, peak_rss_mb, timed, write_report
+
+SAMPLE_RATE = 44100
+TEXT_STAGES = ["clean_transcription", "clean_lyrics", "transliterate_lyrics"]
+
+# -----------------------
+# Fixtures
+def load_fixture(name):
+    """Returns (44.1 kHz stereo float32 waveform, duration in seconds)."""
+    import numpy as np
+    from audio import read_wav, resample
+
+    if name == "fixture":
+        waveform, rate = read_wav(FIXTURE_VOCALS)
+        if rate != SAMPLE_RATE:
+            waveform = np.stack([resample(waveform[:, c], rate, SAMPLE_RATE) for c in range(waveform.shape[1])], 1)
+    else:
+        kind, seconds = name.split(":")
+        n = int(float(seconds) * SAMPLE_RATE)
+        t = np.arange(n, dtype=np.float32) / SAMPLE_RATE
+        if kind == "tone":
+            # A sung-ish line: a vibrato tone with a few harmonics, gated like phrases
+            f0 = 220 * (1 + 0.01 * np.sin(2 * np.pi * 5 * t))
+            phase = 2 * np.pi * np.cumsum(f0) / SAMPLE_RATE
+            mono = sum(np.sin(k * phase) / k for k in range(1, 5)) * (np.sin(2 * np.pi * t / 4) > -0.3)
+        elif kind == "noise":
+            mono = np.random.default_rng(0).standard_normal(n)
+        else:
+            raise ValueError(f"Unknown fixture: {name}")
+        mono = (0.3 * mono / (np.abs(mono).max() or 1)).astype(np.float32)
+        waveform = np.stack([mono, mono], axis=1)
+    return waveform.astype(np.float32), len(waveform) / SAMPLE_RATE
+
+def synthetic_transcript(duration, seconds_per_line=4.0):
+    from stubs import lyric_line
+    lines = []
+    start = 0.0
+    index = 0
+    while start < duration:
+        end = min(start + seconds_per_line, duration)
+        lines.append(f"[{start:.2f}-{end:.2f}] {lyric_line(index)}")
+        start = end
+        index += 1
+    return "\n".join(lines)
+
+# -----------------------
+# One case, run inside a child interpreter
+def stage_function(case, waveform, duration):
+    stage = case["stage"]
+    if stage == "extract_vocals":
+        import separator
+        return lambda: separator.separate(waveform), {}
+    if stage == "transcribe_audio":
+        from audio import to_whisper_input
+        from transcriber import load_model
+        audio16 = to_whisper_input(waveform, SAMPLE_RATE)
+        model, load_s = timed(load_model, case["size"], compute_type=case["compute_type"])
+        def run():
+            segments, _ = model.transcribe(audio16)
+            return list(segments)
+        return run, {"model_load_s": round(load_s, 3)}
+    text = synthetic_transcript(duration)
+    if stage == "clean_transcription":
+        import main as english
+        return lambda: english.clean_transcription(text), {}
+    if stage == "clean_lyrics":
+        import hindi1
+        return lambda: hindi1.clean_lyrics(text), {}
+    if stage == "transliterate_lyrics":
+        import indic_transliteration  # transliterate_lyrics swallows errors; fail loudly here
+        import bilingual
+        return lambda: bilingual.transliterate_lyrics(text), {}
+    raise ValueError(f"Unknown stage: {stage}")
+
+def run_case(case):
+    if case["stub"]:
+        import stubs
+        stubs.install()
+    waveform, duration = load_fixture(case["fixture"])
+    # Stages print progress and some write side files; keep both out of the report
+    os.chdir(tempfile.mkdtemp(prefix="bench_"))
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        fn, extra = stage_function(case, waveform, duration)
+        fn()  # warm-up: first-call costs (lazy imports, TF graph) are not stage cost
+        times = [timed(fn)[1] for _ in range(case["repeats"])]
+    wall = statistics.median(times)
+    return dict(
+        extra,
+        duration_s=round(duration, 2),
+        wall_s=round(wall, 6),
+        rtf=round(wall / duration, 6) if duration else None,
+        peak_rss_mb=round(peak_rss_mb(), 1),
+    )
+
+def spawn_case(case):
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--case", json.dumps(case)],
+        capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        lines = proc.stderr.strip().splitlines()
+        return {"error": lines[-1] if lines else f"exit code {proc.returncode}"}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+# -----------------------
+def build_cases(args):
+    cases = []
+    for fixture in args.fixtures:
+        for stage in args.stages:
+            base = {"stage": stage, "fixture": fixture, "stub": args.stub, "repeats": args.repeats}
+            if stage == "transcribe_audio":
+                for size in args.sizes:
+                    for compute_type in args.compute_types:
+                        cases.append(dict(base, size=size, compute_type=compute_type))
+            else:
+                cases.append(base)
+    return cases
+
+def case_key(case):
+    variant = f"[{case['size']}/{case['compute_type']}]" if case["stage"] == "transcribe_audio" else ""
+    return f"{case['stage']}{variant}@{case['fixture']}"
+
+def compare(results, baseline, tolerance):
+    """Adds a vs_baseline ratio to each result and returns the regressed keys."""
+    regressed = []
+    for key, result in results.items():
+        previous = baseline.get(key)
+        if not previous or "error" in result or "error" in previous or not previous.get("wall_s"):
+            continue
+        ratio = result["wall_s"] / previous["wall_s"]
+        result["vs_baseline"] = round(ratio, 3)
+        if ratio > 1 + tolerance:
+            regressed.append(key)
+    return regressed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--stages", nargs="+", default=["extract_vocals", "transcribe_audio"] + TEXT_STAGES)
+    parser.add_argument("--fixtures", nargs="+", default=["fixture", "tone:60", "noise:60"])
+    parser.add_argument("--sizes", nargs="+", default=["medium"])
+    parser.add_argument("--compute-types", nargs="+", default=["int8"])
+    parser.add_argument("--stub", action="store_true", help="Use the stub separator and Whisper model")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--baseline", default=None)
+    parser.add_argument("--save-baseline", default=None)
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--json", default=None)
+    parser.add_argument("--case", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        if BACKEND_DIR not in sys.path:
+            sys.path.insert(0, BACKEND_DIR)
+        print(json.dumps(run_case(json.loads(args.case))))
+        sys.exit(0)
+
+    results = {}
+    for case in build_cases(args):
+        key = case_key(case)
+        print(f"[INFO] {key}", file=sys.stderr, flush=True)
+        results[key] = spawn_case(case)
+
+    regressed = []
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressed = compare(results, json.load(f)["results"], args.tolerance)
+    write_report("stages", results, args.json or args.save_baseline)
+    for key in regressed:
+        print(f"[ERROR] Regression vs baseline: {key} ({results[key]['vs_baseline']}x)", file=sys.stderr)
+    sys.exit(1 if regressed else 0)
@@ -0,0 +1,91 @@
+# ---------------------------
+# Import time and resident memory of each backend entry point.
+#
+# Every entry point is imported in a fresh interpreter, several times, and the
+# median import time plus the peak RSS after import are reported. Compare
+# against a saved baseline to catch a heavy import creeping back into the hot
+# path (the process exits with status 1 on a regression).
+#
+#   python benchmarks/bench_startup.py --save-baseline benchmarks/startup_baseline.json
+#   python benchmarks/bench_startup.py --baseline benchmarks/startup_baseline.json
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+from common import BACKEND_DIR, ROOT_DIR, write_report
+
+ENTRY_POINTS = ["main", "hindi1", "bilingual", "hindiapi", "worker", "batch", "transcriber"]
+
+PROBE = r"""
+import sys, json, time, resource
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+peak_mb = peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+heavy = [name for name in ("torch", "tensorflow", "faster_whisper", "ctranslate2", "spleeter",
+                           "indic_transliteration", "google.generativeai") if name in sys.modules]
+print(json.dumps({{"import_s": elapsed, "rss_mb": peak_mb, "heavy_modules": heavy}}))
+"""
+
+def probe(module, cwd):
+    env = os.environ.copy()
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (BACKEND_DIR, ROOT_DIR, env.get("PYTHONPATH")) if p)
+    proc = subprocess.run(
+        [sys.executable, "-c", PROBE.format(module=module)],
+        cwd=cwd, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        return {"error": proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed"}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def measure(module, runs):
+    samples = [probe(module, BACKEND_DIR) for _ in range(runs)]
+    errors = [s for s in samples if "error" in s]
+    if errors:
+        return errors[0]
+    return {
+        "import_s": round(statistics.median(s["import_s"] for s in samples), 4),
+        "rss_mb": round(max(s["rss_mb"] for s in samples), 1),
+        "heavy_modules": samples[0]["heavy_modules"],
+    }
+
+def regressions(results, baseline, time_tolerance, rss_tolerance):
+    found = []
+    for module, current in results.items():
+        previous = baseline.get(module)
+        if not previous or "error" in current or "error" in previous:
+            continue
+        if current["import_s"] > previous["import_s"] * (1 + time_tolerance) + 0.02:
+            found.append(f"{module}: import {previous['import_s']}s -> {current['import_s']}s")
+        if current["rss_mb"] > previous["rss_mb"] * (1 + rss_tolerance) + 5:
+            found.append(f"{module}: RSS {previous['rss_mb']}MB -> {current['rss_mb']}MB")
+        new_heavy = set(current["heavy_modules"]) - set(previous["heavy_modules"])
+        if new_heavy:
+            found.append(f"{module}: now imports {', '.join(sorted(new_heavy))} at startup")
+    return found
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("modules", nargs="*", default=ENTRY_POINTS)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--baseline", default=None, help="Compare against this saved report")
+    parser.add_argument("--save-baseline", default=None, help="Write the results as a new baseline")
+    parser.add_argument("--time-tolerance", type=float, default=0.25)
+    parser.add_argument("--rss-tolerance", type=float, default=0.15)
+    parser.add_argument("--json", default=None)
+    args = parser.parse_args()
+
+    results = {module: measure(module, args.runs) for module in args.modules}
+    write_report("startup", results, args.json or args.save_baseline)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        found = regressions(results, baseline, args.time_tolerance, args.rss_tolerance)
+        for line in found:
+            print(f"[ERROR] Startup regression: {line}")
+        sys.exit(1 if found else 0)
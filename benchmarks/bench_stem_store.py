@@ -0,0 +1,71 @@
+# ---------------------------
+# Disk footprint and read cost of the stem storage formats.
+#
+# Writes the same separated song the old way (full-rate stereo vocals.wav and
+# accompaniment.wav) and in each stem_store format (16 kHz mono vocals only),
+# then reports MB per minute, write time and the time to read the vocals back
+# and touch every sample. flac needs ffmpeg on the PATH and is skipped
+# without it.
+#
+#   python benchmarks/bench_stem_store.py [--minutes 5] [--runs 3]
+import os
+import shutil
+import argparse
+import tempfile
+
+import numpy as np
+
+from common import timed, write_report
+
+SAMPLE_RATE = 44100
+
+def best_of(runs, fn, *args):
+    return min(timed(fn, *args)[1] for _ in range(runs))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--minutes", type=float, default=5)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--json", default=None)
+    args = parser.parse_args()
+
+    from audio import write_wav, read_wav, to_whisper_input
+    import stem_store
+    from bench_preanalysis import music, voice
+
+    seconds = args.minutes * 60
+    vocals = (0.5 * voice(seconds, np.random.default_rng(0))).astype(np.float32)
+    accompaniment = (0.3 * music(seconds)).astype(np.float32)
+    vocals_16k = to_whisper_input(vocals, SAMPLE_RATE)
+
+    def touch(samples):
+        return float(np.asarray(samples, dtype=np.float32).sum())
+
+    runs = []
+    with tempfile.TemporaryDirectory() as tmp:
+        def full_rate_write():
+            write_wav(os.path.join(tmp, "vocals.wav"), vocals, SAMPLE_RATE)
+            write_wav(os.path.join(tmp, "accompaniment.wav"), accompaniment, SAMPLE_RATE)
+
+        write_s = best_of(args.runs, full_rate_write)
+        size = sum(os.path.getsize(os.path.join(tmp, name)) for name in ("vocals.wav", "accompaniment.wav"))
+        read_s = best_of(args.runs, lambda: touch(to_whisper_input(read_wav(os.path.join(tmp, "vocals.wav"))[0],
+                                                                   SAMPLE_RATE)))
+        runs.append({"format": "full_rate_stems", "mb_per_min": round(size / 1e6 / args.minutes, 2),
+                     "write_s": round(write_s, 3), "read_s": round(read_s, 3)})
+
+        for fmt in stem_store.FORMATS:
+            if fmt == "flac" and not shutil.which("ffmpeg"):
+                runs.append({"format": fmt, "skipped": "ffmpeg not found"})
+                continue
+            path = os.path.join(tmp, stem_store.vocals_name(fmt))
+            write_s = best_of(args.runs, stem_store.save_vocals, path, vocals_16k)
+            read_s = best_of(args.runs, lambda: touch(stem_store.load_vocals(path)))
+            runs.append({"format": fmt, "mb_per_min": round(os.path.getsize(path) / 1e6 / args.minutes, 2),
+                         "write_s": round(write_s, 3), "read_s": round(read_s, 3)})
+
+    baseline = runs[0]["mb_per_min"]
+    for run in runs:
+        if "mb_per_min" in run:
+            run["size_ratio"] = round(baseline / run["mb_per_min"], 1)
+    write_report("stem_store", {"minutes": args.minutes, "runs": runs}, args.json)
@@ -0,0 +1,92 @@
+# ---------------------------
+# Peak memory of the streaming mode against track length.
+#
+# Writes synthetic songs of increasing length to disk (generated a minute at
+# a time), then separates and transcribes each one in a fresh interpreter
+# with LYRICS_STREAMING=1, recording wall time and peak RSS. Peak RSS must not
+# grow with the duration: the process exits with status 1 if the longest
+# track peaks more than --tolerance-mb above the shortest. --compare also runs
+# the whole-file path (LYRICS_STREAMING=0) to show what it replaces. Always
+# uses the NumPy stand-ins from stubs.py, since the model weights are the
+# same size for every track.
+#
+#   python benchmarks/bench_streaming.py --minutes 5 20 60
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+
+import numpy as np
+
+from common import BACKEND_DIR, ROOT_DIR, write_report
+
+SAMPLE_RATE = 44100
+
+CHILD = r"""
+import sys, json, time
+sys.path.insert(0, {benchmarks!r})
+from common import peak_rss_mb
+import stubs
+stubs.install()
+import separator, main
+started = time.perf_counter()
+vocals = separator.separate_vocals({path!r})
+lyrics = main.lyrics_from_vocals(vocals, on_segment=None)
+print(json.dumps({{"wall_s": time.perf_counter() - started, "rss_mb": peak_rss_mb(),
+                   "segments": len(lyrics), "streamed": type(vocals).__name__ == "StreamedVocals"}}))
+"""
+
+def write_song(path, minutes, seed=0):
+    """A minutes-long 44.1 kHz stereo song, written a minute at a time."""
+    from audio import open_wav_writer, to_pcm16
+    from bench_preanalysis import music, voice
+    rng = np.random.default_rng(seed)
+    with open_wav_writer(path, SAMPLE_RATE, channels=2) as f:
+        for _ in range(int(minutes)):
+            minute = music(60) + voice(60, rng)
+            f.writeframes(to_pcm16(0.5 * minute / np.abs(minute).max()).tobytes())
+
+def run_child(path, streaming, cache_dir):
+    env = os.environ.copy()
+    env.update(LYRICS_STREAMING="1" if streaming else "0", LYRICS_OVERLAP="0", LYRICS_STEM_CACHE_DIR=cache_dir)
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (BACKEND_DIR, ROOT_DIR, env.get("PYTHONPATH")) if p)
+    proc = subprocess.run(
+        [sys.executable, "-c", CHILD.format(benchmarks=os.path.dirname(os.path.abspath(__file__)), path=path)],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        return {"error": proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed"}
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    return {name: round(value, 2) if isinstance(value, float) else value for name, value in result.items()}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--minutes", type=int, nargs="+", default=[5, 20, 60])
+    parser.add_argument("--tolerance-mb", type=float, default=50.0)
+    parser.add_argument("--compare", action="store_true", help="Also run the whole-file path")
+    parser.add_argument("--json", default=None)
+    args = parser.parse_args()
+
+    runs = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for minutes in sorted(args.minutes):
+            path = os.path.join(tmp, f"song_{minutes}m.wav")
+            write_song(path, minutes)
+            modes = [True, False] if args.compare else [True]
+            for streaming in modes:
+                # A fresh cache for every run, so each one separates
+                result = run_child(path, streaming, tempfile.mkdtemp(dir=tmp))
+                runs.append(dict(result, minutes=minutes, mode="streaming" if streaming else "whole_file"))
+            os.remove(path)
+
+    streamed = [run for run in runs if run["mode"] == "streaming" and "rss_mb" in run]
+    growth = streamed[-1]["rss_mb"] - streamed[0]["rss_mb"] if len(streamed) > 1 else 0.0
+    failed = len(streamed) < len([run for run in runs if run["mode"] == "streaming"]) \
+        or growth > args.tolerance_mb
+    write_report("streaming", {"tolerance_mb": args.tolerance_mb, "rss_growth_mb": round(growth, 2),
+                               "flat": not failed, "runs": runs}, args.json)
+    if failed:
+        print(f"[FAIL] Streaming peak RSS grew by {growth:.1f} MB (tolerance {args.tolerance_mb} MB)")
+        sys.exit(1)
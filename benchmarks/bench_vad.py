@@ -0,0 +1,114 @@
+# ---------------------------
+# Transcription latency with and without vocal-activity gating.
+#
+# Transcribes vocals through transcriber.transcribe_stream twice, once with
+# every sample decoded (LYRICS_VAD=0) and once with only the active regions
+# (vad.py), and reports the fraction of audio skipped, the wall times and
+# whether the gated timestamps land inside the active regions of the
+# original timeline. Fixtures: "fixture" is the bundled vocals.wav, and
+# "phrases:<seconds>" is a synthetic vocals track with sung phrases between
+# stretches of faint bleed. With --stub the model is the stand-in from
+# stubs.py, paced to --decode-rtf seconds per audio second.
+#
+#   python benchmarks/bench_vad.py --stub --fixtures fixture phrases:240
+#   python benchmarks/bench_vad.py --size medium --fixtures fixture
+import time
+import argparse
+
+import numpy as np
+
+from common import FIXTURE_VOCALS, timed, write_report
+
+SAMPLE_RATE = 16000
+
+def load_fixture(name, seed=0):
+    from audio import read_wav, to_whisper_input
+    if name == "fixture":
+        waveform, rate = read_wav(FIXTURE_VOCALS)
+        return to_whisper_input(waveform, rate)
+    kind, seconds = name.split(":")
+    if kind != "phrases":
+        raise ValueError(f"Unknown fixture: {name}")
+    rng = np.random.default_rng(seed)
+    n = int(float(seconds) * SAMPLE_RATE)
+    samples = 0.002 * rng.standard_normal(n)  # bleed
+    t = 0.0
+    while t < n / SAMPLE_RATE:
+        t += rng.uniform(2, 12)  # a rest between phrases
+        length = rng.uniform(3, 10)
+        start, end = int(t * SAMPLE_RATE), min(int((t + length) * SAMPLE_RATE), n)
+        if start >= n:
+            break
+        phase = 2 * np.pi * np.cumsum(np.full(end - start, rng.uniform(150, 300))) / SAMPLE_RATE
+        samples[start:end] += 0.3 * sum(np.sin(k * phase) / k for k in range(1, 6))
+        t += length
+    return samples.astype(np.float32)
+
+class PacedModel:
+    """Wraps a stub model so decoding costs rtf seconds per second of audio, spent segment by segment."""
+
+    def __init__(self, inner, rtf):
+        self.inner = inner
+        self.rtf = rtf
+
+    def transcribe(self, audio, **options):
+        segments, info = self.inner.transcribe(audio, **options)
+
+        def paced():
+            for segment in segments:
+                time.sleep(self.rtf * (segment.end - segment.start))
+                yield segment
+
+        return paced(), info
+
+def run(samples, size, **options):
+    from transcriber import transcribe_stream
+    started = time.perf_counter()
+    info, segments = transcribe_stream(samples, size, **options)
+    first = None
+    decoded = []
+    for segment, _ in segments:
+        first = first if first is not None else time.perf_counter() - started
+        decoded.append(segment)
+    return decoded, first
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--fixtures", nargs="+", default=["fixture", "phrases:240"])
+    parser.add_argument("--size", default="small")
+    parser.add_argument("--stub", action="store_true", help="Use the stub Whisper model")
+    parser.add_argument("--decode-rtf", type=float, default=0.05,
+                        help="With --stub, decoding seconds per audio second")
+    parser.add_argument("--json", default=None)
+    args = parser.parse_args()
+
+    import vad
+    import transcriber
+    if args.stub:
+        from stubs import stub_model_factory
+        transcriber.model_factory = lambda *a: PacedModel(stub_model_factory(*a), args.decode_rtf)
+    transcriber.load_model(args.size)
+
+    runs = []
+    for name in args.fixtures:
+        samples = load_fixture(name)
+        duration = len(samples) / SAMPLE_RATE
+        _, activity = vad.gate(samples)
+        result = {"fixture": name, "audio_s": round(duration, 2), "regions": len(activity.regions),
+                  "skipped_fraction": vad.skipped_fraction(activity)}
+        for mode, enabled in (("full", False), ("gated", True)):
+            vad.ENABLED = enabled
+            (segments, first_s), wall_s = timed(run, samples, args.size)
+            result[mode] = {"wall_s": round(wall_s, 3), "rtf": round(wall_s / duration, 4),
+                            "first_segment_s": round(first_s, 3) if first_s is not None else None,
+                            "segments": len(segments)}
+            if enabled:
+                # Every gated segment should start inside an active region of the original audio
+                starts = np.array([segment.start for segment in segments])
+                inside = ((starts[:, None] >= activity.regions[:, 0] - 1e-6) &
+                          (starts[:, None] <= activity.regions[:, 1] + 1e-6)).any(axis=1) if len(starts) else []
+                result[mode]["starts_in_active_regions"] = bool(np.all(inside))
+        result["latency_change"] = round(result["gated"]["wall_s"] / result["full"]["wall_s"] - 1, 3)
+        runs.append(result)
+
+    write_report("vad", {"size": args.size, "stub": args.stub, "runs": runs}, args.json)
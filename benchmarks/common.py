@@ -0,0 +1,45 @@
+# ---------------------------
+# Shared helpers for the benchmark scripts in this directory.
+import os
+import sys
+import json
+import time
+import platform
+import resource
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND_DIR = os.path.join(ROOT_DIR, "main")
+FIXTURE_VOCALS = os.path.join(ROOT_DIR, "output", "tpbilingualtesting", "vocals.wav")
+
+# Benchmarks import the pipeline modules the same way the scripts in main/ do
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+def timed(fn, *args, **kwargs):
+    """Calls fn and returns (result, wall seconds)."""
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def machine_info():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+def write_report(name, results, path=None):
+    """Prints a JSON report and writes it to path when given."""
+    report = {"benchmark": name, "machine": machine_info(), "results": results}
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    print(text)
+    if path:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+    return report
@@ -0,0 +1,100 @@
+# ---------------------------
+# Stand-ins for the model-backed stages, so the benchmarks and the pipeline
+# plumbing can be exercised on a plain CPU box without Spleeter or Whisper.
+#
+# Both stubs do real (if cheap) NumPy work proportional to the input length,
+# so timings still scale with audio duration.
+from collections import namedtuple
+
+import numpy as np
+
+StubSegment = namedtuple(
+    "StubSegment", ["start", "end", "text", "avg_logprob", "no_speech_prob", "compression_ratio"]
+)
+StubInfo = namedtuple("StubInfo", ["duration", "language", "language_probability", "all_language_probs"])
+
+LYRIC_LINES = [
+    "तुम ही हो अब तुम ही हो",
+    "ज़िंदगी अब तुम ही हो",
+    "चैन भी मेरा दर्द भी",
+    "मेरी आशिक़ी अब तुम ही हो",
+    "we were young and we were free",
+    "दिल ये मेरा tell me why",
+    "i will follow you wherever you go",
+    "तेरे बिना जिया जाए ना",
+]
+
+def lyric_line(index):
+    return LYRIC_LINES[index % len(LYRIC_LINES)]
+
+class StubSeparator:
+    """Mimics spleeter's Separator.separate: frame-wise FFT masking into two stems."""
+
+    def separate(self, waveform, frame=4096):
+        waveform = np.asarray(waveform, dtype=np.float32)
+        usable = len(waveform) - len(waveform) % frame
+        frames = waveform[:usable].reshape(-1, frame, waveform.shape[1])
+        spectrum = np.fft.rfft(frames, axis=1)
+        mask = np.zeros(spectrum.shape[1], dtype=np.float32)
+        mask[spectrum.shape[1] // 40: spectrum.shape[1] // 6] = 1.0  # rough vocal band
+        vocals = np.fft.irfft(spectrum * mask[None, :, None], frame, axis=1).reshape(-1, waveform.shape[1])
+        vocals = np.concatenate([vocals, np.zeros((len(waveform) - usable, waveform.shape[1]))])
+        vocals = vocals.astype(np.float32)
+        return {"vocals": vocals, "accompaniment": waveform - vocals}
+
+class StubWhisperModel:
+    """Mimics WhisperModel.transcribe: one segment per segment_seconds of audio, decoded lazily."""
+
+    def __init__(self, size="stub", segment_seconds=4.0, sample_rate=16000):
+        self.size = size
+        self.segment_seconds = segment_seconds
+        self.sample_rate = sample_rate
+
+    def transcribe(self, audio, language=None, **options):
+        audio = np.asarray(audio, dtype=np.float32)
+        duration = len(audio) / self.sample_rate
+        step = int(self.segment_seconds * self.sample_rate)
+
+        def segments():
+            for index, start in enumerate(range(0, len(audio), step)):
+                window = audio[start:start + step]
+                # Stand-in for the encoder: a log-mel-ish spectrum of the window
+                energy = float(np.log1p(np.abs(np.fft.rfft(window)).mean())) if len(window) else 0.0
+                yield StubSegment(
+                    start / self.sample_rate,
+                    min((start + step) / self.sample_rate, duration),
+                    " " + lyric_line(index),
+                    -0.3 - 0.1 * (index % 5) - 0.01 * energy,
+                    0.05 * (index % 3),
+                    1.4,
+                )
+
+        # Language "detection": the share of Hindi lines the audio would be decoded to
+        lines = [lyric_line(index) for index in range(max(1, -(-len(audio) // step)))]
+        hindi = sum(not line.isascii() for line in lines) / len(lines)
+        probs = sorted([("hi", hindi), ("en", 1.0 - hindi)], key=lambda pair: -pair[1])
+        detected, probability = (language, 1.0) if language else probs[0]
+        return segments(), StubInfo(duration, detected, probability, probs)
+
+def stub_model_factory(size, device, compute_type, cpu_threads, num_workers=1):
+    return StubWhisperModel(size)
+
+def stub_load_audio(audio_path, sample_rate=44100, duration=None):
+    """separator.load_audio for 16-bit WAV inputs, without Spleeter's ffmpeg adapter."""
+    from audio import read_wav, resample
+    waveform, rate = read_wav(audio_path)
+    if duration is not None:
+        waveform = waveform[:int(duration * rate)]
+    if waveform.ndim == 1:
+        waveform = waveform[:, None]
+    if rate != sample_rate:
+        waveform = np.stack([resample(waveform[:, c], rate, sample_rate) for c in range(waveform.shape[1])], 1)
+    return waveform
+
+def install():
+    """Routes transcriber.load_model, separator.separate and separator.load_audio to the stubs."""
+    import separator
+    import transcriber
+    transcriber.model_factory = stub_model_factory
+    separator.set_separator(StubSeparator())
+    separator.load_audio = stub_load_audio
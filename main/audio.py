@@ -0,0 +1,101 @@
+# ---------------------------
+# In-memory audio helpers shared by the pipeline stages.
+#
+# Audio is passed between stages as float32 NumPy arrays: (n_samples, channels)
+# at the separator's rate, and 1-D mono at WHISPER_RATE for the transcriber,
+# which is what faster-whisper would otherwise re-decode and resample to.
+import wave
+import numpy as np
+
+WHISPER_RATE = 16000
+
+def to_mono(waveform):
+    waveform = np.asarray(waveform, dtype=np.float32)
+    if waveform.ndim == 1:
+        return waveform
+    return waveform.mean(axis=1, dtype=np.float32)
+
+def resample(samples, orig_rate, target_rate):
+    """Band-limited resampling of a 1-D signal through the FFT (like scipy.signal.resample)."""
+    if orig_rate == target_rate or len(samples) == 0:
+        return np.asarray(samples, dtype=np.float32)
+    n_out = int(round(len(samples) * target_rate / orig_rate))
+    if n_out == 0:
+        return np.zeros(0, dtype=np.float32)
+    spectrum = np.fft.rfft(samples)
+    n_bins = n_out // 2 + 1
+    if n_bins <= len(spectrum):
+        spectrum = spectrum[:n_bins]
+    else:
+        spectrum = np.concatenate([spectrum, np.zeros(n_bins - len(spectrum), dtype=spectrum.dtype)])
+    out = np.fft.irfft(spectrum, n_out) * (n_out / len(samples))
+    return out.astype(np.float32)
+
+def to_whisper_input(waveform, sample_rate):
+    """Downmixes and resamples a waveform to the 16 kHz mono float32 faster-whisper expects."""
+    return resample(to_mono(waveform), sample_rate, WHISPER_RATE)
+
+def to_pcm16(samples):
+    return (np.clip(np.asarray(samples, dtype=np.float32), -1.0, 1.0) * 32767).astype("<i2")
+
+def open_wav_writer(path, sample_rate, channels=1):
+    """Opens a 16-bit PCM WAV for writing in pieces with f.writeframes(to_pcm16(samples).tobytes())."""
+    f = wave.open(path, "wb")
+    f.setnchannels(channels)
+    f.setsampwidth(2)
+    f.setframerate(sample_rate)
+    return f
+
+def write_wav(path, samples, sample_rate):
+    """Writes float32 samples in [-1, 1] as 16-bit PCM."""
+    samples = np.asarray(samples, dtype=np.float32)
+    channels = 1 if samples.ndim == 1 else samples.shape[1]
+    with open_wav_writer(path, sample_rate, channels) as f:
+        f.writeframes(to_pcm16(samples).tobytes())
+
+def read_wav(path):
+    """Reads a 16-bit PCM WAV into (float32 samples, sample_rate)."""
+    with wave.open(path, "rb") as f:
+        channels = f.getnchannels()
+        sample_rate = f.getframerate()
+        if f.getsampwidth() != 2:
+            raise ValueError(f"Unsupported sample width in {path}")
+        pcm = np.frombuffer(f.readframes(f.getnframes()), dtype="<i2")
+    samples = pcm.astype(np.float32) / 32768.0
+    if channels > 1:
+        samples = samples.reshape(-1, channels)
+    return samples, sample_rate
+
+def wav_layout(path):
+    """Returns (data offset, n_frames, channels, sample_rate) of a 16-bit PCM WAV, without reading its data."""
+    with wave.open(path, "rb") as f:
+        if f.getsampwidth() != 2:
+            raise ValueError(f"Unsupported sample width in {path}")
+        channels, sample_rate, n_frames = f.getnchannels(), f.getframerate(), f.getnframes()
+    # wave does not expose where the data chunk starts, so walk the RIFF chunks
+    with open(path, "rb") as f:
+        f.seek(12)
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError(f"No data chunk in {path}")
+            size = int.from_bytes(header[4:], "little")
+            if header[:4] == b"data":
+                return f.tell(), n_frames, channels, sample_rate
+            f.seek(size + (size & 1), 1)
+
+def read_wav_window(path, start_frame, n_frames, layout=None):
+    """Reads n_frames from start_frame of a 16-bit PCM WAV as float32, through a short-lived memmap.
+
+    The mapping only covers the window and is dropped before returning, so
+    reading an hour-long file window by window keeps memory flat.
+    """
+    offset, total, channels, _ = layout or wav_layout(path)
+    n_frames = max(0, min(n_frames, total - start_frame))
+    if not n_frames:
+        return np.zeros((0, channels) if channels > 1 else 0, dtype=np.float32)
+    pcm = np.memmap(path, dtype="<i2", mode="r", offset=offset + start_frame * channels * 2,
+                    shape=(n_frames, channels))
+    samples = pcm.astype(np.float32) / 32768.0
+    del pcm
+    return samples if channels > 1 else samples[:, 0]
@@ -0,0 +1,179 @@
+# ---------------------------
+# Non-interactive batch transcription for back-catalog ingestion.
+#
+# Separation and transcription run as overlapping stages, each with its own
+# bounded worker pool, so song N+1 is being separated while song N is being
+# transcribed. Progress is appended to a JSON-lines state file; re-running the
+# same command after a crash skips every song already marked done.
+#
+#   python batch.py songs/ --language hindi --out lyrics/
+#   python batch.py songs/ --language auto --out lyrics/
+#   python batch.py manifest.txt --language bilingual --mode 2 --transcribers 2
+#   python batch.py songs/ --language english --format srt
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from segments import FORMATS
+
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".ogg", ".flac", ".m4a")
+
+# -----------------------
+def find_songs(source):
+    """Lists the songs in a directory (recursively) or in a manifest file with one path per line."""
+    if os.path.isdir(source):
+        songs = []
+        for root, _, files in os.walk(source):
+            songs.extend(
+                os.path.join(root, name) for name in sorted(files)
+                if name.lower().endswith(AUDIO_EXTENSIONS)
+            )
+        return sorted(songs)
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source, "r", encoding="utf-8") as f:
+        lines = [line.strip() for line in f]
+    return [
+        line if os.path.isabs(line) else os.path.join(base, line)
+        for line in lines if line and not line.startswith("#")
+    ]
+
+def lyrics_function(language, mode=None):
+    """Returns vocals -> Segments for the chosen language pipeline (vocals: 16 kHz array or path)."""
+    if language == "english":
+        import main as pipeline
+        return lambda vocals: pipeline.lyrics_from_vocals(vocals, on_segment=None)
+    if language == "hindi":
+        import hindi1
+        return lambda vocals: hindi1.lyrics_from_vocals(vocals, mode or "cleaned", on_segment=None)
+    if language == "bilingual":
+        import bilingual
+        return lambda vocals: bilingual.lyrics_from_vocals(vocals, mode or "1", on_segment=None)
+    if language == "auto":
+        import router
+        return lambda vocals: router.lyrics_from_vocals(vocals, on_segment=None)[0]
+    raise ValueError(f"Unknown language: {language}")
+
+# -----------------------
+class BatchState:
+    """Append-only JSON-lines record of finished songs, used to resume after a crash."""
+
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line from a crash
+                    if record.get("status") == "done":
+                        self.done.add(record["song"])
+
+    def record(self, **fields):
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(fields, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            if fields.get("status") == "done":
+                self.done.add(fields["song"])
+
+def output_path(song, source, out_dir, fmt="txt"):
+    if os.path.isdir(source):
+        rel = os.path.relpath(song, source)
+    else:
+        rel = os.path.basename(song)
+    return os.path.join(out_dir, os.path.splitext(rel)[0] + "." + fmt)
+
+def run_batch(source, language, out_dir, state_path, mode=None, separators=1, transcribers=1, fmt="txt"):
+    from separator import separate_vocals
+    from governor import governor
+    from library import save as add_to_library
+    # Overlapping separations and transcriptions split the cores instead of each taking all of them
+    governor.set_slots(separators + transcribers)
+
+    songs = [os.path.abspath(song) for song in find_songs(source)]
+    os.makedirs(os.path.dirname(os.path.abspath(state_path)), exist_ok=True)
+    state = BatchState(state_path)
+    pending = [song for song in songs if song not in state.done]
+    print(f"[INFO] {len(songs)} songs found, {len(songs) - len(pending)} already done, {len(pending)} to process.", flush=True)
+    if not pending:
+        return 0
+    to_lyrics = lyrics_function(language, mode)
+
+    # Songs separated but not yet transcribed are bounded, so a fast separation
+    # stage cannot pile up stems faster than transcription drains them.
+    in_flight = threading.Semaphore(separators + transcribers)
+    failures = []
+    start = time.perf_counter()
+
+    def transcribe_stage(song, vocals, separated_s):
+        try:
+            t0 = time.perf_counter()
+            lyrics = to_lyrics(vocals)
+            transcribed_s = time.perf_counter() - t0
+            out_file = output_path(song, source, out_dir, fmt)
+            os.makedirs(os.path.dirname(out_file), exist_ok=True)
+            with open(out_file, "w", encoding="utf-8") as f:
+                f.write(lyrics.serialize(fmt) if lyrics else "")
+            add_to_library(song, lyrics, language)
+            state.record(song=song, status="done", output=out_file,
+                         separate_s=round(separated_s, 2), transcribe_s=round(transcribed_s, 2))
+            print(f"[SUCCESS] {os.path.basename(song)} -> {out_file}", flush=True)
+        except Exception as e:
+            failures.append(song)
+            state.record(song=song, status="failed", stage="transcribe", error=str(e))
+            print(f"[ERROR] Transcription failed for {song}: {e}", flush=True)
+        finally:
+            in_flight.release()
+
+    with ThreadPoolExecutor(max_workers=transcribers, thread_name_prefix="transcribe") as transcribe_pool:
+        def separate_stage(song):
+            try:
+                t0 = time.perf_counter()
+                # Whole songs: the stages already overlap across songs
+                vocals = separate_vocals(song, overlap=False)
+                transcribe_pool.submit(transcribe_stage, song, vocals, time.perf_counter() - t0)
+            except Exception as e:
+                failures.append(song)
+                state.record(song=song, status="failed", stage="separate", error=str(e))
+                print(f"[ERROR] Separation failed for {song}: {e}", flush=True)
+                in_flight.release()
+
+        with ThreadPoolExecutor(max_workers=separators, thread_name_prefix="separate") as separate_pool:
+            for song in pending:
+                in_flight.acquire()
+                separate_pool.submit(separate_stage, song)
+
+    elapsed = time.perf_counter() - start
+    finished = len(pending) - len(failures)
+    rate = finished / elapsed * 3600 if elapsed else 0.0
+    print(f"[SUCCESS] Batch complete: {finished} done, {len(failures)} failed in {elapsed:.1f}s ({rate:.1f} songs/hour).", flush=True)
+    return 1 if failures else 0
+
+# ---------- Entry ----------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Transcribe a directory or manifest of songs.")
+    parser.add_argument("source", help="Directory of audio files or a manifest with one path per line")
+    parser.add_argument("--language", choices=["auto", "english", "hindi", "bilingual"], required=True)
+    parser.add_argument("--mode", default=None,
+                        help="hindi: raw/cleaned/romanized; bilingual: 1 (original) or 2 (romanized)")
+    parser.add_argument("--out", default="batch_output", help="Directory for the lyrics files")
+    parser.add_argument("--format", choices=FORMATS, default="txt",
+                        help="Lyrics file format: timestamped text, JSON, SRT subtitles or LRC")
+    parser.add_argument("--state", default=None, help="Resume manifest (default: <out>/batch_state.jsonl)")
+    parser.add_argument("--separators", type=int, default=1, help="Separation workers")
+    parser.add_argument("--transcribers", type=int, default=1, help="Transcription workers")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.source):
+        print("[ERROR] Source not found. Please check the path.")
+        sys.exit(1)
+    state_path = args.state or os.path.join(args.out, "batch_state.jsonl")
+    sys.exit(run_batch(args.source, args.language, args.out, state_path,
+                       args.mode, args.separators, args.transcribers, args.format))
@@ -1,71 +1,55 @@
 import os
-import subprocess
 import re
 import sys
-from indic_transliteration.sanscript import transliterate, DEVANAGARI, ITRANS
-from faster_whisper import WhisperModel
-import torch
+from transcriber import transcribe_stream, report_segment
+from segments import Segments
+from romanize import romanize_line, romanize_text
+from worker import submit_or_run
+from events import emit
+
+# Model used when the caller does not pick one (see router.py for automatic routing)
+MODEL_SIZE = "large-v2"
 
 # Step 1: Spleeter - Extract Vocals
 def extract_vocals(audio_path):
     print("[INFO] Extracting vocals using Spleeter...", flush=True)
-    subprocess.run([
-        "spleeter", "separate", "-p", "spleeter:2stems",
-        "-o", "output", audio_path
-    ], check=True)
-    base_name = os.path.splitext(os.path.basename(audio_path))[0]
-    vocals_path = os.path.join("output", base_name, "vocals.wav")
-    if not os.path.exists(vocals_path):
-        raise FileNotFoundError("[ERROR] Vocals file not found.")
+    from separator import separate_vocals
+    vocals = separate_vocals(audio_path)
     print("[SUCCESS] Vocals extracted.", flush=True)
-    return vocals_path
+    return vocals
 
 # Step 2: FasterWhisper - Transcribe
-def transcribe_audio(audio_path):
+def transcribe_audio(audio, size=MODEL_SIZE, **options):
+    """Yields (segment, progress) for each segment as soon as it is decoded."""
     print("[INFO] Transcribing with FasterWhisper...", flush=True)
-    model = WhisperModel("large-v2", device="cuda" if torch.cuda.is_available() else "cpu", compute_type="float16" if torch.cuda.is_available() else "int8")
-    segments, info = model.transcribe(audio_path)
+    info, segments = transcribe_stream(audio, size, **options)
+    print(f"[INFO] Audio duration: {info.duration:.2f}s", flush=True)
+    yield from segments
     print(f"[SUCCESS] Transcription complete. Duration: {info.duration:.2f}s", flush=True)
-    text = ""
-    for segment in segments:
-        timestamp = f"[{segment.start:.2f}-{segment.end:.2f}]"
-        text += f"{timestamp} {segment.text.strip()}\n"
-    return text.strip()
 
 # Step 3: Offline Clean-Up
+def clean_text(text):
+    text = text.strip()
+    # Capitalize English, leave Hindi as-is
+    if re.search(r'[\u0900-\u097F]', text):  # Hindi
+        return text
+    return text.capitalize()
+
 def clean_transcription(text):
     print("[INFO] Cleaning transcription (offline)...", flush=True)
-    cleaned_lines = []
-    for line in text.splitlines():
-        line = line.strip()
-        if not line:
-            continue
-            
-        # Extract timestamp if present
-        timestamp = ""
-        content = line
-        if line.startswith("[") and "]" in line:
-            timestamp = line[:line.find("]")+1]
-            content = line[line.find("]")+1:].strip()
-            
-        # Capitalize English, leave Hindi as-is
-        if re.search(r'[\u0900-\u097F]', content):  # Hindi
-            cleaned_lines.append(f"{timestamp} {content}" if timestamp else content)
-        else:
-            cleaned_lines.append(f"{timestamp} {content.capitalize()}" if timestamp else content.capitalize())
-    cleaned = '\n'.join(cleaned_lines)
+    cleaned = Segments.from_text(text).map_text(clean_text)
     print("[SUCCESS] Cleaned lyrics ready.", flush=True)
     return cleaned
 
 # Step 4: Romanize Hindi
+def transliterate_line(line):
+    # Only the Devanagari words are transliterated; repeated lines come from the cache
+    return romanize_line(line)
+
 def transliterate_lyrics(text):
     print("🔡 Romanizing Hindi lyrics (ITRANS)...")
     try:
-        def transliterate_line(line):
-            if re.search(r'[\u0900-\u097F]', line):
-                return transliterate(line, DEVANAGARI, ITRANS).lower()
-            return line
-        romanized = '\n'.join([transliterate_line(l) for l in text.splitlines()])
+        romanized = romanize_text(text)
         with open("bilingual_romanized.txt", "w", encoding="utf-8") as f:
             f.write(romanized)
         print("[SUCCESS] Romanized lyrics saved.")
@@ -74,6 +58,37 @@ def transliterate_lyrics(text):
         print(f"[ERROR] Transliteration error: {e}")
         return None
 
+# One decoded segment in the chosen script ("1" original, "2" romanized); "" drops it
+def format_line(text, mode="1"):
+    text = clean_text(text)
+    if text and mode == "2":
+        text = transliterate_line(text)
+    return text
+
+# Transcribe + clean (+ romanize), reporting each segment as it arrives
+def lyrics_from_vocals(vocals, mode="1", on_segment=report_segment, size=MODEL_SIZE, **options):
+    # Clean (and romanize) each segment as it arrives so lyrics show up while decoding continues
+    print("[INFO] Cleaning transcription (offline) as segments arrive...", flush=True)
+    if mode == "2":
+        print("🔡 Romanizing Hindi lyrics (ITRANS)...")
+    lyrics = Segments()
+    for segment, progress in transcribe_audio(vocals, size, **options):
+        try:
+            text = format_line(segment.text, mode)
+        except Exception as e:
+            print(f"[ERROR] Transliteration error: {e}")
+            return None
+        if not text:
+            continue
+        lyrics.append_segment(segment, text)
+        if on_segment:
+            on_segment(lyrics.line(-1), progress)
+    if mode == "2":
+        print("[SUCCESS] Romanized lyrics ready.")
+    else:
+        print("[SUCCESS] Cleaned lyrics ready.")
+    return lyrics
+
 # Step 5: Menu to choose final output
 def offer_menu():
     print("\nWhich lyrics would you like to save as final output?")
@@ -99,41 +114,38 @@ def offer_menu():
     else:
         print("⚠️ Invalid choice.")
 
-# Full pipeline
-def process_bilingual_song(audio_path):
+# Ask which script the lyrics should be in
+def ask_mode():
     print("\nHow do you want your lyrics?")
     print("1. Original script (Hindi in Devanagari, English as-is)")
     print("2. Romanized (Hindi in Latin/English, English as-is)")
-    mode = input("Enter 1 or 2: ").strip()
-    vocals_path = extract_vocals(audio_path)
-    transcription = transcribe_audio(vocals_path)
-    cleaned = clean_transcription(transcription)
-    output = None
-    if mode == "2":
-        print("🔡 Romanizing Hindi lyrics (ITRANS)...")
-        try:
-            def transliterate_line(line):
-                if re.search(r'[\u0900-\u097F]', line):
-                    return transliterate(line, DEVANAGARI, ITRANS).lower()
-                return line
-            output = '\n'.join([transliterate_line(l) for l in cleaned.splitlines()])
-            print("[SUCCESS] Romanized lyrics ready.")
-        except Exception as e:
-            print(f"[ERROR] Transliteration error: {e}")
-            return
-    else:
-        output = cleaned
-        print("[SUCCESS] Cleaned lyrics ready.")
+    return input("Enter 1 or 2: ").strip()
+
+# Full pipeline
+def process_bilingual_song(audio_path, mode=None, out_dir="."):
+    if mode is None:
+        mode = ask_mode()
+    vocals = extract_vocals(audio_path)
+    lyrics = lyrics_from_vocals(vocals, mode)
+    if lyrics is None:
+        return
+    output = lyrics.to_text()
     # Save only the selected output
-    with open("bilingual_output.txt", "w", encoding="utf-8") as f:
+    output_file = os.path.join(out_dir, "bilingual_output.txt")
+    with open(output_file, "w", encoding="utf-8") as f:
         f.write(output)
-    print("[SUCCESS] Final output saved as bilingual_output.txt.")
+    print(f"[SUCCESS] Final output saved as {output_file}.")
+    
+    from library import save as add_to_library
+    add_to_library(audio_path, lyrics, "bilingual")
+    emit("result", lyrics=output, output_file=output_file, segments=lyrics.to_dict())
     
-    # Print the lyrics for Streamlit to capture
+    # Print the lyrics for the console
     print("\n" + "="*50)
     print("LYRICS OUTPUT:")
     print("="*50)
     print(output)
+    return output
 
 # ---------- Entry ----------
 if __name__ == "__main__":
@@ -146,7 +158,11 @@ if __name__ == "__main__":
             print("[ERROR] File not found. Please check the path.")
             sys.exit(1)
         else:
-            process_bilingual_song(path)
+            mode = ask_mode()
+            submit_or_run(
+                {"kind": "bilingual", "audio_path": path, "mode": mode},
+                lambda: process_bilingual_song(path, mode),
+            )
     else:
         # Interactive mode
         print("*** Bilingual Song Lyrics Processor (Offline Mode) ***")
@@ -154,4 +170,8 @@ if __name__ == "__main__":
         if not os.path.exists(path):
             print("[ERROR] File not found. Please check the path.")
         else:
-            process_bilingual_song(path)
+            mode = ask_mode()
+            submit_or_run(
+                {"kind": "bilingual", "audio_path": path, "mode": mode},
+                lambda: process_bilingual_song(path, mode),
+            )
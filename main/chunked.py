@@ -0,0 +1,130 @@
+# ---------------------------
+# Parallel chunked transcription for long tracks.
+#
+# A single model.transcribe() call on CPU uses one decoding stream. Here the
+# vocals are split into overlapping windows that are decoded in a pool of
+# worker processes, then stitched back together on the original timeline.
+# Each window only keeps the segments whose midpoint falls in the part of the
+# window it "owns" (the overlap is split down the middle), which removes the
+# duplicates the overlap produces.
+import os
+import threading
+import multiprocessing
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from governor import governor
+
+SAMPLE_RATE = 16000
+TRANSCRIBE_WORKERS = int(os.getenv("LYRICS_TRANSCRIBE_WORKERS", "1"))
+WINDOW_SECONDS = float(os.getenv("LYRICS_CHUNK_SECONDS", "120"))
+OVERLAP_SECONDS = float(os.getenv("LYRICS_CHUNK_OVERLAP_SECONDS", "10"))
+
+# Picklable stand-ins for faster-whisper's Segment/TranscriptionInfo
+Segment = namedtuple("Segment", ["start", "end", "text", "avg_logprob", "no_speech_prob", "compression_ratio"])
+ChunkedInfo = namedtuple("ChunkedInfo", ["duration", "language"])
+
+def plan_windows(duration, window=WINDOW_SECONDS, overlap=OVERLAP_SECONDS):
+    """Returns (start, end) times in seconds of overlapping windows covering duration."""
+    if duration <= window:
+        return [(0.0, duration)]
+    step = window - overlap
+    windows = []
+    start = 0.0
+    while True:
+        end = min(start + window, duration)
+        windows.append((start, end))
+        if end >= duration:
+            return windows
+        start += step
+
+def owned_range(index, windows):
+    """Part of window index whose segments are kept: the overlaps are split at their midpoint."""
+    start, end = windows[index]
+    lo = (start + windows[index - 1][1]) / 2 if index > 0 else float("-inf")
+    hi = (end + windows[index + 1][0]) / 2 if index < len(windows) - 1 else float("inf")
+    return lo, hi
+
+def owned_segments(index, segments, windows):
+    """Segments of window index (already on the global timeline) that this window owns."""
+    lo, hi = owned_range(index, windows)
+    return [s for s in segments if lo <= (s.start + s.end) / 2 < hi]
+
+# -----------------------
+# Pool workers: each process loads its own model once and keeps it resident
+_worker_options = {}
+
+def _init_worker(size, cpu_threads):
+    _worker_options["size"] = size
+    _worker_options["cpu_threads"] = cpu_threads
+
+def _transcribe_window(audio, offset, options):
+    from transcriber import load_model
+    model = load_model(_worker_options["size"], cpu_threads=_worker_options["cpu_threads"])
+    segments, info = model.transcribe(audio, **options)
+    return info.language, [
+        Segment(segment.start + offset, segment.end + offset, segment.text,
+                segment.avg_logprob, segment.no_speech_prob, segment.compression_ratio)
+        for segment in segments
+    ]
+
+_pools = {}
+# Concurrent jobs in the worker may ask for the same pool at once
+_pools_lock = threading.Lock()
+
+def get_pool(size, workers):
+    """Returns a resident process pool for (size, workers), splitting the cores between workers."""
+    key = (size, workers)
+    with _pools_lock:
+        if key not in _pools:
+            cpu_threads = max(1, governor.cores // workers)
+            _pools[key] = ProcessPoolExecutor(
+                max_workers=workers,
+                # Forking a process that already runs CTranslate2/TF threads is unsafe
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(size, cpu_threads),
+            )
+        return _pools[key]
+
+def decode_audio(audio):
+    """Returns 16 kHz mono float32 samples for a path or an already-decoded array."""
+    if isinstance(audio, str):
+        from faster_whisper import decode_audio as fw_decode_audio
+        return fw_decode_audio(audio, sampling_rate=SAMPLE_RATE)
+    return audio
+
+def transcribe_chunked(audio, size, workers=TRANSCRIBE_WORKERS,
+                       window=WINDOW_SECONDS, overlap=OVERLAP_SECONDS, **options):
+    """Same contract as transcriber.transcribe_stream, decoding windows in parallel.
+
+    Segments are yielded in timeline order as soon as every window that can
+    contribute to them has finished.
+    """
+    from transcriber import transcribe_single
+    audio = decode_audio(audio)
+    duration = len(audio) / SAMPLE_RATE
+    windows = plan_windows(duration, window, overlap)
+    if len(windows) == 1:
+        # Short track: not worth shipping to the pool
+        return transcribe_single(audio, size, **options)
+    pool = get_pool(size, workers)
+    futures = [
+        pool.submit(
+            _transcribe_window,
+            audio[int(start * SAMPLE_RATE):int(end * SAMPLE_RATE)],
+            start,
+            options,
+        )
+        for start, end in windows
+    ]
+    print(f"[INFO] Chunked transcription: {len(windows)} windows on {workers} workers", flush=True)
+    language = options.get("language")
+
+    def stream():
+        for index, future in enumerate(futures):
+            _, segments = future.result()
+            for segment in owned_segments(index, segments, windows):
+                progress = min(segment.end / duration, 1.0) if duration else 0.0
+                yield segment, progress
+
+    return ChunkedInfo(duration, language), stream()
@@ -0,0 +1,179 @@
+# ---------------------------
+# Structured pipeline events.
+#
+# Stages report what they are doing as small dicts ("events") instead of
+# free-form [INFO] lines that consumers have to string-match:
+#
+#   {"event": "stage_start", "stage": "separate", "ts": ...}
+#   {"event": "stage_end", "stage": "separate", "status": "ok", "duration_s": 41.2, "bytes": 5242880}
+#   {"event": "segment", "text": "[0.00-3.20] ...", "progress": 0.01}
+#   {"event": "result", "lyrics": "...", "output_file": "lyrics_output.txt"}
+#
+# Events go to every registered sink: the worker forwards them to its client,
+# LYRICS_EVENTS_FILE appends them as JSON lines ("-" for stdout) and
+# LYRICS_METRICS_FILE receives stage latencies in Prometheus text format.
+import os
+import sys
+import json
+import time
+import atexit
+import threading
+import contextlib
+
+EVENTS_FILE = os.getenv("LYRICS_EVENTS_FILE")
+METRICS_FILE = os.getenv("LYRICS_METRICS_FILE")
+
+_sinks = []
+_sinks_lock = threading.Lock()
+# Sinks that only see events emitted from the current thread (one job per thread)
+_local = threading.local()
+
+def add_sink(sink):
+    with _sinks_lock:
+        _sinks.append(sink)
+
+def remove_sink(sink):
+    with _sinks_lock:
+        _sinks.remove(sink)
+
+@contextlib.contextmanager
+def job_sink(sink):
+    """Routes events emitted by this thread to sink for the duration of the block."""
+    stack = getattr(_local, "sinks", None)
+    if stack is None:
+        stack = _local.sinks = []
+    stack.append(sink)
+    try:
+        yield
+    finally:
+        stack.remove(sink)
+
+def bind_thread(fn):
+    """Wraps fn so that, run in another thread, it reports to this thread's job sinks too."""
+    sinks = list(getattr(_local, "sinks", ()))
+
+    def run(*args, **kwargs):
+        _local.sinks = list(sinks)
+        return fn(*args, **kwargs)
+
+    return run
+
+def emit(event, **fields):
+    record = {"event": event, "ts": round(time.time(), 3)}
+    record.update(fields)
+    return dispatch(record)
+
+def dispatch(record):
+    """Delivers an already-built event (e.g. one relayed from the worker) to the sinks."""
+    with _sinks_lock:
+        sinks = list(_sinks)
+    sinks.extend(getattr(_local, "sinks", ()))
+    for sink in sinks:
+        sink(record)
+    return record
+
+@contextlib.contextmanager
+def stage(name, **fields):
+    """Emits stage_start/stage_end around a block; the block may add fields to the yielded dict."""
+    emit("stage_start", stage=name, **fields)
+    details = {}
+    start = time.perf_counter()
+    try:
+        yield details
+    except BaseException as e:
+        emit("stage_end", stage=name, status="error", error=str(e),
+             duration_s=round(time.perf_counter() - start, 4), **details)
+        raise
+    emit("stage_end", stage=name, status="ok",
+         duration_s=round(time.perf_counter() - start, 4), **details)
+
+# -----------------------
+# Sinks
+class JsonLinesSink:
+    """Appends every event as one JSON line to a file (or stdout for "-")."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __call__(self, record):
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            if self.path == "-":
+                sys.__stdout__.write(line + "\n")
+                sys.__stdout__.flush()
+            else:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+
+class StageMetrics:
+    """Aggregates stage latencies and counters, exportable as Prometheus text."""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.stages = {}  # stage -> [count, sum, max, bytes, errors]
+        self.segments = 0
+        self.jobs = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, record):
+        event = record["event"]
+        with self._lock:
+            if event == "stage_end":
+                stats = self.stages.setdefault(record["stage"], [0, 0.0, 0.0, 0, 0])
+                stats[0] += 1
+                stats[1] += record.get("duration_s", 0.0)
+                stats[2] = max(stats[2], record.get("duration_s", 0.0))
+                stats[3] += record.get("bytes", 0)
+                stats[4] += record.get("status") == "error"
+            elif event == "segment":
+                self.segments += 1
+            elif event == "job_end":
+                status = record.get("status", "ok")
+                self.jobs[status] = self.jobs.get(status, 0) + 1
+        if self.path and event in ("job_end", "result"):
+            self.write(self.path)
+
+    def render(self):
+        with self._lock:
+            lines = [
+                "# HELP lyrics_stage_duration_seconds Wall time spent in each pipeline stage.",
+                "# TYPE lyrics_stage_duration_seconds summary",
+            ]
+            for name, (count, total, _, _, _) in sorted(self.stages.items()):
+                lines.append(f'lyrics_stage_duration_seconds_count{{stage="{name}"}} {count}')
+                lines.append(f'lyrics_stage_duration_seconds_sum{{stage="{name}"}} {total:.4f}')
+            lines += ["# HELP lyrics_stage_duration_seconds_max Slowest run of each stage.",
+                      "# TYPE lyrics_stage_duration_seconds_max gauge"]
+            for name, (_, _, peak, _, _) in sorted(self.stages.items()):
+                lines.append(f'lyrics_stage_duration_seconds_max{{stage="{name}"}} {peak:.4f}')
+            lines += ["# HELP lyrics_stage_bytes_total Input bytes processed by each stage.",
+                      "# TYPE lyrics_stage_bytes_total counter"]
+            for name, (_, _, _, size, _) in sorted(self.stages.items()):
+                lines.append(f'lyrics_stage_bytes_total{{stage="{name}"}} {size}')
+            lines += ["# HELP lyrics_stage_errors_total Failed runs of each stage.",
+                      "# TYPE lyrics_stage_errors_total counter"]
+            for name, (_, _, _, _, errors) in sorted(self.stages.items()):
+                lines.append(f'lyrics_stage_errors_total{{stage="{name}"}} {errors}')
+            lines += ["# HELP lyrics_segments_total Transcribed segments.",
+                      "# TYPE lyrics_segments_total counter",
+                      f"lyrics_segments_total {self.segments}",
+                      "# HELP lyrics_jobs_total Finished jobs by status.",
+                      "# TYPE lyrics_jobs_total counter"]
+            for status, count in sorted(self.jobs.items()):
+                lines.append(f'lyrics_jobs_total{{status="{status}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(tmp, path)
+
+metrics = StageMetrics(METRICS_FILE)
+add_sink(metrics)
+if METRICS_FILE:
+    # Also covers runs (e.g. batch) that never emit a job_end
+    atexit.register(metrics.write, METRICS_FILE)
+if EVENTS_FILE:
+    add_sink(JsonLinesSink(EVENTS_FILE))
@@ -0,0 +1,219 @@
+# ---------------------------
+# Acoustic fingerprints, so re-encodings of a song share its stems and lyrics.
+#
+# The stem and result caches are keyed by the SHA-256 of the uploaded bytes,
+# so the same song as an MP3, a WAV or a FLAC, or at another bitrate, misses
+# them all and is separated and transcribed again. The fingerprint is what
+# stays the same across encodings: the constellation of spectral peaks of the
+# first LYRICS_FINGERPRINT_SECONDS of the decoded mix, hashed as pairs of
+# peaks (both frequencies and the time between them). Pairs are looked up in
+# an SQLite index (LYRICS_FINGERPRINT_DB); a song matches when enough of them
+# agree on a single time offset. Every file hash is recorded as an alias of
+# the song key it matched (the file hash of its first upload), so a known file
+# is resolved without decoding it. LYRICS_FINGERPRINT=0 keys everything by
+# the file hash alone.
+import os
+import time
+import sqlite3
+import threading
+from collections import namedtuple
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from audio import to_mono, resample
+from stem_cache import hash_file
+from events import emit
+
+ENABLED = os.getenv("LYRICS_FINGERPRINT", "1") == "1"
+INDEX_PATH = os.getenv(
+    "LYRICS_FINGERPRINT_DB",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "fingerprints.sqlite"),
+)
+SECONDS = float(os.getenv("LYRICS_FINGERPRINT_SECONDS", "30"))
+RATE = 8000
+FFT_SIZE = 1024
+HOP = 256
+# A peak is the loudest bin within this many frames and bins on either side
+PEAK_FRAMES = 3
+PEAK_BINS = 8
+PEAKS_PER_SECOND = 10
+# Each anchor peak is paired with the next FAN_OUT peaks at most MAX_DT frames later
+FAN_OUT = 5
+MAX_DT = 63
+# A match needs this many hashes at one offset, and this share of the query's hashes
+MIN_MATCHES = int(os.getenv("LYRICS_FINGERPRINT_MIN_MATCHES", "20"))
+MIN_RATIO = 0.05
+# Songs whose lengths differ by more than this are different songs (an extended mix, say)
+MAX_DURATION_DIFF_S = 2.0
+
+Match = namedtuple("Match", ["key", "matches", "ratio", "offset_s"])
+
+# -----------------------
+def spectrogram(samples):
+    """Log-magnitude STFT of 8 kHz mono samples, shaped (frames, FFT_SIZE // 2 + 1)."""
+    if len(samples) < FFT_SIZE:
+        return np.zeros((0, FFT_SIZE // 2 + 1), dtype=np.float32)
+    frames = sliding_window_view(samples, FFT_SIZE)[::HOP] * np.hanning(FFT_SIZE).astype(np.float32)
+    return np.log1p(np.abs(np.fft.rfft(frames, axis=1)).astype(np.float32))
+
+def peaks(spec):
+    """(frames, bins) of the strongest local maxima of a spectrogram, ordered by frame."""
+    if not spec.size:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    # The neighbourhood maximum, one axis at a time
+    padded = np.pad(spec, ((PEAK_FRAMES, PEAK_FRAMES), (0, 0)), constant_values=-np.inf)
+    local = sliding_window_view(padded, 2 * PEAK_FRAMES + 1, axis=0).max(axis=-1)
+    padded = np.pad(local, ((0, 0), (PEAK_BINS, PEAK_BINS)), constant_values=-np.inf)
+    local = sliding_window_view(padded, 2 * PEAK_BINS + 1, axis=1).max(axis=-1)
+    frames, bins = np.nonzero((spec == local) & (spec > np.median(spec)))
+    # Keep the strongest, so noise and quiet passages do not flood the index
+    keep = int(PEAKS_PER_SECOND * len(spec) * HOP / RATE) + 1
+    if len(frames) > keep:
+        strongest = np.argpartition(spec[frames, bins], -keep)[-keep:]
+        frames, bins = frames[strongest], bins[strongest]
+    order = np.lexsort((bins, frames))
+    return frames[order], bins[order]
+
+def fingerprint(waveform, sample_rate, seconds=SECONDS):
+    """Returns (hashes, offsets): the peak-pair hashes of the start of a waveform and their anchor frames."""
+    samples = to_mono(waveform)[:int(seconds * sample_rate)]
+    frames, bins = peaks(spectrogram(resample(samples, sample_rate, RATE)))
+    bins = np.minimum(bins, 511)
+    hashes, offsets = [], []
+    for step in range(1, min(FAN_OUT, len(frames) - 1) + 1):
+        anchor, target = slice(0, len(frames) - step), slice(step, len(frames))
+        dt = frames[target] - frames[anchor]
+        valid = (dt >= 1) & (dt <= MAX_DT)
+        hashes.append((bins[anchor] << 15 | bins[target] << 6 | dt)[valid])
+        offsets.append(frames[anchor][valid])
+    if not hashes:
+        # Too short (or too quiet) for a pair of peaks: nothing to look up
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    pairs = np.unique(np.stack([np.concatenate(hashes), np.concatenate(offsets)], axis=1), axis=0)
+    return pairs[:, 0], pairs[:, 1]
+
+# -----------------------
+class FingerprintIndex:
+    """Peak-pair hashes of every song seen, and the file hashes that are encodings of each."""
+
+    def __init__(self, path=INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")  # a lost last entry only means fingerprinting again
+            self._db.execute("CREATE TABLE IF NOT EXISTS songs ("
+                             "id INTEGER PRIMARY KEY, key TEXT UNIQUE NOT NULL, duration_s REAL, hashes INTEGER)")
+            self._db.execute("CREATE TABLE IF NOT EXISTS aliases (file_key TEXT PRIMARY KEY, song_id INTEGER NOT NULL)")
+            # Clustered on the hash, so a lookup is one index range per query hash
+            self._db.execute("CREATE TABLE IF NOT EXISTS hashes (hash INTEGER, song_id INTEGER, offset INTEGER, "
+                             "PRIMARY KEY (hash, song_id, offset)) WITHOUT ROWID")
+            self._db.execute("CREATE TEMP TABLE query (hash INTEGER, offset INTEGER)")
+
+    def song_key(self, file_key):
+        """The song key a file hash was recorded under, or None."""
+        with self._lock:
+            row = self._db.execute("SELECT songs.key FROM aliases JOIN songs ON songs.id = aliases.song_id "
+                                   "WHERE aliases.file_key = ?", (file_key,)).fetchone()
+        return row[0] if row else None
+
+    def songs(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM songs").fetchone()[0]
+
+    def match(self, hashes, offsets, duration_s=None):
+        """Returns the best Match for a fingerprint, or None."""
+        if not len(hashes):
+            return None
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM query")
+            self._db.executemany("INSERT INTO query VALUES (?, ?)", zip(hashes.tolist(), offsets.tolist()))
+            rows = self._db.execute(
+                "SELECT h.song_id, h.offset - q.offset AS delta, COUNT(*) AS n FROM query q "
+                "JOIN hashes h ON h.hash = q.hash GROUP BY h.song_id, delta ORDER BY n DESC LIMIT 32"
+            ).fetchall()
+            self._db.execute("DELETE FROM query")
+        # An encoder's delay or a resampler can split one offset over two neighbouring frames
+        counts = {(song, delta): n for song, delta, n in rows}
+        scored = [(sum(counts.get((song, delta + d), 0) for d in (-1, 0, 1)), song, delta)
+                  for song, delta, _ in rows]
+        for n, song, delta in sorted(scored, reverse=True):
+            if n < MIN_MATCHES or n / len(hashes) < MIN_RATIO:
+                return None
+            with self._lock:
+                key, known_s = self._db.execute("SELECT key, duration_s FROM songs WHERE id = ?", (song,)).fetchone()
+            if duration_s is None or known_s is None or abs(known_s - duration_s) <= MAX_DURATION_DIFF_S:
+                return Match(key, n, round(n / len(hashes), 3), round(delta * HOP / RATE, 3))
+        return None
+
+    def add_song(self, key, hashes, offsets, duration_s=None):
+        """Indexes a new song under key (its file hash is its first alias)."""
+        self.add_songs([(key, hashes, offsets, duration_s)])
+
+    def add_songs(self, songs):
+        """Indexes (key, hashes, offsets, duration_s) songs in one transaction."""
+        with self._lock, self._db:
+            for key, hashes, offsets, duration_s in songs:
+                self._db.execute("INSERT OR IGNORE INTO songs (key, duration_s, hashes) VALUES (?, ?, ?)",
+                                 (key, duration_s, len(hashes)))
+                song = self._db.execute("SELECT id FROM songs WHERE key = ?", (key,)).fetchone()[0]
+                self._db.execute("INSERT OR REPLACE INTO aliases VALUES (?, ?)", (key, song))
+                self._db.executemany("INSERT OR IGNORE INTO hashes VALUES (?, ?, ?)",
+                                     ((h, song, o) for h, o in zip(hashes.tolist(), offsets.tolist())))
+
+    def add_alias(self, file_key, key):
+        """Records file_key as another encoding of the song indexed under key."""
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO aliases SELECT ?, id FROM songs WHERE key = ?", (file_key, key))
+
+_index = None
+
+def get_index():
+    """Returns the process-wide fingerprint index."""
+    global _index
+    if _index is None:
+        _index = FingerprintIndex()
+    return _index
+
+# -----------------------
+def identify(file_key, waveform, sample_rate, duration_s=None):
+    """Returns the song key of a decoded input: an earlier upload's it matches, else its own file_key.
+
+    The input is indexed either way. duration_s defaults to the waveform's
+    length; pass it when only the start was decoded.
+    """
+    if duration_s is None:
+        duration_s = len(waveform) / sample_rate
+    started = time.perf_counter()
+    hashes, offsets = fingerprint(waveform, sample_rate)
+    fingerprint_s = time.perf_counter() - started
+    index = get_index()
+    match = index.match(hashes, offsets, duration_s)
+    lookup_s = time.perf_counter() - started - fingerprint_s
+    if match:
+        index.add_alias(file_key, match.key)
+        print(f"[INFO] Fingerprint match ({file_key[:12]} is {match.key[:12]}: {match.matches} hashes, "
+              f"offset {match.offset_s:+.2f}s), reusing its stems and lyrics.", flush=True)
+    else:
+        index.add_song(file_key, hashes, offsets, duration_s)
+    emit("fingerprint", matched=bool(match), hashes=len(hashes), fingerprint_s=round(fingerprint_s, 4),
+         lookup_s=round(lookup_s, 4), **(match._asdict() if match else {}))
+    return match.key if match else file_key
+
+def song_key(audio_path, load_audio=None, sample_rate=44100, duration_s=None):
+    """Returns (song key, waveform or None) for audio_path.
+
+    A file seen before is resolved from its hash alone. Otherwise it is
+    decoded with load_audio (when given) and identified, and the waveform is
+    handed back so the caller does not decode it again.
+    """
+    key = hash_file(audio_path)
+    if not ENABLED:
+        return key, None
+    known = get_index().song_key(key)
+    if known or load_audio is None:
+        return known or key, None
+    waveform = load_audio(audio_path)
+    return identify(key, waveform, sample_rate, duration_s), waveform
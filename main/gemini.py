@@ -0,0 +1,258 @@
+# ---------------------------
+# Chunked, concurrent, cached lyric cleanup through an LLM backend.
+#
+# A transcript is split into verse-sized chunks (at pauses between lines,
+# at most LYRICS_GEMINI_CHUNK_LINES lines each), and the chunks are sent
+# concurrently from an asyncio loop. A rate limiter keeps the requests under
+# LYRICS_GEMINI_RPM, and failed calls are retried with backoff (a response
+# that was blocked or has no text is not). Responses are cached on disk by
+# prompt hash, so a retried or repeated song costs no requests. If a chunk
+# still fails, its raw text is kept and the rest of the song is still cleaned.
+#
+# The backend is pluggable: "gemini" (default) or "local", an offline
+# stand-in with configurable latency, for testing and benchmarks
+# (LYRICS_LLM_BACKEND=local).
+import os
+import time
+import random
+import asyncio
+import hashlib
+import threading
+from segments import split_line
+from events import stage
+
+BACKEND = os.getenv("LYRICS_LLM_BACKEND", "gemini")
+GEMINI_MODEL = os.getenv("LYRICS_GEMINI_MODEL", "gemini-2.0-flash")
+CACHE_DIR = os.getenv(
+    "LYRICS_GEMINI_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "gemini"),
+)
+CHUNK_LINES = int(os.getenv("LYRICS_GEMINI_CHUNK_LINES", "8"))
+# A pause this long between two lines starts a new verse
+VERSE_GAP_S = float(os.getenv("LYRICS_GEMINI_VERSE_GAP_S", "2.0"))
+CONCURRENCY = int(os.getenv("LYRICS_GEMINI_CONCURRENCY", "4"))
+REQUESTS_PER_MINUTE = float(os.getenv("LYRICS_GEMINI_RPM", "60"))
+RETRIES = int(os.getenv("LYRICS_GEMINI_RETRIES", "3"))
+
+PROMPT = """
+These are raw Hindi song lyrics transcribed from audio.
+Your task is to:
+- Add punctuation (commas, periods)
+- Add line breaks to separate lyric phrases
+- Make them readable
+- Keep them in Hindi
+
+Raw Lyrics:
+{text}
+
+Cleaned and formatted lyrics:
+"""
+
+# -----------------------
+# Backends: anything with a name and a blocking generate(prompt) -> str
+class MissingApiKey(ValueError):
+    """GEMINI_API_KEY is not set: no chunk can be cleaned."""
+
+class GeminiBackend:
+    """google-generativeai client, configured on first use and then shared."""
+
+    def __init__(self, model_name=GEMINI_MODEL):
+        self.name = f"gemini:{model_name}"
+        self.model_name = model_name
+        self._model = None
+        self._lock = threading.Lock()
+
+    def model(self):
+        with self._lock:
+            if self._model is None:
+                from dotenv import load_dotenv
+                import google.generativeai as genai
+                load_dotenv()
+                api_key = os.getenv("GEMINI_API_KEY")
+                if not api_key:
+                    raise MissingApiKey("❌ API key not found. Set GEMINI_API_KEY in your .env file.")
+                genai.configure(api_key=api_key)
+                self._model = genai.GenerativeModel(self.model_name)
+        return self._model
+
+    def generate(self, prompt):
+        return self.model().generate_content(prompt).text
+
+class LocalBackend:
+    """Offline stand-in: sleeps like a remote call and returns the lyrics with punctuation added.
+
+    Latency is latency_s plus per_char_s for every character of lyrics, since
+    generating the output dominates a real call.
+    """
+
+    name = "local"
+
+    def __init__(self, latency_s=0.5, per_char_s=0.004, failure_rate=0.0, seed=0, blocked_rate=0.0):
+        self.latency_s = latency_s
+        self.per_char_s = per_char_s
+        self.failure_rate = failure_rate
+        self.blocked_rate = blocked_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def generate(self, prompt):
+        text = prompt.split("Raw Lyrics:\n", 1)[-1].split("\n\nCleaned and formatted lyrics:", 1)[0]
+        with self._lock:
+            self.calls += 1
+            failed = self._random.random() < self.failure_rate
+            blocked = self._random.random() < self.blocked_rate
+        time.sleep(self.latency_s + self.per_char_s * len(text))
+        if failed:
+            raise RuntimeError("local backend: simulated failure")
+        if blocked:
+            # What google-generativeai's response.text raises for a safety-blocked response
+            raise ValueError("local backend: simulated blocked response")
+        lines = [split_line(line)[2] for line in text.splitlines()]
+        return "\n".join(line.rstrip("।,.") + "," for line in lines if line)
+
+_backend = None
+_backend_lock = threading.Lock()
+
+def get_backend():
+    """Returns the shared backend, creating it on first use (no network or key needed until then)."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            if BACKEND == "local":
+                _backend = LocalBackend()
+            elif BACKEND == "gemini":
+                _backend = GeminiBackend()
+            else:
+                raise ValueError(f"Unknown LLM backend: {BACKEND}")
+    return _backend
+
+def set_backend(backend):
+    """Installs the backend used by clean_lyrics, e.g. a LocalBackend with other latencies."""
+    global _backend
+    with _backend_lock:
+        _backend = backend
+
+# -----------------------
+class ResponseCache:
+    """Responses on disk, one file per SHA-256 of (backend, prompt)."""
+
+    def __init__(self, root=CACHE_DIR):
+        self.root = root
+
+    def key(self, backend, prompt):
+        return hashlib.sha256(f"{backend.name}\n{prompt}".encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        try:
+            with open(os.path.join(self.root, key[:2], key + ".txt"), "r", encoding="utf-8") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def put(self, key, response):
+        folder = os.path.join(self.root, key[:2])
+        os.makedirs(folder, exist_ok=True)
+        tmp = os.path.join(folder, f".{key}.{os.getpid()}.{threading.get_ident()}")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(response)
+        os.replace(tmp, os.path.join(folder, key + ".txt"))
+
+class RateLimiter:
+    """Spaces request starts at least 60 / requests_per_minute seconds apart."""
+
+    def __init__(self, requests_per_minute):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute > 0 else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+# -----------------------
+def chunk_verses(text, max_lines=CHUNK_LINES, verse_gap_s=VERSE_GAP_S):
+    """Splits a transcript into verse-sized chunks of lines.
+
+    A chunk ends at a blank line, at a pause of verse_gap_s between two
+    timestamped lines, or after max_lines lines.
+    """
+    chunks, current, last_end = [], [], None
+    for line in text.splitlines():
+        if not line.strip():
+            if current:
+                chunks.append(current)
+            current, last_end = [], None
+            continue
+        start, end, _ = split_line(line)
+        if current and (len(current) >= max_lines or
+                        (start is not None and last_end is not None and start - last_end >= verse_gap_s)):
+            chunks.append(current)
+            current = []
+        current.append(line.strip())
+        last_end = end
+    if current:
+        chunks.append(current)
+    return ["\n".join(chunk) for chunk in chunks]
+
+async def _clean_chunk(backend, cache, limiter, semaphore, chunk, stats, retries):
+    prompt = PROMPT.format(text=chunk)
+    key = cache.key(backend, prompt)
+    cached = cache.get(key)
+    if cached is not None:
+        stats["cache_hits"] += 1
+        return cached
+    async with semaphore:
+        for attempt in range(retries + 1):
+            await limiter.wait()
+            try:
+                response = (await asyncio.to_thread(backend.generate, prompt)).strip()
+            except (ImportError, MissingApiKey):
+                raise  # missing package or API key: no chunk can succeed
+            except ValueError as e:
+                # A blocked response or one without text: the same prompt gets the same answer
+                stats["failed"] += 1
+                print(f"[ERROR] Gemini returned no text for a chunk: {e}", flush=True)
+                return None
+            except Exception as e:
+                if attempt == retries:
+                    stats["failed"] += 1
+                    print(f"[ERROR] Gemini chunk failed after {retries + 1} attempts: {e}", flush=True)
+                    return None
+                stats["retries"] += 1
+                # Exponential backoff with jitter so retries do not arrive together
+                await asyncio.sleep(min(30.0, 2 ** attempt) * (0.5 + random.random()))
+                continue
+            stats["requests"] += 1
+            cache.put(key, response)
+            return response
+
+async def clean_chunks_async(chunks, backend=None, cache=None, concurrency=CONCURRENCY,
+                             requests_per_minute=REQUESTS_PER_MINUTE, retries=RETRIES, stats=None):
+    """Cleans chunks concurrently; failed chunks come back as None."""
+    backend = backend or get_backend()
+    cache = cache or ResponseCache()
+    limiter = RateLimiter(requests_per_minute)
+    semaphore = asyncio.Semaphore(concurrency)
+    stats = stats if stats is not None else {}
+    for name in ("requests", "cache_hits", "retries", "failed"):
+        stats.setdefault(name, 0)
+    return await asyncio.gather(*(
+        _clean_chunk(backend, cache, limiter, semaphore, chunk, stats, retries) for chunk in chunks
+    ))
+
+def clean_lyrics(text, **options):
+    """Cleans a transcript chunk by chunk; returns None only if every chunk failed."""
+    chunks = chunk_verses(text)
+    if not chunks:
+        return ""
+    with stage("gemini_clean", chunks=len(chunks)) as details:
+        cleaned = asyncio.run(clean_chunks_async(chunks, stats=details, **options))
+    if all(part is None for part in cleaned):
+        return None
+    # Keep the raw text of chunks that could not be cleaned
+    return "\n\n".join(part if part is not None else chunk for part, chunk in zip(cleaned, chunks))
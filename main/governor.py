@@ -0,0 +1,72 @@
+# ---------------------------
+# CPU thread budget for separation and transcription.
+#
+# TensorFlow (Spleeter) and CTranslate2 (faster-whisper) each size their
+# thread pools to every core. With several jobs in flight, or one job
+# separating while another transcribes, the machine ends up running many
+# times more busy threads than it has cores, and throughput drops below
+# running the jobs one after another. The governor splits the cores instead:
+#
+#   - Separation runs one song at a time (see separator.py), so TensorFlow's
+#     pools are sized once, when Spleeter loads: all cores when the worker
+#     runs a single job at a time, the share of one job slot otherwise.
+#   - Transcription uses one model instance per size with cores / slots
+#     CTranslate2 threads and num_workers = slots, so every job in flight
+#     decodes on it at once with its share of the cores. The share does not
+#     follow the jobs in flight: each thread count would be another resident
+#     copy of the model.
+#
+# LYRICS_CPU_CORES overrides the core count; LYRICS_GOVERNOR=0 leaves both
+# libraries to size their own pools.
+import os
+import threading
+
+ENABLED = os.getenv("LYRICS_GOVERNOR", "1") == "1"
+CORES = int(os.getenv("LYRICS_CPU_CORES", "0")) or os.cpu_count() or 1
+
+class Governor:
+    """Hands out thread counts from the cores and the number of job slots."""
+
+    def __init__(self, cores=CORES, slots=1, enabled=ENABLED):
+        self.cores = cores
+        self.slots = slots
+        self.enabled = enabled
+        self._lock = threading.Lock()
+
+    def set_slots(self, slots):
+        """Number of jobs that may run at once (the scheduler's or the batch's concurrency)."""
+        with self._lock:
+            self.slots = max(1, slots)
+
+    def whisper_threads(self):
+        """(cpu_threads, num_workers) for the shared WhisperModel instances; (0, 1) when disabled."""
+        if not self.enabled:
+            return 0, 1
+        with self._lock:
+            slots = self.slots
+        return max(1, self.cores // slots), slots
+
+    def separation_threads(self):
+        """(intra_op, inter_op) thread counts for TensorFlow."""
+        with self._lock:
+            slots = self.slots
+        intra = max(1, self.cores // slots)
+        return intra, 1 if slots > 1 else min(2, intra)
+
+    def configure_tensorflow(self):
+        """Sizes TensorFlow's thread pools; call before Spleeter creates its session."""
+        if not self.enabled:
+            return
+        intra, inter = self.separation_threads()
+        # Read by the TF runtime for every session it creates, including Spleeter's estimator
+        os.environ["TF_NUM_INTRAOP_THREADS"] = str(intra)
+        os.environ["TF_NUM_INTEROP_THREADS"] = str(inter)
+        try:
+            import tensorflow as tf
+            tf.config.threading.set_intra_op_parallelism_threads(intra)
+            tf.config.threading.set_inter_op_parallelism_threads(inter)
+        except (ImportError, RuntimeError):
+            pass  # RuntimeError: the runtime is already initialized and keeps its pools
+        print(f"[INFO] TensorFlow threads: {intra} intra-op, {inter} inter-op", flush=True)
+
+governor = Governor()
@@ -1,12 +1,16 @@
 # ---------------------------
 import os
-import subprocess
-import torch
 import re
 import datetime
 import sys
-from indic_transliteration.sanscript import transliterate, DEVANAGARI, ITRANS
-from faster_whisper import WhisperModel
+from transcriber import transcribe_stream, report_segment
+from segments import Segments
+from romanize import romanize_line, romanize_text
+from worker import submit_or_run
+from events import emit
+
+# Model used when the caller does not pick one (see router.py for automatic routing)
+MODEL_SIZE = "medium"
 
 # -----------------------
 # Utility: Colored Prints
@@ -33,105 +37,101 @@ def get_user_choice():
 def extract_vocals(audio_path):
     log_step("STEP 1: Extracting vocals using Spleeter...")
     try:
-        subprocess.run([
-            "spleeter", "separate", "-p", "spleeter:2stems",
-            "-o", "output", audio_path
-        ], check=True)
-
-        base_name = os.path.splitext(os.path.basename(audio_path))[0]
-        vocals_path = os.path.join("output", base_name, "vocals.wav")
-
-        if not os.path.exists(vocals_path):
-            raise FileNotFoundError("Vocals file not found.")
-
+        from separator import separate_vocals
+        vocals = separate_vocals(audio_path)
         log_success("Vocals extracted successfully.")
-        return vocals_path
-    except subprocess.CalledProcessError:
-        log_error("Spleeter failed. Please ensure it is installed and available in PATH.")
-        exit()
+        return vocals
+    except Exception as e:
+        log_error(f"Spleeter failed ({e}). Please ensure it is installed with its 2stems model.")
+        raise
 
 # -----------------------
-def transcribe_audio(audio_path):
+def transcribe_audio(audio, size=MODEL_SIZE, **options):
+    """Yields (segment, progress) for each non-empty segment as it is decoded."""
     log_step("STEP 2: Transcribing audio with FasterWhisper...")
 
-    model = WhisperModel(
-        "medium",
-        device="cuda" if torch.cuda.is_available() else "cpu",
-        compute_type="float16" if torch.cuda.is_available() else "int8"
-    )
+    options.setdefault("language", "hi")
+    info, segments = transcribe_stream(audio, size, **options)
+    log_info(f"Audio duration: {info.duration:.2f}s")
 
-    segments, info = model.transcribe(audio_path, language="hi")
-    log_success(f"Transcription complete. Duration: {info.duration:.2f}s")
-
-    lines = []
-    for segment in segments:
+    for segment, progress in segments:
         if segment.text.strip():
-            timestamp = f"[{segment.start:.2f}-{segment.end:.2f}]"
-            lines.append(f"{timestamp} {segment.text.strip()}")
-    return "\n".join(lines)
+            yield segment, progress
+    log_success(f"Transcription complete. Duration: {info.duration:.2f}s")
 
 # -----------------------
+def clean_lyric_text(content):
+    # Clean the text; timestamps live in the Segments table
+    content = re.sub(r"\s+", " ", content.strip())
+    content = re.sub(r"\b(है|हूँ|हूं|हो|था|थी|थे|हैं)\b", r"\1.", content)
+    content = re.sub(r"([।.?!])", r"\1", content)
+    return content
+
 def clean_lyrics(text):
     log_step("STEP 3: Formatting transcription like lyrics...")
-    lines = text.split('\n')
-    cleaned_lines = []
-    
-    for line in lines:
-        # Extract timestamp and text
-        timestamp = line[:line.find(']')+1] if '[' in line else ''
-        content = line[line.find(']')+1:].strip() if '[' in line else line.strip()
-        
-        # Clean the content while preserving timestamp
-        content = re.sub(r"\s+", " ", content)
-        content = re.sub(r"\b(है|हूँ|हूं|हो|था|थी|थे|हैं)\b", r"\1.", content)
-        content = re.sub(r"([।.?!])", r"\1", content)
-        
-        if timestamp and content:
-            cleaned_lines.append(f"{timestamp} {content}")
-    
-    return '\n'.join(cleaned_lines)
+    return Segments.from_text(text).map_text(clean_lyric_text)
 
 # -----------------------
 def transliterate_lyrics(text):
     log_step("STEP 4: Romanizing lyrics...")
-    return transliterate(text, DEVANAGARI, ITRANS).lower()
+    return romanize_text(text)
+
+# -----------------------
+def format_line(text, output_type):
+    # One decoded segment in the chosen output type; "" drops it
+    text = text.strip()
+    if output_type != "raw":
+        text = clean_lyric_text(text)
+    if text and output_type == "romanized":
+        text = romanize_line(text)
+    return text
+
+def lyrics_from_vocals(vocals, output_type, on_segment=report_segment, size=MODEL_SIZE, **options):
+    # Format (and romanize) each segment as it arrives so lyrics show up while decoding continues
+    if output_type != "raw":
+        log_step("STEP 3: Formatting transcription like lyrics...")
+    if output_type == "romanized":
+        log_step("STEP 4: Romanizing lyrics...")
+    lyrics = Segments()
+    for segment, progress in transcribe_audio(vocals, size, **options):
+        text = format_line(segment.text, output_type)
+        if not text:
+            continue
+        lyrics.append_segment(segment, text)
+        if on_segment:
+            on_segment(lyrics.line(-1), progress)
+    return lyrics
 
 # -----------------------
-def save_output(text, output_type):
+def save_output(text, output_type, out_dir="."):
     timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"lyrics_{output_type}_{timestamp}.txt"
+    filename = os.path.join(out_dir, f"lyrics_{output_type}_{timestamp}.txt")
     with open(filename, "w", encoding="utf-8") as f:
         f.write(text.strip())
     log_success(f"Final output saved to {filename}")
+    return filename
 
 # -----------------------
-def process_song(audio_path, output_type):
+def process_song(audio_path, output_type, out_dir="."):
     log_info(f"Starting conversion for: {output_type.upper()}")
-    vocals = extract_vocals(audio_path)
-    transcription = transcribe_audio(vocals)
-
-    final_output = ""
-    if output_type == "raw":
-        final_output = transcription
-        save_output(transcription, output_type)
-    elif output_type == "cleaned":
-        cleaned = clean_lyrics(transcription)
-        final_output = cleaned
-        save_output(cleaned, output_type)
-    elif output_type == "romanized":
-        cleaned = clean_lyrics(transcription)
-        romanized = transliterate_lyrics(cleaned)
-        final_output = romanized
-        save_output(romanized, output_type)
-    else:
+    if output_type not in ("raw", "cleaned", "romanized"):
         log_error("Unknown output type selected.")
         return
+    vocals = extract_vocals(audio_path)
+
+    lyrics = lyrics_from_vocals(vocals, output_type)
+    final_output = lyrics.to_text()
+    output_file = save_output(final_output, output_type, out_dir)
+    from library import save as add_to_library
+    add_to_library(audio_path, lyrics, "hindi")
+    emit("result", lyrics=final_output, output_file=output_file, segments=lyrics.to_dict())
     
-    # Print the lyrics for Streamlit to capture
+    # Print the lyrics for the console
     print("\n" + "="*50)
     print("LYRICS OUTPUT:")
     print("="*50)
     print(final_output)
+    return final_output
 
 # -----------------------
 if __name__ == "__main__":
@@ -145,7 +145,10 @@ if __name__ == "__main__":
             log_error("File not found. Please check the path.")
             sys.exit(1)
         else:
-            process_song(path, output_type)
+            submit_or_run(
+                {"kind": "hindi", "audio_path": path, "output_type": output_type},
+                lambda: process_song(path, output_type),
+            )
     else:
         # Interactive mode
         print("*** Hindi Song Lyrics Processor (Offline) ***")
@@ -160,4 +163,7 @@ if __name__ == "__main__":
         if not os.path.exists(path):
             log_error("File not found. Please check the path.")
         else:
-            process_song(path, output_type)
+            submit_or_run(
+                {"kind": "hindi", "audio_path": path, "output_type": output_type},
+                lambda: process_song(path, output_type),
+            )
@@ -2,80 +2,43 @@
 # ..........................................................
 
 import os
-import subprocess
-from dotenv import load_dotenv
-import google.generativeai as genai
-from indic_transliteration.sanscript import transliterate, DEVANAGARI, ITRANS
-from faster_whisper import WhisperModel
-import torch
-
-# Load Gemini API key
-load_dotenv()
-API_KEY = os.getenv("GEMINI_API_KEY")
-
-if not API_KEY:
-    raise ValueError("❌ API key not found. Set GEMINI_API_KEY in your .env file.")
-
-# Configure Gemini
-genai.configure(api_key=API_KEY)
-gemini_model = genai.GenerativeModel("gemini-2.0-flash")
+from transcriber import transcribe_stream
+from segments import Segments
+from romanize import romanize_text
+# The Gemini client is created on first use (see gemini.py), so importing this
+# module works without GEMINI_API_KEY
+from gemini import clean_lyrics
 
 # Step 1: Spleeter - Extract Vocals
 def extract_vocals(audio_path):
     print("🎵 Extracting vocals using Spleeter...")
-    subprocess.run([
-        "spleeter", "separate", "-p", "spleeter:2stems",
-        "-o", "output", audio_path
-    ], check=True)
-
-    base_name = os.path.splitext(os.path.basename(audio_path))[0]
-    vocals_path = os.path.join("output", base_name, "vocals.wav")
-
-    if not os.path.exists(vocals_path):
-        raise FileNotFoundError("❌ Vocals file not found.")
+    from separator import separate_vocals
+    vocals = separate_vocals(audio_path)
 
     print("✅ Vocals extracted.")
-    return vocals_path
+    return vocals
 
 # Step 2: FasterWhisper - Transcribe
-def transcribe_audio(audio_path):
+def transcribe_audio(audio, out_dir="."):
     print("📝 Transcribing with FasterWhisper...")
     
-    # Load FasterWhisper model - use "medium" or "large-v2" for better accuracy
-    model = WhisperModel("medium", device="cuda" if torch.cuda.is_available() else "cpu", compute_type="float16" if torch.cuda.is_available() else "int8")
-
-    segments, info = model.transcribe(audio_path, language="hi")
+    # FasterWhisper model - use "medium" or "large-v2" for better accuracy
+    info, segments = transcribe_stream(audio, "medium", language="hi")
+    text = Segments.from_segments(segment for segment, _ in segments).to_text()
     print(f"✅ Transcription complete. Duration: {info.duration:.2f}s")
 
-    text = ""
-    for segment in segments:
-        timestamp = f"[{segment.start:.2f}-{segment.end:.2f}]"
-        text += f"{timestamp} {segment.text.strip()}\n"
-
-    with open("lyrics_transcribed.txt", "w", encoding="utf-8") as f:
+    with open(os.path.join(out_dir, "lyrics_transcribed.txt"), "w", encoding="utf-8") as f:
         f.write(text.strip())
 
     return text.strip()
 
 # Step 3: Gemini - Clean Lyrics
 def clean_with_gemini(text):
-    prompt = f"""
-These are raw Hindi song lyrics transcribed from audio.
-Your task is to:
-- Add punctuation (commas, periods)
-- Add line breaks to separate lyric phrases
-- Make them readable
-- Keep them in Hindi
-
-Raw Lyrics:
-{text}
-
-Cleaned and formatted lyrics:
-"""
     print("🧠 Cleaning lyrics using Gemini...")
     try:
-        response = gemini_model.generate_content(prompt)
-        cleaned = response.text.strip()
+        cleaned = clean_lyrics(text)
+        if cleaned is None:
+            return None
         with open("lyrics_cleaned.txt", "w", encoding="utf-8") as f:
             f.write(cleaned)
         print("✅ Cleaned lyrics saved.")
@@ -89,7 +52,7 @@ Cleaned and formatted lyrics:
 def transliterate_lyrics(text):
     print("🔡 Romanizing lyrics (ITRANS)...")
     try:
-        romanized = transliterate(text, DEVANAGARI, ITRANS).lower()  # Convert to lowercase
+        romanized = romanize_text(text)
         with open("lyrics_romanized.txt", "w", encoding="utf-8") as f:
             f.write(romanized)
         print("✅ Romanized lyrics saved.")
@@ -127,8 +90,8 @@ def offer_menu():
 
 # Full pipeline
 def process_hindi_song(audio_path):
-    vocals_path = extract_vocals(audio_path)
-    transcription = transcribe_audio(vocals_path)
+    vocals = extract_vocals(audio_path)
+    transcription = transcribe_audio(vocals)
     cleaned = clean_with_gemini(transcription)
     if cleaned:
         transliterate_lyrics(cleaned)
@@ -0,0 +1,194 @@
+# ---------------------------
+# "Try Improving": re-decode only the lines Whisper was unsure about.
+#
+# The first pass already left everything needed for a retry: the separated
+# vocals are in the stem cache and every segment carries Whisper's own
+# confidence (avg_logprob, no_speech_prob, compression_ratio). A retry picks
+# the weak segments, packs their stretches of vocals (with a little context on
+# each side) into one short array, decodes that with a larger model and beam
+# (LYRICS_IMPROVE_MODEL, LYRICS_IMPROVE_BEAM) and merges the new lines back
+# where they score better than the old ones. Confident lines are kept as they
+# are, so a retry costs a fraction of the first pass.
+import os
+from functools import partial
+import numpy as np
+from audio import WHISPER_RATE
+from segments import Segments
+from transcriber import decode, ungated, report_segment
+from events import emit, stage
+
+IMPROVE_MODEL = os.getenv("LYRICS_IMPROVE_MODEL", "large-v2")
+IMPROVE_BEAM = int(os.getenv("LYRICS_IMPROVE_BEAM", "10"))
+# A segment is weak below this average log-probability...
+MIN_LOGPROB = float(os.getenv("LYRICS_IMPROVE_MIN_LOGPROB", "-1.0"))
+# ... when it is probably not speech at all...
+MAX_NO_SPEECH = float(os.getenv("LYRICS_IMPROVE_MAX_NO_SPEECH", "0.6"))
+# ... or when its text repeats itself (Whisper's own fallback thresholds)
+MAX_COMPRESSION = float(os.getenv("LYRICS_IMPROVE_MAX_COMPRESSION", "2.4"))
+# Context decoded on each side of a weak stretch; stretches closer than twice this are joined
+PAD_S = 1.0
+# Language the re-decode is pinned to, so short stretches are not mis-detected
+LANGUAGES = {"english": "en", "hindi": "hi"}
+
+def weak_rows(segments, min_logprob=MIN_LOGPROB, max_no_speech=MAX_NO_SPEECH,
+              max_compression=MAX_COMPRESSION):
+    """Boolean mask of the timed segments whose confidence is below the thresholds."""
+    if not segments:
+        return np.zeros(0, dtype=bool)
+    start = segments.as_numpy("start")
+    weak = ((segments.as_numpy("avg_logprob") < min_logprob)
+            | (segments.as_numpy("no_speech_prob") > max_no_speech)
+            | (segments.as_numpy("compression_ratio") > max_compression))
+    return weak & ~np.isnan(start)
+
+def weak_spans(segments, weak, pad_s=PAD_S):
+    """Returns the weak stretches as an (n, 2) array of (start_s, end_s), nearby ones joined."""
+    rows = np.flatnonzero(weak)
+    if not len(rows):
+        return np.zeros((0, 2))
+    starts = segments.as_numpy("start")[rows]
+    ends = segments.as_numpy("end")[rows]
+    order = np.argsort(starts)
+    starts, ends = starts[order], np.maximum.accumulate(ends[order])
+    # A new span starts where the gap to the previous weak segment leaves room for both paddings
+    new = np.concatenate([[True], starts[1:] - ends[:-1] > 2 * pad_s])
+    return np.stack([starts[new], ends[np.concatenate([new[1:], [True]])]], axis=1)
+
+def _window(vocals, start_s, end_s):
+    if hasattr(vocals, "read"):
+        return vocals.read(start_s, end_s)  # streaming.StreamedVocals
+    return vocals[int(start_s * WHISPER_RATE):int(end_s * WHISPER_RATE)]
+
+def redecode(vocals, spans, details, size=IMPROVE_MODEL, pad_s=PAD_S, **options):
+    """Decodes the spans (with pad_s of context) packed together; yields (segment, progress) on the song's timeline."""
+    import vad
+    duration = len(vocals) / WHISPER_RATE
+    windows = np.stack([np.maximum(spans[:, 0] - pad_s, 0.0), np.minimum(spans[:, 1] + pad_s, duration)], axis=1)
+    packed, packed_starts = vad.pack((np.asarray(_window(vocals, start, end), dtype=np.float32)
+                                      for start, end in windows))
+    details["redecoded_s"] = round(float((windows[:, 1] - windows[:, 0]).sum()), 2)
+    layout = vad.Gate(windows, packed_starts, duration, details["redecoded_s"])
+    info, segments = decode(packed, size, details, **options)
+    info, segments = ungated(info, segments, layout)
+    total = details["redecoded_s"]
+    done = 0.0
+    for segment, _ in segments:
+        # Progress through the re-decoded audio rather than through the song
+        done = min(total, done + (segment.end - segment.start))
+        yield segment, done / total if total else 1.0
+
+def _inside(segments, span):
+    middle = (segments.as_numpy("start") + segments.as_numpy("end")) / 2
+    return (middle >= span[0]) & (middle <= span[1])
+
+def _score(segments, rows):
+    """Duration-weighted average log-probability of the rows."""
+    lengths = np.maximum(segments.as_numpy("end")[rows] - segments.as_numpy("start")[rows], 1e-3)
+    return float(np.average(segments.as_numpy("avg_logprob")[rows], weights=lengths))
+
+def merge(first, improved, spans, max_no_speech=MAX_NO_SPEECH):
+    """First-pass lines with each weak span replaced by the re-decoded lines when they score better.
+
+    Returns (Segments, number of spans replaced). A span that comes back
+    empty is only dropped when all of its old lines were probably not speech.
+    """
+    keep = np.ones(len(first), dtype=bool)
+    take = np.zeros(len(improved), dtype=bool)
+    replaced = 0
+    for span in spans:
+        old = _inside(first, span) if first else np.zeros(0, dtype=bool)
+        new = _inside(improved, span) if improved else np.zeros(0, dtype=bool)
+        if new.any():
+            better = not old.any() or _score(improved, new) >= _score(first, old)
+        else:
+            better = old.any() and bool((first.as_numpy("no_speech_prob")[old] > max_no_speech).all())
+        if better:
+            keep &= ~old
+            take |= new
+            replaced += 1
+    rows = [(first, i) for i in np.flatnonzero(keep)] + [(improved, i) for i in np.flatnonzero(take)]
+    rows.sort(key=lambda row: row[0].start[row[1]])
+    merged = Segments()
+    for table, i in rows:
+        merged.append(table.start[i], table.end[i], table.text[i], table.avg_logprob[i],
+                      table.no_speech_prob[i], table.compression_ratio[i])
+    return merged, replaced
+
+def improve_segments(vocals, first, format_line, on_segment=report_segment,
+                     size=IMPROVE_MODEL, beam_size=IMPROVE_BEAM, **options):
+    """Re-decodes the weak lines of first from the vocals and returns the merged Segments.
+
+    format_line turns a decoded text into a lyric line the way the first
+    pass did ("" drops it). Reported as the "improve" stage.
+    """
+    with stage("improve", model=size, beam_size=beam_size) as details:
+        weak = weak_rows(first)
+        spans = weak_spans(first, weak)
+        details.update(segments=len(first), weak=int(weak.sum()), spans=len(spans),
+                       audio_s=round(len(vocals) / WHISPER_RATE, 2))
+        print(f"[INFO] {int(weak.sum())} of {len(first)} line(s) below the confidence thresholds "
+              f"in {len(spans)} stretch(es)", flush=True)
+        if not len(spans):
+            details.update(redecoded_s=0.0, replaced=0)
+            return first
+        improved = Segments()
+        for segment, progress in redecode(vocals, spans, details, size, beam_size=beam_size, **options):
+            text = format_line(segment.text)
+            if text:
+                improved.append_segment(segment, text)
+                if on_segment:
+                    on_segment(improved.line(-1), progress)
+        merged, replaced = merge(first, improved, spans)
+        details["replaced"] = replaced
+        if details["audio_s"]:
+            details["redecoded_fraction"] = round(details["redecoded_s"] / details["audio_s"], 4)
+        print(f"[INFO] Re-decoded {details['redecoded_s']:.1f}s of {details['audio_s']:.1f}s with "
+              f"{size} (beam {beam_size}); {replaced} of {len(spans)} stretch(es) improved", flush=True)
+        return merged
+
+def line_formatter(pipeline, output_type="cleaned", mode="1"):
+    """The per-line formatting of the pipeline that produced the first pass."""
+    if pipeline == "english":
+        from main import clean_text
+        return clean_text
+    if pipeline == "hindi":
+        from hindi1 import format_line
+        return partial(format_line, output_type=output_type)
+    if pipeline == "bilingual":
+        from bilingual import format_line
+        return partial(format_line, mode=mode)
+    raise ValueError(f"Unknown pipeline: {pipeline}")
+
+def improve_song(audio_path, first_pass, pipeline="english", out_dir=".", output_type="cleaned", mode="1"):
+    """Improves a finished transcript (a Segments dict) of audio_path and saves it as lyrics_improved.txt."""
+    print("[INFO] Loading the separated vocals...", flush=True)
+    from separator import separate_vocals
+    vocals = separate_vocals(audio_path, overlap=False)  # a stem cache hit after the first pass
+    options = {}
+    if pipeline in LANGUAGES:
+        options["language"] = LANGUAGES[pipeline]
+    lyrics = improve_segments(vocals, Segments.from_dict(first_pass),
+                              line_formatter(pipeline, output_type, mode), **options)
+    text = lyrics.to_text()
+    output_file = os.path.join(out_dir, "lyrics_improved.txt")
+    with open(output_file, "w", encoding="utf-8") as f:
+        f.write(text)
+    print(f"[SUCCESS] Improved lyrics saved to {output_file}", flush=True)
+    from library import save as add_to_library
+    add_to_library(audio_path, lyrics, pipeline)
+    emit("result", lyrics=text, output_file=output_file, segments=lyrics.to_dict(), pipeline=pipeline)
+    return text
+
+def improve_job(audio_path, first_pass, pipeline="english", **options):
+    """Job for the worker (or a fallback run in this process) that improves first_pass."""
+    return {"kind": "improve", "audio_path": audio_path, "segments": first_pass, "pipeline": pipeline, **options}
+
+class ResultCapture:
+    """Event sink that keeps the last "result" event, e.g. to improve it afterwards."""
+
+    def __init__(self):
+        self.result = None
+
+    def __call__(self, record):
+        if record["event"] == "result":
+            self.result = record
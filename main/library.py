@@ -0,0 +1,184 @@
+# ---------------------------
+# Searchable library of finished transcripts.
+#
+# Every pipeline writes its lyrics to a text file in the working directory;
+# the library also keeps them, line by line with their timestamps, in a local
+# SQLite database (LYRICS_LIBRARY_DB). Each line is stored as transcribed and,
+# when it has Devanagari in it, romanized to ITRANS (romanize.py), and both
+# are indexed by an FTS5 table with the trigram tokenizer, so any substring of
+# three characters or more, in either script, is found without scanning the
+# catalog. A song is keyed by its song key (see fingerprint.py) and pipeline;
+# transcribing or improving it again replaces its lines.
+#
+#   python library.py "tum hi ho"          # every song with this line
+#   python library.py "तुम ही हो" --lines   # every matching line
+import os
+import sys
+import time
+import sqlite3
+import threading
+from collections import namedtuple
+
+ENABLED = os.getenv("LYRICS_LIBRARY", "1") == "1"
+LIBRARY_PATH = os.getenv(
+    "LYRICS_LIBRARY_DB",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "library.sqlite"),
+)
+# The trigram tokenizer cannot index anything shorter; such queries scan the lines
+MIN_QUERY_CHARS = 3
+
+Hit = namedtuple("Hit", ["key", "title", "pipeline", "start", "end", "text", "romanized"])
+SongHit = namedtuple("SongHit", ["key", "title", "pipeline", "matches", "first_start", "first_line"])
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS songs (id INTEGER PRIMARY KEY, key TEXT NOT NULL, pipeline TEXT NOT NULL, "
+    "title TEXT, added REAL, UNIQUE (key, pipeline))",
+    "CREATE TABLE IF NOT EXISTS lines (id INTEGER PRIMARY KEY, song_id INTEGER NOT NULL, "
+    "start REAL, end REAL, text TEXT NOT NULL, romanized TEXT NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS lines_song ON lines (song_id)",
+    # External-content index over lines: the text is stored once, the triggers keep the index in step
+    "CREATE VIRTUAL TABLE IF NOT EXISTS lines_fts USING fts5("
+    "text, romanized, content='lines', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS lines_ai AFTER INSERT ON lines BEGIN "
+    "INSERT INTO lines_fts (rowid, text, romanized) VALUES (new.id, new.text, new.romanized); END",
+    "CREATE TRIGGER IF NOT EXISTS lines_ad AFTER DELETE ON lines BEGIN "
+    "INSERT INTO lines_fts (lines_fts, rowid, text, romanized) VALUES ('delete', old.id, old.text, old.romanized); END",
+)
+
+def _phrase(query):
+    """The query as one FTS5 phrase, so punctuation and keywords in it are taken literally."""
+    return '"' + query.replace('"', '""') + '"'
+
+def _like(query):
+    return "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+class Library:
+    """Transcript lines of every song, searchable by any part of a line in Devanagari or ITRANS."""
+
+    def __init__(self, path=LIBRARY_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            for statement in SCHEMA:
+                self._db.execute(statement)
+
+    def add(self, key, segments, pipeline, title=None):
+        """Stores the lines of a Segments table as the song's transcript for pipeline."""
+        self.add_many([(key, segments, pipeline, title)])
+
+    def add_many(self, songs):
+        """Stores (key, segments, pipeline, title) transcripts in one transaction."""
+        from romanize import romanize_lines
+        with self._lock, self._db:
+            for key, segments, pipeline, title in songs:
+                self._db.execute("DELETE FROM lines WHERE song_id IN "
+                                 "(SELECT id FROM songs WHERE key = ? AND pipeline = ?)", (key, pipeline))
+                self._db.execute("INSERT OR REPLACE INTO songs (key, pipeline, title, added) VALUES (?, ?, ?, ?)",
+                                 (key, pipeline, title, time.time()))
+                song = self._db.execute("SELECT id FROM songs WHERE key = ? AND pipeline = ?",
+                                        (key, pipeline)).fetchone()[0]
+                romanized = romanize_lines(segments.text)
+                self._db.executemany(
+                    "INSERT INTO lines (song_id, start, end, text, romanized) VALUES (?, ?, ?, ?, ?)",
+                    ((song, start if start == start else None, end if end == end else None, text,
+                      roman if roman != text else "")  # Latin lines are indexed once
+                     for start, end, text, roman in zip(segments.start, segments.end, segments.text, romanized)))
+
+    def _matching(self, query):
+        """FROM/WHERE clause and parameters selecting the lines that contain query."""
+        query = query.strip()
+        if len(query) >= MIN_QUERY_CHARS:
+            return ("lines_fts JOIN lines ON lines.id = lines_fts.rowid JOIN songs ON songs.id = lines.song_id "
+                    "WHERE lines_fts MATCH ?", (_phrase(query),))
+        pattern = _like(query)
+        return ("lines JOIN songs ON songs.id = lines.song_id "
+                "WHERE lines.text LIKE ? ESCAPE '\\' OR lines.romanized LIKE ? ESCAPE '\\'", (pattern, pattern))
+
+    def search(self, query, limit=50):
+        """Lines containing query (in either script), in song and time order."""
+        if not query.strip():
+            return []
+        where, params = self._matching(query)
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT songs.key, songs.title, songs.pipeline, lines.start, lines.end, lines.text, lines.romanized "
+                f"FROM {where} ORDER BY lines.song_id, lines.start LIMIT ?", params + (limit,)).fetchall()
+        return [Hit(*row[:6], row[6] or row[5]) for row in rows]
+
+    def find_songs(self, query, limit=50):
+        """Songs with a line containing query, most matching lines first."""
+        if not query.strip():
+            return []
+        where, params = self._matching(query)
+        with self._lock:
+            rows = self._db.execute(
+                # With a single MIN(), SQLite takes the bare columns from that row: the song's first match
+                f"SELECT songs.key, songs.title, songs.pipeline, COUNT(*), lines.start, lines.text, MIN(lines.id) "
+                f"FROM {where} GROUP BY songs.id ORDER BY COUNT(*) DESC, songs.id LIMIT ?", params + (limit,)
+            ).fetchall()
+        return [SongHit(*row[:6]) for row in rows]
+
+    def lines(self, key, pipeline):
+        """The stored transcript of a song as a Segments table, or None."""
+        from segments import Segments
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT lines.start, lines.end, lines.text FROM lines JOIN songs ON songs.id = lines.song_id "
+                "WHERE songs.key = ? AND songs.pipeline = ? ORDER BY lines.id", (key, pipeline)).fetchall()
+        if not rows:
+            return None
+        segments = Segments()
+        for start, end, text in rows:
+            segments.append(float("nan") if start is None else start, float("nan") if end is None else end, text)
+        return segments
+
+    def stats(self):
+        with self._lock:
+            songs, = self._db.execute("SELECT COUNT(*) FROM songs").fetchone()
+            lines, = self._db.execute("SELECT COUNT(*) FROM lines").fetchone()
+        return {"songs": songs, "lines": lines}
+
+_library = None
+
+def get_library():
+    """Returns the process-wide library."""
+    global _library
+    if _library is None:
+        _library = Library()
+    return _library
+
+def save(audio_path, segments, pipeline):
+    """Adds a finished transcript of audio_path to the library; a failure is logged, not raised."""
+    if not ENABLED or not segments:
+        return
+    try:
+        import fingerprint
+        key, _ = fingerprint.song_key(audio_path)  # resolved from the file hash after separation
+        get_library().add(key, segments, pipeline, title=os.path.basename(audio_path))
+    except (sqlite3.Error, OSError) as e:
+        print(f"[WARN] Could not add the transcript to the library: {e}", flush=True)
+
+# ---------- Entry ----------
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Search the transcript library.")
+    parser.add_argument("query")
+    parser.add_argument("--lines", action="store_true", help="List every matching line instead of the songs")
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+    if sys.stdout.encoding and sys.stdout.encoding.lower() != "utf-8":
+        sys.stdout.reconfigure(encoding="utf-8")
+    library = get_library()
+    if args.lines:
+        for hit in library.search(args.query, args.limit):
+            at = f"[{hit.start:.2f}-{hit.end:.2f}] " if hit.start is not None else ""
+            print(f"{hit.title or hit.key[:12]} ({hit.pipeline}) {at}{hit.text}")
+    else:
+        for song in library.find_songs(args.query, args.limit):
+            at = f" at {song.first_start:.2f}s" if song.first_start is not None else ""
+            print(f"{song.title or song.key[:12]} ({song.pipeline}): {song.matches} line(s){at}: {song.first_line}")
@@ -1,92 +1,111 @@
 import os
-import subprocess
 import re
 import sys
-from faster_whisper import WhisperModel
-import torch
+from transcriber import transcribe_stream, report_segment
+from segments import Segments
+from worker import submit_or_run
+from events import emit, add_sink
+
+# Model used when the caller does not pick one (see router.py for automatic routing)
+MODEL_SIZE = "large-v2"
 
 # Step 1: Spleeter - Extract Vocals
 def extract_vocals(audio_path):
     print("[INFO] Extracting vocals using Spleeter...", flush=True)
-    subprocess.run([
-        "spleeter", "separate", "-p", "spleeter:2stems",
-        "-o", "output", audio_path
-    ], check=True)
-    base_name = os.path.splitext(os.path.basename(audio_path))[0]
-    vocals_path = os.path.join("output", base_name, "vocals.wav")
-    if not os.path.exists(vocals_path):
-        raise FileNotFoundError("[ERROR] Vocals file not found.")
+    from separator import separate_vocals
+    vocals = separate_vocals(audio_path)
     print("[SUCCESS] Vocals extracted.", flush=True)
-    return vocals_path
+    return vocals
 
 # Step 2: FasterWhisper - Transcribe
-def transcribe_audio(audio_path):
+def transcribe_audio(audio, size=MODEL_SIZE, **options):
+    """Yields (segment, progress) for each segment as soon as it is decoded."""
     print("[INFO] Transcribing with FasterWhisper...", flush=True)
-    model = WhisperModel("large-v2", device="cuda" if torch.cuda.is_available() else "cpu", compute_type="float16" if torch.cuda.is_available() else "int8")
-    segments, info = model.transcribe(audio_path)
+    info, segments = transcribe_stream(audio, size, **options)
+    print(f"[INFO] Audio duration: {info.duration:.2f}s", flush=True)
+    yield from segments
     print(f"[SUCCESS] Transcription complete. Duration: {info.duration:.2f}s", flush=True)
-    text = ""
-    for segment in segments:
-        timestamp = f"[{segment.start:.2f}-{segment.end:.2f}]"
-        text += f"{timestamp} {segment.text.strip()}\n"
-    return text.strip()
 
 # Step 3: Offline Clean-Up (English only)
+def clean_text(text):
+    # Capitalize English text
+    return text.strip().capitalize()
+
 def clean_transcription(text):
     print("[INFO] Cleaning transcription (offline)...", flush=True)
-    cleaned_lines = []
-    for line in text.splitlines():
-        line = line.strip()
-        if not line:
-            continue
-            
-        # Extract timestamp if present
-        timestamp = ""
-        content = line
-        if line.startswith("[") and "]" in line:
-            timestamp = line[:line.find("]")+1]
-            content = line[line.find("]")+1:].strip()
-            
-        # Capitalize English text
-        cleaned_lines.append(f"{timestamp} {content.capitalize()}" if timestamp else content.capitalize())
-    cleaned = '\n'.join(cleaned_lines)
+    cleaned = Segments.from_text(text).map_text(clean_text)
+    print("[SUCCESS] Cleaned lyrics ready.", flush=True)
+    return cleaned
+
+# Transcribe + clean, reporting each segment as it arrives
+def lyrics_from_vocals(vocals, on_segment=report_segment, size=MODEL_SIZE, **options):
+    # Clean each segment as it arrives so lyrics show up while decoding continues
+    print("[INFO] Cleaning transcription (offline) as segments arrive...", flush=True)
+    cleaned = Segments()
+    for segment, progress in transcribe_audio(vocals, size, **options):
+        text = clean_text(segment.text)
+        if text:
+            cleaned.append_segment(segment, text)
+            if on_segment:
+                on_segment(cleaned.line(-1), progress)
     print("[SUCCESS] Cleaned lyrics ready.", flush=True)
     return cleaned
 
 # Full pipeline for songs with fallback to Gemini API
-def process_song(audio_path, use_gemini=False):
-    vocals_path = extract_vocals(audio_path)
+def process_song(audio_path, use_gemini=False, out_dir="."):
+    vocals = extract_vocals(audio_path)
     
     if use_gemini:
         # Import and use hindiapi for Gemini-powered translation
         try:
             from hindiapi import transcribe_audio as gemini_transcribe
-            transcription = gemini_transcribe(vocals_path)
+            transcription = gemini_transcribe(vocals, out_dir=out_dir)
         except ImportError:
             print("[ERROR] Could not import hindiapi. Make sure GEMINI_API_KEY is set in .env", flush=True)
             return None
+        cleaned_lyrics = clean_transcription(transcription)
     else:
-        # Use regular transcription
-        transcription = transcribe_audio(vocals_path)
-    
-    cleaned_lyrics = clean_transcription(transcription)
+        cleaned_lyrics = lyrics_from_vocals(vocals)
     
     # Save the cleaned lyrics
-    output_file = "lyrics_output.txt"
+    lyrics = cleaned_lyrics.to_text()
+    output_file = os.path.join(out_dir, "lyrics_output.txt")
     with open(output_file, "w", encoding="utf-8") as f:
-        f.write(cleaned_lyrics)
+        f.write(lyrics)
     print(f"[SUCCESS] Cleaned lyrics saved to {output_file}", flush=True)
     
-    # Print the lyrics for Streamlit to capture
+    from library import save as add_to_library
+    add_to_library(audio_path, cleaned_lyrics, "english")
+    emit("result", lyrics=lyrics, output_file=output_file, segments=cleaned_lyrics.to_dict())
+    
+    # Print the lyrics for the console
     print("\n" + "="*50)
     print("LYRICS OUTPUT:")
     print("="*50)
-    print(cleaned_lyrics)
+    print(lyrics)
     
-    return cleaned_lyrics
+    return lyrics
+
+# Retry after "not satisfied": re-decode only the unclear lines of the first pass
+def try_improving(audio_path, first_pass):
+    if not first_pass or not first_pass.get("segments"):
+        print("[ERROR] No first-pass transcript to improve.", flush=True)
+        return None
+    print("\n[INFO] Re-decoding the unclear lines with a larger model...", flush=True)
+    from improve import improve_job, improve_song
+    lines = submit_or_run(
+        improve_job(audio_path, first_pass["segments"], "english"),
+        lambda: improve_song(audio_path, first_pass["segments"], "english"),
+    )
+    print("\n" + "="*50)
+    print("IMPROVED LYRICS:")
+    print("="*50)
+    print(lines)
+    return lines
 
 # ---------- Entry ----------
 if __name__ == "__main__":
+    from improve import ResultCapture
     # Check if audio path is provided as command line argument
     if len(sys.argv) > 1:
         # Called from Streamlit app with audio path as argument
@@ -97,13 +116,18 @@ if __name__ == "__main__":
             print("[ERROR] The file was not found. Please check the path and try again.")
             sys.exit(1)
         else:
-            lyrics = process_song(file_path, use_gemini)
+            # Prefer a resident worker so the models are not reloaded for every song
+            first_pass = ResultCapture()
+            add_sink(first_pass)
+            lyrics = submit_or_run(
+                {"kind": "english", "audio_path": file_path, "use_gemini": use_gemini},
+                lambda: process_song(file_path, use_gemini),
+            )
             if not use_gemini:
                 print("\nAre you satisfied with the translation? (yes/no)")
                 feedback = input().strip().lower()
                 if feedback == "no":
-                    print("\n[INFO] Trying with Gemini API for better translation...", flush=True)
-                    process_song(file_path, use_gemini=True)
+                    try_improving(file_path, first_pass.result)
     else:
         # Interactive mode
         print("*** Song Lyrics Processor ***")
@@ -112,9 +136,13 @@ if __name__ == "__main__":
         if not os.path.exists(file_path):
             print("[ERROR] The file was not found. Please check the path and try again.")
         else:
-            lyrics = process_song(file_path)
+            first_pass = ResultCapture()
+            add_sink(first_pass)
+            lyrics = submit_or_run(
+                {"kind": "english", "audio_path": file_path},
+                lambda: process_song(file_path),
+            )
             print("\nAre you satisfied with the translation? (yes/no)")
             feedback = input().strip().lower()
             if feedback == "no":
-                print("\n[INFO] Trying with Gemini API for better translation...", flush=True)
-                process_song(file_path, use_gemini=True)
+                try_improving(file_path, first_pass.result)
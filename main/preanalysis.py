@@ -0,0 +1,175 @@
+# ---------------------------
+# Cheap pre-analysis that trims silent and instrumental edges off separation.
+#
+# Before Spleeter runs, the decoded input is cut into LYRICS_PREANALYSIS_BLOCK_S
+# blocks and each block gets a few NumPy features from one STFT pass:
+#
+#   - loudness: silent blocks have nothing to transcribe;
+#   - sub-bass share (< 70 Hz) and stereo width (side / mid): bass, kick and
+#     wide mixes mean an accompaniment, voices sit above it and in the centre;
+#   - syllabic modulation: how deeply the voice-band (300-3400 Hz) envelope
+#     moves at 2-8 Hz, the rate syllables come at in speech and singing.
+#
+# Each block is "silence", "instrumental" (music with no sign of a voice) or
+# "mixed". The separator runs once, on the span from the first mixed block to
+# the last, padded; the silent and instrumental intro and outro around it
+# become zeros. Blocks inside the span are separated whatever their label, so
+# a misread block in the middle of a song cannot drop a verse. A block is only
+# left out on positive evidence: anything that does not clearly read as
+# silence or as music without a voice counts as mixed.
+#
+# This does not skip separation for a cappella or spoken-word input: the
+# features do not tell a voice alone from a narrow, sparse mix without
+# sub-bass (the bundled test song's accompaniment scores like a voice, gaps
+# and modulation included), so such input is separated in full. The pass is
+# off unless LYRICS_PREANALYSIS=1.
+import os
+import threading
+from time import perf_counter
+from collections import namedtuple
+import numpy as np
+
+ENABLED = os.getenv("LYRICS_PREANALYSIS", "0") == "1"
+BLOCK_S = float(os.getenv("LYRICS_PREANALYSIS_BLOCK_S", "3.0"))
+SILENCE_DB = float(os.getenv("LYRICS_PREANALYSIS_SILENCE_DB", "-50"))
+BASS_RATIO = float(os.getenv("LYRICS_PREANALYSIS_BASS_RATIO", "0.1"))
+SIDE_RATIO = float(os.getenv("LYRICS_PREANALYSIS_SIDE_RATIO", "0.12"))
+VOICE_MODULATION_DB = float(os.getenv("LYRICS_PREANALYSIS_VOICE_MODULATION_DB", "1.0"))
+# The separated span is widened by this much so onsets keep their context
+MARGIN_S = 1.0
+# Separate the whole file once this much of it needs separating anyway
+FULL_FRACTION = 0.85
+# Starting estimate of separation seconds per audio second, until one is measured
+DEFAULT_SEPARATION_RTF = 0.1
+FRAME = 2048
+
+Plan = namedtuple("Plan", ["decision", "labels", "regions", "block_s", "duration_s", "separate_s", "analysis_s"])
+
+# -----------------------
+def frames_per_block(block_s, sample_rate):
+    return max(4, int(round(block_s * sample_rate / FRAME)))
+
+def block_features(waveform, sample_rate, block_s=BLOCK_S):
+    """Per-block (rms_db, bass_ratio, side_ratio, modulation) arrays for an (n, channels) waveform."""
+    waveform = np.asarray(waveform, dtype=np.float32)
+    if waveform.ndim == 1:
+        waveform = waveform[:, None]
+    n_frames = frames_per_block(block_s, sample_rate)
+    n_blocks = -(-len(waveform) // (n_frames * FRAME))
+    # Pad the last block with a reflection of the audio: zeros would read as a deep modulation
+    missing = n_blocks * n_frames * FRAME - len(waveform)
+    padded = np.pad(waveform, ((0, missing), (0, 0)), mode="reflect" if missing < len(waveform) else "constant")
+
+    mid = padded.mean(axis=1)
+    side = (padded[:, 0] - padded[:, -1]) / 2
+    mid_frames = mid.reshape(-1, FRAME)
+    power = np.abs(np.fft.rfft(mid_frames * np.hanning(FRAME).astype(np.float32), axis=1)) ** 2
+    freqs = np.fft.rfftfreq(FRAME, 1.0 / sample_rate)
+    total = power.sum(axis=1) + 1e-12
+    bass = power[:, freqs < 70].sum(axis=1)
+    voice_band = power[:, (freqs >= 300) & (freqs <= 3400)].sum(axis=1)
+
+    shape = (n_blocks, n_frames)
+    mid_energy = np.square(mid_frames).mean(axis=1).reshape(shape).mean(axis=1)
+    side_energy = np.square(side.reshape(-1, FRAME)).mean(axis=1).reshape(shape).mean(axis=1)
+    rms_db = 10 * np.log10(mid_energy + side_energy + 1e-12)
+    bass_ratio = bass.reshape(shape).sum(axis=1) / total.reshape(shape).sum(axis=1)
+    side_ratio = np.sqrt(side_energy / (mid_energy + 1e-12))
+
+    # Depth (dB RMS) of the voice-band envelope's fluctuation at 2-8 Hz, via Parseval
+    envelope = 10 * np.log10(voice_band + 1e-9).reshape(shape)
+    envelope = envelope - envelope.mean(axis=1, keepdims=True)
+    spectrum = np.abs(np.fft.rfft(envelope, axis=1)) ** 2
+    rates = np.fft.rfftfreq(n_frames, FRAME / sample_rate)
+    modulation = np.sqrt(2 * spectrum[:, (rates >= 2) & (rates <= 8)].sum(axis=1)) / n_frames
+    return rms_db, bass_ratio, side_ratio, modulation
+
+def classify_blocks(features):
+    rms_db, bass_ratio, side_ratio, modulation = features
+    music = (bass_ratio >= BASS_RATIO) | (side_ratio >= SIDE_RATIO)
+    voice = modulation >= VOICE_MODULATION_DB
+    # Unknown and non-music blocks are separated; only music without a voice is left out
+    labels = np.where(music & ~voice, "instrumental", "mixed")
+    return np.where(rms_db < SILENCE_DB, "silence", labels).astype(object)
+
+def mixed_span(labels, block_s, duration_s):
+    """[(start_s, end_s)] from the first mixed block to the last, padded by MARGIN_S; [] without one."""
+    mixed = np.flatnonzero(labels == "mixed")
+    if not len(mixed):
+        return []
+    start = max(0.0, mixed[0] * block_s - MARGIN_S)
+    end = min(duration_s, (mixed[-1] + 1) * block_s + MARGIN_S)
+    return [(round(float(start), 3), round(float(end), 3))]
+
+def analyze(waveform, sample_rate, block_s=BLOCK_S):
+    """Returns the Plan for a waveform: "skip", "trim" or "full" separation."""
+    started = perf_counter()
+    duration = len(waveform) / sample_rate
+    # Blocks are whole STFT frames, so the block length is rounded to a frame multiple
+    block_s = frames_per_block(block_s, sample_rate) * FRAME / sample_rate
+    labels = classify_blocks(block_features(waveform, sample_rate, block_s))
+    regions = mixed_span(labels, block_s, duration)
+    separate_s = sum(end - start for start, end in regions)
+    if not regions:
+        decision = "skip"
+    elif separate_s >= FULL_FRACTION * duration:
+        decision, regions, separate_s = "full", [(0.0, round(duration, 3))], duration
+    else:
+        decision = "trim"
+    return Plan(decision, list(labels), regions, block_s, round(duration, 3), round(separate_s, 3),
+                round(perf_counter() - started, 4))
+
+# -----------------------
+class SeparationRate:
+    """Running separation seconds per audio second, used to estimate the time a plan saves."""
+
+    def __init__(self, initial=DEFAULT_SEPARATION_RTF, smoothing=0.3):
+        self.rtf = initial
+        self.smoothing = smoothing
+        self._lock = threading.Lock()
+
+    def observe(self, audio_s, seconds):
+        if audio_s <= 0:
+            return
+        with self._lock:
+            self.rtf += self.smoothing * (seconds / audio_s - self.rtf)
+
+    def saved_s(self, plan):
+        return round(self.rtf * (plan.duration_s - plan.separate_s) - plan.analysis_s, 3)
+
+separation_rate = SeparationRate()
+
+def _like(separated, waveform):
+    """Separator output trimmed to the waveform's length and channels (the separator works in stereo)."""
+    separated = np.asarray(separated, dtype=np.float32)[:len(waveform)]
+    if separated.shape[1] != waveform.shape[1]:
+        separated = np.repeat(separated.mean(axis=1, keepdims=True), waveform.shape[1], axis=1)
+    return separated
+
+def apply_plan(waveform, sample_rate, plan, separate):
+    """Returns the full-length vocals for a plan, calling separate(waveform) only on its regions.
+
+    separate returns {"vocals": array, ...} like separator.separate; audio
+    outside the regions is zeroed. The result has the waveform's shape, as
+    (n_samples, channels).
+    """
+    waveform = np.asarray(waveform, dtype=np.float32)
+    if waveform.ndim == 1:
+        waveform = waveform[:, None]
+    if plan.decision == "full":
+        started = perf_counter()
+        vocals = np.zeros_like(waveform)
+        separated = _like(separate(waveform)["vocals"], waveform)
+        vocals[:len(separated)] = separated
+        separation_rate.observe(plan.duration_s, perf_counter() - started)
+        return vocals
+
+    vocals = np.zeros_like(waveform)
+    if plan.regions:
+        started = perf_counter()
+        for start_s, end_s in plan.regions:
+            start, end = int(start_s * sample_rate), int(end_s * sample_rate)
+            separated = _like(separate(waveform[start:end])["vocals"], waveform[start:end])
+            vocals[start:start + len(separated)] = separated
+        separation_rate.observe(plan.separate_s, perf_counter() - started)
+    return vocals
@@ -0,0 +1,59 @@
+# ---------------------------
+# Finished transcripts on disk, keyed by the uploaded audio and the job options.
+#
+# The app looks here before submitting a job, so the same song with the same
+# options is only ever transcribed once per server, whichever session asked.
+# Entries are small JSON files (lyrics plus the Segments dict); the oldest are
+# dropped once there are more than LYRICS_RESULT_CACHE_ENTRIES.
+import os
+import json
+import hashlib
+import threading
+
+CACHE_DIR = os.getenv(
+    "LYRICS_RESULT_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "results"),
+)
+MAX_ENTRIES = int(os.getenv("LYRICS_RESULT_CACHE_ENTRIES", "500"))
+
+class ResultCache:
+    """Job results, one JSON file per SHA-256 of (audio hash, options)."""
+
+    def __init__(self, root=CACHE_DIR, max_entries=MAX_ENTRIES):
+        self.root = root
+        self.max_entries = max_entries
+
+    def key(self, audio_digest, **options):
+        return hashlib.sha256(json.dumps([audio_digest, options], sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.root, key + ".json")
+
+    def get(self, key):
+        """Returns the stored result dict, or None."""
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            return None
+        os.utime(self._path(key))  # most recently used
+        return result
+
+    def put(self, key, result):
+        os.makedirs(self.root, exist_ok=True)
+        tmp = os.path.join(self.root, f".{key}.{os.getpid()}.{threading.get_ident()}")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False)
+        os.replace(tmp, self._path(key))
+        self._evict()
+
+    def _evict(self):
+        entries = [os.path.join(self.root, name) for name in os.listdir(self.root) if name.endswith(".json")]
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort(key=os.path.getmtime)
+        for path in entries[:len(entries) - self.max_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,54 @@
+# ---------------------------
+# Devanagari -> ITRANS romanization with memoization.
+#
+# Only the Devanagari words of a line go through indic_transliteration; Latin
+# text, digits and punctuation are copied as they are. Lyrics repeat a lot
+# (choruses, hooks), so whole lines and single words are both kept in bounded
+# LRU caches: a repeated line costs one dict lookup, and a new line made of
+# known words skips the transliterator entirely.
+import os
+import re
+from functools import lru_cache
+
+LINE_CACHE_SIZE = int(os.getenv("LYRICS_ROMANIZE_LINE_CACHE", "4096"))
+TOKEN_CACHE_SIZE = int(os.getenv("LYRICS_ROMANIZE_TOKEN_CACHE", "16384"))
+
+# A Devanagari word, including the zero-width (non-)joiners used inside conjuncts
+DEVANAGARI_WORD = re.compile(r"[\u0900-\u097F\u200C\u200D]+")
+_has_devanagari = re.compile(r"[\u0900-\u097F]").search
+
+@lru_cache(maxsize=1)
+def _transliterator():
+    # indic_transliteration builds its scheme maps on import, so only pay for it when used
+    from indic_transliteration.sanscript import transliterate, DEVANAGARI, ITRANS
+    return lambda text: transliterate(text, DEVANAGARI, ITRANS)
+
+@lru_cache(maxsize=TOKEN_CACHE_SIZE)
+def romanize_word(word):
+    return _transliterator()(word)
+
+def _romanize_match(match):
+    return romanize_word(match.group())
+
+@lru_cache(maxsize=LINE_CACHE_SIZE)
+def romanize_line(line):
+    """ITRANS romanization of a line, lowercased; lines without Devanagari are returned unchanged."""
+    if not _has_devanagari(line):
+        return line
+    return DEVANAGARI_WORD.sub(_romanize_match, line).lower()
+
+def romanize_lines(lines):
+    """Batch API: romanizes a sequence of lines, transliterating each distinct line once."""
+    lines = list(lines)
+    romanized = {line: romanize_line(line) for line in dict.fromkeys(lines)}
+    return [romanized[line] for line in lines]
+
+def romanize_text(text):
+    return "\n".join(romanize_lines(text.splitlines()))
+
+def cache_info():
+    return {"line": romanize_line.cache_info()._asdict(), "word": romanize_word.cache_info()._asdict()}
+
+def clear_caches():
+    romanize_line.cache_clear()
+    romanize_word.cache_clear()
@@ -0,0 +1,186 @@
+# ---------------------------
+# Automatic language detection and model routing.
+#
+# Instead of asking whether a song is Hindi, English or bilingual, the
+# language is detected once on the first sung window of the separated vocals
+# (LYRICS_DETECT_SECONDS, with the small LYRICS_DETECT_MODEL). That picks the
+# pipeline, and each pipeline has a ladder of decoding configs from the most
+# accurate (today's default) to the cheapest. The first rung whose estimated
+# decode time fits LYRICS_LATENCY_BUDGET_S is used; no budget means the top
+# rung. Estimates start from a per-device real-time-factor table and follow
+# the RTFs that the "transcribe" stage actually reports.
+#
+#   python router.py song.mp3
+import os
+import sys
+import time
+import threading
+from collections import namedtuple
+from transcriber import load_model, get_device, report_segment
+from events import emit, stage, add_sink
+import vad
+from worker import submit_or_run
+
+DETECT_MODEL = os.getenv("LYRICS_DETECT_MODEL", "small")
+DETECT_SECONDS = float(os.getenv("LYRICS_DETECT_SECONDS", "30"))
+# Seconds of transcription a job may take; 0 means always use the most accurate config
+LATENCY_BUDGET_S = float(os.getenv("LYRICS_LATENCY_BUDGET_S", "0"))
+# Both Hindi and English at least this likely -> bilingual pipeline
+BILINGUAL_MIN_PROB = float(os.getenv("LYRICS_BILINGUAL_MIN_PROB", "0.2"))
+SAMPLE_RATE = 16000
+
+Detection = namedtuple("Detection", ["language", "probability", "probabilities", "window_start_s", "detect_s"])
+Route = namedtuple("Route", ["pipeline", "language", "size", "beam_size", "estimated_s"])
+
+# Whisper often labels sung Hindi as Urdu (same spoken language, other script)
+HINDI_CODES = ("hi", "ur")
+
+# Decoding configs per pipeline, most accurate first
+LADDERS = {
+    "english": [("large-v2", 5), ("medium", 5), ("small", 5), ("small", 1)],
+    "hindi": [("medium", 5), ("medium", 1), ("small", 5)],
+    "bilingual": [("large-v2", 5), ("medium", 5), ("medium", 1)],
+}
+# Starting estimates of decode seconds per audio second (int8 CPU / float16 GPU)
+DEFAULT_RTF = {
+    "cpu": {"small": 0.25, "medium": 0.6, "large-v2": 1.2},
+    "cuda": {"small": 0.03, "medium": 0.06, "large-v2": 0.1},
+}
+# Greedy decoding relative to beam search
+GREEDY_FACTOR = 0.6
+
+# -----------------------
+class RtfEstimator:
+    """Per-(model, beam) real-time factor, updated from "transcribe" stage_end events."""
+
+    def __init__(self, smoothing=0.3):
+        self.smoothing = smoothing
+        self.observed = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, record):
+        if record["event"] != "stage_end" or record.get("stage") != "transcribe":
+            return
+        if record.get("status") != "ok" or not record.get("audio_s") or "model" not in record:
+            return
+        # Overlapped separation runs inside the transcribe stage; only the decoding is the model's
+        rtf = (record["duration_s"] - record.get("separate_s", 0.0)) / record["audio_s"]
+        key = (record["model"], record.get("beam_size", 5))
+        with self._lock:
+            previous = self.observed.get(key)
+            self.observed[key] = rtf if previous is None else previous + self.smoothing * (rtf - previous)
+
+    def estimate(self, size, beam_size):
+        with self._lock:
+            observed = self.observed.get((size, beam_size))
+        if observed is not None:
+            return observed
+        defaults = DEFAULT_RTF.get(get_device()[0], DEFAULT_RTF["cpu"])
+        rtf = defaults.get(size, max(defaults.values()))
+        return rtf if beam_size > 1 else rtf * GREEDY_FACTOR
+
+rtf_estimator = RtfEstimator()
+add_sink(rtf_estimator)
+
+# -----------------------
+def first_active_window(vocals, seconds=DETECT_SECONDS):
+    """Returns (start_s, window): the first `seconds` of vocals from where singing starts."""
+    regions = vad.activity_map(vocals)
+    start = int(regions[0, 0] * SAMPLE_RATE) if len(regions) else 0
+    return start / SAMPLE_RATE, vocals[start:start + int(seconds * SAMPLE_RATE)]
+
+def detect_language(vocals, size=DETECT_MODEL):
+    """Detects the language of the first sung window of 16 kHz mono vocals."""
+    started = time.perf_counter()
+    if hasattr(vocals, "head"):
+        # Streamed long input: only separate enough of the start to find a sung window
+        vocals = vocals.head(4 * DETECT_SECONDS)
+    window_start, window = first_active_window(vocals)
+    # transcribe() detects the language up front; segments are decoded lazily and never drained
+    _, info = load_model(size).transcribe(window, language=None)
+    probabilities = dict(getattr(info, "all_language_probs", None) or [(info.language, info.language_probability)])
+    return Detection(info.language, info.language_probability, probabilities,
+                     round(window_start, 2), round(time.perf_counter() - started, 3))
+
+def choose_pipeline(detection):
+    hindi = sum(detection.probabilities.get(code, 0.0) for code in HINDI_CODES)
+    english = detection.probabilities.get("en", 0.0)
+    if hindi >= BILINGUAL_MIN_PROB and english >= BILINGUAL_MIN_PROB:
+        return "bilingual", None
+    if detection.language in HINDI_CODES:
+        return "hindi", "hi"
+    if detection.language == "en":
+        return "english", "en"
+    # Anything else: keep every script as decoded
+    return "bilingual", detection.language
+
+def choose_route(detection, duration_s, budget_s=LATENCY_BUDGET_S):
+    """Picks the pipeline and the first decoding config on its ladder that fits budget_s."""
+    pipeline, language = choose_pipeline(detection)
+    ladder = LADDERS[pipeline]
+    for size, beam_size in ladder:
+        estimated = rtf_estimator.estimate(size, beam_size) * duration_s
+        if not budget_s or estimated <= budget_s:
+            break
+    # Nothing fits: the cheapest rung is the best we can do
+    return Route(pipeline, language, size, beam_size, round(estimated, 1))
+
+# -----------------------
+def lyrics_from_vocals(vocals, on_segment=report_segment, budget_s=LATENCY_BUDGET_S):
+    """Detects the language, routes to a pipeline and returns (Segments, Route)."""
+    from chunked import decode_audio
+    vocals = decode_audio(vocals)
+    with stage("detect", model=DETECT_MODEL) as details:
+        detection = detect_language(vocals)
+        details.update(language=detection.language, probability=round(detection.probability, 3))
+    route = choose_route(detection, len(vocals) / SAMPLE_RATE, budget_s)
+    print(f"[INFO] Detected '{detection.language}' ({detection.probability:.0%}) in {detection.detect_s:.2f}s "
+          f"-> {route.pipeline} pipeline, {route.size} model, beam {route.beam_size}", flush=True)
+    emit("route", pipeline=route.pipeline, language=detection.language,
+         probability=round(detection.probability, 3), detect_s=detection.detect_s,
+         window_start_s=detection.window_start_s, model=route.size, beam_size=route.beam_size,
+         estimated_s=route.estimated_s, budget_s=budget_s)
+    options = {"size": route.size, "beam_size": route.beam_size}
+    if route.language:
+        options["language"] = route.language
+    if route.pipeline == "english":
+        import main as pipeline
+        return pipeline.lyrics_from_vocals(vocals, on_segment=on_segment, **options), route
+    if route.pipeline == "hindi":
+        import hindi1
+        return hindi1.lyrics_from_vocals(vocals, "cleaned", on_segment=on_segment, **options), route
+    import bilingual
+    return bilingual.lyrics_from_vocals(vocals, "1", on_segment=on_segment, **options), route
+
+def process_song(audio_path, out_dir=".", budget_s=LATENCY_BUDGET_S):
+    print("[INFO] Extracting vocals using Spleeter...", flush=True)
+    from separator import separate_vocals
+    vocals = separate_vocals(audio_path)
+    print("[SUCCESS] Vocals extracted.", flush=True)
+
+    lyrics, route = lyrics_from_vocals(vocals, budget_s=budget_s)
+    if lyrics is None:
+        return None
+    text = lyrics.to_text()
+    output_file = os.path.join(out_dir, "lyrics_output.txt")
+    with open(output_file, "w", encoding="utf-8") as f:
+        f.write(text)
+    print(f"[SUCCESS] Lyrics saved to {output_file}", flush=True)
+    from library import save as add_to_library
+    add_to_library(audio_path, lyrics, route.pipeline)
+    emit("result", lyrics=text, output_file=output_file, segments=lyrics.to_dict(), pipeline=route.pipeline)
+
+    # Print the lyrics for the console
+    print("\n" + "="*50)
+    print("LYRICS OUTPUT:")
+    print("="*50)
+    print(text)
+    return text
+
+# ---------- Entry ----------
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or not os.path.exists(sys.argv[1]):
+        print("Usage: python router.py <audio file>")
+        sys.exit(1)
+    path = sys.argv[1]
+    submit_or_run({"kind": "auto", "audio_path": path}, lambda: process_song(path))
@@ -0,0 +1,275 @@
+# ---------------------------
+# Job scheduler for the backend worker.
+#
+# Jobs wait in a FIFO queue and run on a bounded number of threads, sized
+# from the core count and the available memory (LYRICS_MAX_JOBS overrides
+# it). Once LYRICS_MAX_QUEUE jobs are waiting, new ones are rejected with
+# QueueFull instead of piling up behind a busy machine. Every job gets its
+# own work directory under LYRICS_JOBS_DIR, so concurrent jobs never write
+# over each other's output files. Clients poll status() for the job's state,
+# queue position, and the events and lines it has produced so far. The job
+# slots are passed to the governor (see governor.py), which sizes the
+# separation and transcription threads from them.
+import os
+import io
+import sys
+import time
+import uuid
+import shutil
+import threading
+import traceback
+import contextlib
+from collections import OrderedDict, deque
+from governor import governor
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+JOBS_DIR = os.getenv("LYRICS_JOBS_DIR", os.path.join(BACKEND_DIR, "jobs"))
+MAX_QUEUE = int(os.getenv("LYRICS_MAX_QUEUE", "16"))
+# Rough footprint of one job besides the shared models: decoded audio and stems
+JOB_MEMORY_MB = int(os.getenv("LYRICS_JOB_MEMORY_MB", "1500"))
+CORES_PER_JOB = int(os.getenv("LYRICS_CORES_PER_JOB", "2"))
+# Finished jobs (and their work dirs) kept around for clients to collect
+KEEP_FINISHED = int(os.getenv("LYRICS_KEEP_FINISHED_JOBS", "50"))
+
+class QueueFull(RuntimeError):
+    pass
+
+def available_memory_mb():
+    """MemAvailable from /proc/meminfo, falling back to free physical pages; None if unknown."""
+    try:
+        with open("/proc/meminfo", "r") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) // 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") // (1024 * 1024)
+    except (ValueError, OSError, AttributeError):
+        return None
+
+def default_concurrency():
+    """How many jobs may run at once: LYRICS_MAX_JOBS, else bounded by cores and memory."""
+    configured = os.getenv("LYRICS_MAX_JOBS")
+    if configured:
+        return max(1, int(configured))
+    by_cores = max(1, (os.cpu_count() or 1) // CORES_PER_JOB)
+    memory = available_memory_mb()
+    if memory is None:
+        return by_cores
+    return max(1, min(by_cores, memory // JOB_MEMORY_MB))
+
+# -----------------------
+# Per-thread stdout, so each job's printed lines end up in that job only
+class _LineStream(io.TextIOBase):
+    """File-like object that hands every complete printed line to a callback."""
+
+    def __init__(self, on_line):
+        self.on_line = on_line
+        self.buffer = ""
+        # A job's helper threads (see job_context) print into the same stream
+        self._lock = threading.Lock()
+
+    def writable(self):
+        return True
+
+    def write(self, s):
+        with self._lock:
+            self.buffer += s
+            while "\n" in self.buffer:
+                line, self.buffer = self.buffer.split("\n", 1)
+                self.on_line(line)
+        return len(s)
+
+    def flush(self):
+        with self._lock:
+            if self.buffer:
+                self.on_line(self.buffer)
+                self.buffer = ""
+
+class _ThreadRoutedStdout(io.TextIOBase):
+    """sys.stdout replacement that sends writes to the current thread's stream, if it has one."""
+
+    def __init__(self, default):
+        self.default = default
+        self.local = threading.local()
+
+    def writable(self):
+        return True
+
+    def write(self, s):
+        return getattr(self.local, "stream", self.default).write(s)
+
+    def flush(self):
+        getattr(self.local, "stream", self.default).flush()
+
+    def __getattr__(self, name):
+        return getattr(self.default, name)
+
+_router_lock = threading.Lock()
+
+@contextlib.contextmanager
+def capture_output(on_line):
+    """Passes every line this thread prints inside the block to on_line."""
+    with _router_lock:
+        if not isinstance(sys.stdout, _ThreadRoutedStdout):
+            sys.stdout = _ThreadRoutedStdout(sys.stdout)
+        router = sys.stdout
+    stream = _LineStream(on_line)
+    router.local.stream = stream
+    try:
+        yield
+    finally:
+        stream.flush()
+        router.local.stream = router.default
+
+def job_context(fn):
+    """Wraps fn to run with the calling thread's captured output and event sinks.
+
+    For helper threads a job starts, so what they print and emit still ends
+    up in that job.
+    """
+    import events
+    fn = events.bind_thread(fn)
+    router = sys.stdout
+    stream = getattr(router.local, "stream", None) if isinstance(router, _ThreadRoutedStdout) else None
+    if stream is None:
+        return fn
+
+    def run(*args, **kwargs):
+        router.local.stream = stream
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            router.local.stream = router.default
+
+    return run
+
+# -----------------------
+class Job:
+    def __init__(self, job_id, spec, work_dir):
+        self.id = job_id
+        self.spec = spec
+        self.work_dir = work_dir
+        self.state = "queued"
+        # ("event", record) / ("log", line) in the order they happened
+        self.messages = []
+        self.result = None
+        self.error = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+
+class Scheduler:
+    """Runs run(spec, work_dir) for submitted jobs, at most max_jobs at a time, in FIFO order."""
+
+    def __init__(self, run, max_jobs=None, max_queue=MAX_QUEUE, jobs_dir=JOBS_DIR):
+        self.run = run
+        self.max_jobs = max_jobs or default_concurrency()
+        # Thread counts per job follow the number of jobs that can run at once
+        governor.set_slots(self.max_jobs)
+        self.max_queue = max_queue
+        self.jobs_dir = jobs_dir
+        self.jobs = OrderedDict()
+        self.queue = deque()
+        self.running = 0
+        self._cond = threading.Condition()
+        # Work dirs left behind by a previous worker belong to jobs nobody can poll any more
+        shutil.rmtree(jobs_dir, ignore_errors=True)
+        os.makedirs(jobs_dir, exist_ok=True)
+        for i in range(self.max_jobs):
+            threading.Thread(target=self._run_jobs, name=f"job-{i}", daemon=True).start()
+
+    def submit(self, spec):
+        """Queues a job and returns its id; raises QueueFull when the queue is at capacity."""
+        with self._cond:
+            if len(self.queue) >= self.max_queue:
+                raise QueueFull(f"{len(self.queue)} jobs are already waiting, try again later")
+            job_id = uuid.uuid4().hex[:12]
+            job = Job(job_id, spec, os.path.join(self.jobs_dir, job_id))
+            os.makedirs(job.work_dir)
+            self.jobs[job_id] = job
+            self.queue.append(job)
+            self._prune()
+            self._cond.notify()
+        return job_id
+
+    def status(self, job_id, since=0):
+        """State of a job plus the messages it produced from index since onwards."""
+        with self._cond:
+            job = self.jobs.get(job_id)
+            if job is None:
+                raise KeyError(f"Unknown job: {job_id}")
+            status = {
+                "id": job.id,
+                "state": job.state,
+                "work_dir": job.work_dir,
+                "messages": job.messages[since:],
+                "next": len(job.messages),
+                "waited_s": round((job.started or time.time()) - job.submitted, 2),
+            }
+            if job.state == "queued":
+                status["position"] = self.queue.index(job) + 1
+            elif job.state == "done":
+                status["result"] = job.result
+            elif job.state == "error":
+                status["error"] = job.error
+            return status
+
+    def pending_paths(self):
+        """The audio paths of the jobs that are queued or running."""
+        with self._cond:
+            return sorted({job.spec["audio_path"] for job in self.jobs.values()
+                           if job.state in ("queued", "running") and job.spec.get("audio_path")})
+
+    def stats(self):
+        with self._cond:
+            return {"max_jobs": self.max_jobs, "running": self.running,
+                    "queued": len(self.queue), "max_queue": self.max_queue}
+
+    def _record(self, job, kind, payload):
+        with self._cond:
+            job.messages.append((kind, payload))
+
+    def _run_jobs(self):
+        import events
+        while True:
+            with self._cond:
+                while not self.queue:
+                    self._cond.wait()
+                job = self.queue.popleft()
+                job.state = "running"
+                job.started = time.time()
+                self.running += 1
+            state = "error"
+            try:
+                with events.job_sink(lambda record: self._record(job, "event", record)), \
+                        capture_output(lambda line: self._record(job, "log", line)):
+                    events.emit("job_start", job_id=job.id, kind=job.spec.get("kind"),
+                                audio_path=job.spec.get("audio_path"),
+                                waited_s=round(job.started - job.submitted, 4))
+                    try:
+                        result = self.run(job.spec, job.work_dir)
+                    except BaseException as e:
+                        events.emit("job_end", job_id=job.id, status="error", error=str(e),
+                                    duration_s=round(time.time() - job.started, 4))
+                        raise
+                    events.emit("job_end", job_id=job.id, status="ok",
+                                duration_s=round(time.time() - job.started, 4))
+                state, job.result = "done", result
+            except BaseException as e:
+                # SystemExit from a pipeline's exit() included: it must not take the job thread with it
+                print(f"[ERROR] Job {job.id} failed: {e!r}", flush=True)
+                traceback.print_exc()
+                state, job.error = "error", f"{type(e).__name__}: {e}"
+            finally:
+                with self._cond:
+                    job.state = state
+                    job.finished = time.time()
+                    self.running -= 1
+
+    def _prune(self):
+        finished = [job for job in self.jobs.values() if job.state in ("done", "error")]
+        for job in finished[:max(0, len(finished) - KEEP_FINISHED)]:
+            del self.jobs[job.id]
+            shutil.rmtree(job.work_dir, ignore_errors=True)
@@ -0,0 +1,171 @@
+# ---------------------------
+# Compact table of transcribed segments.
+#
+# The pipelines used to turn every segment into a "[start-end] text" string
+# and parse the timestamp back out at each later step. Segments keeps the
+# times and confidence scores in array.array("d") columns (8 bytes a value,
+# viewable as NumPy arrays without copying) next to a list of texts, and is
+# only turned into text, JSON, SRT or LRC when it is written out.
+import json
+import math
+from array import array
+
+FLOAT_FIELDS = ("start", "end", "avg_logprob", "no_speech_prob", "compression_ratio")
+FORMATS = ("txt", "json", "srt", "lrc")
+
+def split_line(line):
+    """Splits a "[start-end] text" line into (start, end, text); times are None without a timestamp."""
+    line = line.strip()
+    if line.startswith("["):
+        stamp, sep, text = line[1:].partition("]")
+        start, dash, end = stamp.partition("-")
+        if sep and dash:
+            try:
+                return float(start), float(end), text.strip()
+            except ValueError:
+                pass
+    return None, None, line
+
+def _seconds(value):
+    # Lines parsed from plain text have no times; JSON has no NaN
+    return None if math.isnan(value) else round(value, 3)
+
+def _clock(seconds, separator):
+    millis = int(round(seconds * 1000))
+    hours, millis = divmod(millis, 3600000)
+    minutes, millis = divmod(millis, 60000)
+    return f"{hours:02d}:{minutes:02d}:{millis // 1000:02d}{separator}{millis % 1000:03d}"
+
+class Segments:
+    """Column store of segments: start/end times, text and decoder confidence."""
+
+    __slots__ = FLOAT_FIELDS + ("text",)
+
+    def __init__(self):
+        for name in FLOAT_FIELDS:
+            setattr(self, name, array("d"))
+        self.text = []
+
+    def __len__(self):
+        return len(self.text)
+
+    def __bool__(self):
+        return bool(self.text)
+
+    def append(self, start, end, text, avg_logprob=0.0, no_speech_prob=0.0, compression_ratio=0.0):
+        self.start.append(start)
+        self.end.append(end)
+        self.text.append(text)
+        self.avg_logprob.append(avg_logprob)
+        self.no_speech_prob.append(no_speech_prob)
+        self.compression_ratio.append(compression_ratio)
+
+    def append_segment(self, segment, text=None):
+        """Appends a faster-whisper segment, optionally with already cleaned text."""
+        self.append(
+            segment.start,
+            segment.end,
+            segment.text.strip() if text is None else text,
+            getattr(segment, "avg_logprob", 0.0),
+            getattr(segment, "no_speech_prob", 0.0),
+            getattr(segment, "compression_ratio", 0.0),
+        )
+
+    @classmethod
+    def from_segments(cls, segments):
+        table = cls()
+        for segment in segments:
+            table.append_segment(segment)
+        return table
+
+    @classmethod
+    def from_text(cls, text):
+        """Parses "[start-end] text" lines; lines without a timestamp get NaN times."""
+        table = cls()
+        for line in text.splitlines():
+            start, end, content = split_line(line)
+            if content:
+                table.append(math.nan if start is None else start,
+                             math.nan if end is None else end, content)
+        return table
+
+    def map_text(self, fn):
+        """New table with fn applied to every text; rows where fn returns "" are dropped."""
+        table = Segments()
+        for i, text in enumerate(self.text):
+            text = fn(text)
+            if text:
+                table.append(self.start[i], self.end[i], text, self.avg_logprob[i],
+                             self.no_speech_prob[i], self.compression_ratio[i])
+        return table
+
+    def as_numpy(self, field):
+        """Zero-copy float64 view of a numeric column (valid until the table grows)."""
+        import numpy as np
+        return np.frombuffer(getattr(self, field), dtype=np.float64)
+
+    # -----------------------
+    # Serializers
+    def line(self, i):
+        start = self.start[i]
+        if math.isnan(start):
+            return self.text[i]
+        return f"[{start:.2f}-{self.end[i]:.2f}] {self.text[i]}"
+
+    def to_text(self, timestamps=True):
+        if not timestamps:
+            return "\n".join(self.text)
+        return "\n".join(self.line(i) for i in range(len(self.text)))
+
+    def to_dict(self):
+        """Columnar plain-Python form, cheap to pickle or send as an event."""
+        columns = {name: getattr(self, name).tolist() for name in FLOAT_FIELDS}
+        columns["text"] = list(self.text)
+        return columns
+
+    @classmethod
+    def from_dict(cls, columns):
+        table = cls()
+        for name in FLOAT_FIELDS:
+            getattr(table, name).extend(columns.get(name) or [0.0] * len(columns["text"]))
+        table.text = list(columns["text"])
+        return table
+
+    def to_json(self):
+        return json.dumps([
+            {"start": _seconds(start), "end": _seconds(end), "text": text,
+             "avg_logprob": round(logprob, 4), "no_speech_prob": round(no_speech, 4),
+             "compression_ratio": round(ratio, 4)}
+            for start, end, text, logprob, no_speech, ratio in zip(
+                self.start, self.end, self.text,
+                self.avg_logprob, self.no_speech_prob, self.compression_ratio)
+        ], ensure_ascii=False)
+
+    def to_srt(self):
+        timed = [row for row in zip(self.start, self.end, self.text) if not math.isnan(row[0])]
+        return "\n".join(
+            f"{i}\n{_clock(start, ',')} --> {_clock(end, ',')}\n{text}\n"
+            for i, (start, end, text) in enumerate(timed, 1)
+        )
+
+    def to_lrc(self):
+        lines = []
+        for start, text in zip(self.start, self.text):
+            if math.isnan(start):
+                continue
+            centis = int(round(start * 100))
+            minutes, centis = divmod(centis, 6000)
+            lines.append(f"[{minutes:02d}:{centis // 100:02d}.{centis % 100:02d}]{text}")
+        return "\n".join(lines)
+
+    def serialize(self, fmt):
+        """Renders the table as "txt", "json", "srt" or "lrc"."""
+        if fmt == "txt":
+            return self.to_text()
+        if fmt == "json":
+            return self.to_json()
+        if fmt == "srt":
+            return self.to_srt()
+        if fmt == "lrc":
+            return self.to_lrc()
+        raise ValueError(f"Unknown format: {fmt}")
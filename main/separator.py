@@ -0,0 +1,151 @@
+# ---------------------------
+# In-process Spleeter separation.
+#
+# The 2-stem model is restored once per process and reused for every song,
+# instead of booting TensorFlow through the `spleeter separate` CLI each time.
+# Waveforms go in and come out as NumPy arrays shaped (n_samples, channels)
+# at 44.1 kHz.
+import os
+import threading
+import numpy as np
+from audio import to_whisper_input
+from stem_cache import cached_stem
+from stem_store import vocals_name, save_vocals, load_vocals
+from events import stage, emit
+import preanalysis
+
+SAMPLE_RATE = 44100
+MODEL = "spleeter:2stems"
+# Full-rate vocals.wav/accompaniment.wav are only written when asked for
+KEEP_STEMS = os.getenv("LYRICS_KEEP_STEMS", "0") == "1"
+# The compact 16 kHz vocals the cache keeps (see stem_store.py)
+VOCALS_16K = vocals_name()
+# Use the checkpoint bundled in the repo regardless of the working directory
+os.environ.setdefault(
+    "MODEL_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "pretrained_models"),
+)
+
+_separator = None
+_adapter = None
+_load_lock = threading.Lock()
+# The TensorFlow predictor behind Separator is not safe to drive from two threads
+_separate_lock = threading.Lock()
+
+def get_separator():
+    """Returns the resident Spleeter separator, restoring the model on first use."""
+    global _separator
+    with _load_lock:
+        if _separator is None:
+            from governor import governor
+            governor.configure_tensorflow()
+            from spleeter.separator import Separator
+            print("[INFO] Loading Spleeter 2-stem model...", flush=True)
+            _separator = Separator(MODEL, multiprocess=False)
+    return _separator
+
+def set_separator(separator):
+    """Installs the object used by separate() (anything with .separate(waveform)), e.g. a stub."""
+    global _separator
+    with _load_lock:
+        _separator = separator
+
+def get_audio_adapter():
+    global _adapter
+    if _adapter is None:
+        from spleeter.audio.adapter import AudioAdapter
+        _adapter = AudioAdapter.default()
+    return _adapter
+
+def load_audio(audio_path, sample_rate=SAMPLE_RATE, duration=None):
+    """Decodes an audio file (its first duration seconds when given) into a float32 (n_samples, channels) array."""
+    waveform, _ = get_audio_adapter().load(audio_path, duration=duration, sample_rate=sample_rate)
+    return np.asarray(waveform, dtype=np.float32)
+
+def separate(waveform):
+    """Splits a 44.1 kHz waveform into {"vocals": array, "accompaniment": array}."""
+    waveform = np.asarray(waveform, dtype=np.float32)
+    if waveform.ndim == 1:
+        waveform = waveform[:, None]
+    if waveform.shape[1] == 1:
+        waveform = np.repeat(waveform, 2, axis=1)
+    separator = get_separator()
+    with _separate_lock:
+        return separator.separate(waveform)
+
+def save_stems(stems, out_dir, sample_rate=SAMPLE_RATE):
+    adapter = get_audio_adapter()
+    for name, data in stems.items():
+        adapter.save(os.path.join(out_dir, f"{name}.wav"), data, sample_rate, "wav")
+
+def separate_where_needed(waveform):
+    """Like separate(), but leaves out the silent and instrumental edges pre-analysis finds.
+
+    Logs the decision and the estimated separation time saved, and reports
+    both as a "preanalysis" event.
+    """
+    plan = preanalysis.analyze(waveform, SAMPLE_RATE)
+    saved_s = preanalysis.separation_rate.saved_s(plan)
+    counts = {label: plan.labels.count(label) for label in ("mixed", "instrumental", "silence")}
+    print(f"[INFO] Pre-analysis ({plan.analysis_s:.2f}s): {plan.decision} separation, "
+          f"{plan.separate_s:.0f}s of {plan.duration_s:.0f}s, "
+          f"~{saved_s:.1f}s saved", flush=True)
+    emit("preanalysis", decision=plan.decision, regions=plan.regions, blocks=counts,
+         duration_s=plan.duration_s, separate_s=plan.separate_s,
+         analysis_s=plan.analysis_s, saved_s=saved_s)
+    vocals = preanalysis.apply_plan(waveform, SAMPLE_RATE, plan, separate)
+    return {"vocals": vocals, "accompaniment": waveform.reshape(vocals.shape) - vocals}
+
+def separate_vocals(audio_path, keep_stems=KEEP_STEMS, overlap=None):
+    """Returns the vocals of audio_path as 16 kHz mono float32, ready for the transcriber.
+
+    The input is decoded once and the vocals never round-trip through a
+    full-rate WAV; the cache only keeps the compact 16 kHz copy unless
+    keep_stems asks for the full-rate stems too. A cache hit on the npy
+    format is a read-only memory map. Long inputs, and with overlap (default
+    streaming.OVERLAP) songs that are not cached yet, come back as
+    streaming.StreamedVocals, which pipelines pass on like an array and
+    which are separated window by window while being transcribed.
+
+    Stems are cached under the song's fingerprint key (see fingerprint.py),
+    so another encoding of a song separated before is a cache hit too.
+    """
+    import streaming
+    import fingerprint
+    if streaming.should_stream(audio_path):
+        # Long input: separation happens window by window while transcribing.
+        # Only a file seen before is resolved; fingerprinting it would mean decoding it whole.
+        with stage("separate", streaming=True) as details:
+            details["bytes"] = os.path.getsize(audio_path)
+            return streaming.open_vocals(audio_path, key=fingerprint.song_key(audio_path)[0])
+    key, waveform = fingerprint.song_key(audio_path, load_audio, SAMPLE_RATE)
+    if overlap is None:
+        overlap = streaming.OVERLAP
+    if overlap and not keep_stems:
+        vocals = streaming.open_overlapped(audio_path, load_audio, key=key, mix=waveform)
+        if vocals is not None:
+            # Separation happens a window ahead of transcription, inside the transcribe stage
+            with stage("separate", overlapped=True) as details:
+                details["bytes"] = os.path.getsize(audio_path)
+            return vocals
+    result = {}
+
+    def separate_into(path, out_dir):
+        mix = load_audio(path) if waveform is None else waveform
+        if preanalysis.ENABLED:
+            stems = separate_where_needed(mix)
+        else:
+            stems = separate(mix)
+        vocals = to_whisper_input(stems["vocals"], SAMPLE_RATE)
+        save_vocals(os.path.join(out_dir, VOCALS_16K), vocals)
+        if keep_stems:
+            save_stems(stems, out_dir)
+        result["vocals"] = vocals
+
+    with stage("separate") as details:
+        details["bytes"] = os.path.getsize(audio_path)
+        vocals_path = cached_stem(audio_path, VOCALS_16K, separate_into, key=key)
+        details["cache_hit"] = "vocals" not in result
+        if "vocals" in result:
+            return result["vocals"]
+        return load_vocals(vocals_path)
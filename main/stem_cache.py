@@ -0,0 +1,180 @@
+# ---------------------------
+# Content-addressed cache for separated stems.
+#
+# Stems are keyed by the SHA-256 of the input audio bytes, so re-uploading the
+# same song skips separation entirely no matter what the file is called.
+# Entries are evicted least-recently-used first once the cache grows past
+# LYRICS_STEM_CACHE_MB.
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import threading
+
+CACHE_DIR = os.getenv(
+    "LYRICS_STEM_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "stems"),
+)
+CACHE_BUDGET_MB = float(os.getenv("LYRICS_STEM_CACHE_MB", "2048"))
+STATS_FILE = "stats.json"
+
+def hash_file(path, chunk_size=1 << 20):
+    """Returns the SHA-256 hex digest of a file, read in chunks."""
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+def _dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+class StemCache:
+    """Stem directories keyed by audio hash, with LRU eviction under a disk budget."""
+
+    def __init__(self, root=CACHE_DIR, budget_mb=CACHE_BUDGET_MB):
+        self.root = root
+        self.budget_bytes = int(budget_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+        self.hits, self.misses, self.evictions = self._load_stats()
+
+    # ---- counters (persisted so short-lived CLI runs accumulate) ----
+    def _load_stats(self):
+        try:
+            with open(os.path.join(self.root, STATS_FILE), "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data.get("hits", 0), data.get("misses", 0), data.get("evictions", 0)
+        except (OSError, ValueError):
+            return 0, 0, 0
+
+    def _save_stats(self):
+        data = {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+        tmp = os.path.join(self.root, f".{STATS_FILE}.{os.getpid()}")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, os.path.join(self.root, STATS_FILE))
+
+    def stats(self):
+        entries = self._entries()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(entries),
+            "size_bytes": sum(size for _, _, size in entries),
+            "budget_bytes": self.budget_bytes,
+        }
+
+    # ---- entries ----
+    def entry_dir(self, key):
+        return os.path.join(self.root, key)
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name.startswith(".") or not os.path.isdir(path):
+                continue
+            entries.append((path, os.path.getmtime(path), _dir_size(path)))
+        return entries
+
+    def lookup(self, key, stem="vocals.wav", count=True):
+        """Returns the cached stem path for key, or None on a miss.
+
+        count=False checks without touching the hit/miss counters, for a
+        caller that counts the outcome itself (see record_miss).
+        """
+        path = os.path.join(self.entry_dir(key), stem)
+        with self._lock:
+            if os.path.exists(path):
+                os.utime(self.entry_dir(key))  # mark as most recently used
+                if count:
+                    self.hits += 1
+                    self._save_stats()
+                return path
+            if count:
+                self.misses += 1
+                self._save_stats()
+            return None
+
+    def record_miss(self):
+        with self._lock:
+            self.misses += 1
+            self._save_stats()
+
+    def new_workdir(self):
+        """Scratch directory on the cache filesystem for a separation in progress."""
+        return tempfile.mkdtemp(prefix=".sep-", dir=self.root)
+
+    def store(self, key, stems_dir):
+        """Moves a finished stems directory into the cache and returns its entry path."""
+        dest = self.entry_dir(key)
+        with self._lock:
+            if os.path.exists(dest):
+                # The entry already exists (another job, or other stems of the
+                # same audio): add the new files and keep the ones it has.
+                for name in os.listdir(stems_dir):
+                    target = os.path.join(dest, name)
+                    if not os.path.exists(target):
+                        os.replace(os.path.join(stems_dir, name), target)
+                shutil.rmtree(stems_dir, ignore_errors=True)
+                os.utime(dest)
+            else:
+                os.replace(stems_dir, dest)
+            self._evict(keep=dest)
+        return dest
+
+    def _evict(self, keep=None):
+        entries = sorted(self._entries(), key=lambda e: e[1])
+        total = sum(size for _, _, size in entries)
+        for path, _, size in entries:
+            if total <= self.budget_bytes:
+                break
+            if path == keep:
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            self.evictions += 1
+        self._save_stats()
+
+_cache = None
+
+def get_stem_cache():
+    """Returns the process-wide stem cache."""
+    global _cache
+    if _cache is None:
+        _cache = StemCache()
+    return _cache
+
+# -----------------------
+def cached_stem(audio_path, stem, separate, key=None):
+    """Returns the path of a stem file for audio_path.
+
+    On a cache miss separate(audio_path, out_dir) must write the stem into out_dir.
+    key defaults to the hash of the file (see fingerprint.song_key).
+    """
+    cache = get_stem_cache()
+    key = key or hash_file(audio_path)
+    stem_path = cache.lookup(key, stem)
+    if stem_path:
+        print(f"[INFO] Stem cache hit ({key[:12]}), skipping separation.", flush=True)
+        return stem_path
+    workdir = cache.new_workdir()
+    try:
+        separate(audio_path, workdir)
+        if not os.path.exists(os.path.join(workdir, stem)):
+            raise FileNotFoundError(f"{stem} not found after separation.")
+        entry = cache.store(key, workdir)
+    except BaseException:
+        shutil.rmtree(workdir, ignore_errors=True)
+        raise
+    return os.path.join(entry, stem)
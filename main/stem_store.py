@@ -0,0 +1,130 @@
+# ---------------------------
+# On-disk format of the separated vocals.
+#
+# Only the vocals are kept (the accompaniment is never transcribed), as 16 kHz
+# mono, the rate Whisper decodes at, in one of three formats
+# (LYRICS_STEM_FORMAT):
+#
+#   npy  - float32 .npy, read back through a memory map with no decoding or
+#          copying (default; 3.8 MB per minute);
+#   wav  - 16-bit PCM (1.9 MB per minute);
+#   flac - lossless FLAC through the ffmpeg CLI that Spleeter already needs
+#          (roughly half the size of wav again, but decoded on every read).
+#
+# Two full-rate stereo WAV stems took 21 MB per minute.
+import os
+import subprocess
+import numpy as np
+from audio import WHISPER_RATE, to_pcm16, open_wav_writer, read_wav, read_wav_window, wav_layout
+
+FORMAT = os.getenv("LYRICS_STEM_FORMAT", "npy")
+FORMATS = ("npy", "wav", "flac")
+
+def vocals_name(fmt=FORMAT):
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown stem format: {fmt}")
+    return f"vocals_16k.{fmt}"
+
+def _format(path):
+    return os.path.splitext(path)[1].lstrip(".")
+
+# -----------------------
+def _ffmpeg_pcm(path, start=0, count=None):
+    """Decodes (part of) a FLAC file to float32 samples at WHISPER_RATE with the ffmpeg CLI."""
+    command = ["ffmpeg", "-nostdin", "-v", "error"]
+    if start:
+        command += ["-ss", f"{start / WHISPER_RATE:.6f}"]
+    command += ["-i", path]
+    if count is not None:
+        command += ["-frames:a", str(count)]
+    command += ["-f", "s16le", "-ac", "1", "-ar", str(WHISPER_RATE), "-"]
+    pcm = subprocess.run(command, capture_output=True, check=True).stdout
+    samples = np.frombuffer(pcm, dtype="<i2").astype(np.float32) / 32768.0
+    return samples[:count] if count is not None else samples
+
+class VocalsWriter:
+    """Writes 16 kHz mono vocals in pieces (used by streaming mode); close() finishes the file.
+
+    n_samples is the final length, which the npy format needs up front.
+    """
+
+    def __init__(self, path, n_samples):
+        self.path = path
+        self.fmt = _format(path)
+        self.written = 0
+        self.n_samples = n_samples
+        if self.fmt == "npy":
+            # Header, then raw samples appended: a writable memmap would keep every written page resident
+            self._out = open(path, "wb")
+            np.lib.format.write_array_header_1_0(
+                self._out, {"descr": "<f4", "fortran_order": False, "shape": (n_samples,)})
+        elif self.fmt == "wav":
+            self._out = open_wav_writer(path, WHISPER_RATE)
+        else:
+            self._out = subprocess.Popen(
+                ["ffmpeg", "-nostdin", "-v", "error", "-y", "-f", "s16le", "-ac", "1",
+                 "-ar", str(WHISPER_RATE), "-i", "-", "-c:a", "flac", path],
+                stdin=subprocess.PIPE,
+            )
+
+    def write(self, samples):
+        samples = np.asarray(samples, dtype=np.float32)
+        if self.fmt == "npy":
+            samples = samples[:self.n_samples - self.written]
+            self._out.write(samples.astype("<f4").tobytes())
+        elif self.fmt == "wav":
+            self._out.writeframes(to_pcm16(samples).tobytes())
+        else:
+            self._out.stdin.write(to_pcm16(samples).tobytes())
+        self.written += len(samples)
+
+    def close(self):
+        if self.fmt == "npy":
+            # Pad with silence if the pieces came up short of the declared length
+            self._out.write(bytes(4 * (self.n_samples - self.written)))
+            self._out.close()
+        elif self.fmt == "wav":
+            self._out.close()
+        else:
+            self._out.stdin.close()
+            if self._out.wait() != 0:
+                raise RuntimeError(f"ffmpeg could not write {self.path}")
+
+def save_vocals(path, samples):
+    """Writes 16 kHz mono float32 vocals in the format given by path's extension."""
+    writer = VocalsWriter(path, len(samples))
+    try:
+        writer.write(samples)
+    finally:
+        writer.close()
+
+def load_vocals(path):
+    """Returns the vocals as float32; for npy a read-only memory map, so nothing is decoded or copied."""
+    fmt = _format(path)
+    if fmt == "npy":
+        return np.load(path, mmap_mode="r")
+    if fmt == "wav":
+        return read_wav(path)[0]
+    return _ffmpeg_pcm(path)
+
+def vocals_length(path):
+    """Number of samples, from the header alone."""
+    fmt = _format(path)
+    if fmt == "npy":
+        return len(np.load(path, mmap_mode="r"))
+    if fmt == "wav":
+        return wav_layout(path)[1]
+    out = subprocess.run(
+        ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", path],
+        capture_output=True, text=True, check=True,
+    ).stdout
+    return int(round(float(out.strip()) * WHISPER_RATE))
+
+def read_vocals_window(path, start, count):
+    """count samples from start. For npy a view of a memory map that is released with the view."""
+    fmt = _format(path)
+    if fmt == "npy":
+        return np.load(path, mmap_mode="r")[start:start + count]
+    if fmt == "wav":
+        return read_wav_window(path, start, count)
+    return _ffmpeg_pcm(path, start, count)
@@ -0,0 +1,314 @@
+# ---------------------------
+# Bounded-memory streaming for hour-long recordings.
+#
+# Concert recordings and DJ sets are too long to separate and transcribe in
+# one piece: the decoded input, the stems and the 16 kHz vocals all grow with
+# the duration. In streaming mode the input is decoded once to a 16-bit WAV
+# on disk, then read back in fixed windows (LYRICS_STREAM_WINDOW_S, with
+# LYRICS_STREAM_OVERLAP_S of overlap) through short-lived numpy.memmap views.
+# Each window is separated, written to the compact 16 kHz vocals file and
+# transcribed, then released, so peak memory depends on the window length and
+# not on the track length. Segments from the overlaps are de-duplicated the
+# same way as in chunked.py.
+#
+# Inputs of at least LYRICS_STREAM_MIN_S seconds are streamed automatically;
+# LYRICS_STREAMING=1 streams everything and LYRICS_STREAMING=0 nothing.
+#
+# Shorter songs use the same windows to overlap the two stages (unless
+# LYRICS_OVERLAP=0): the decoded mix stays in memory, and while one window is
+# being transcribed the next LYRICS_STREAM_PREFETCH windows are already being
+# separated in a background thread, so the first lyrics arrive after one
+# window's separation instead of the whole song's.
+import os
+import queue
+import time
+import shutil
+import threading
+import subprocess
+import numpy as np
+from audio import WHISPER_RATE, wav_layout, read_wav_window, to_whisper_input
+from stem_store import VocalsWriter, vocals_length, read_vocals_window
+from chunked import Segment, ChunkedInfo, plan_windows, owned_range
+from stem_cache import get_stem_cache, hash_file
+
+MODE = os.getenv("LYRICS_STREAMING", "auto")
+MIN_SECONDS = float(os.getenv("LYRICS_STREAM_MIN_S", "1200"))
+WINDOW_SECONDS = float(os.getenv("LYRICS_STREAM_WINDOW_S", "60"))
+OVERLAP_SECONDS = float(os.getenv("LYRICS_STREAM_OVERLAP_S", "5"))
+# Windows separated ahead of the one being transcribed (0: one after the other)
+PREFETCH = int(os.getenv("LYRICS_STREAM_PREFETCH", "1"))
+OVERLAP = os.getenv("LYRICS_OVERLAP", "1") == "1"
+MIX_RATE = 44100
+MIX_WAV = "mix.wav"
+
+# -----------------------
+def probe_duration(audio_path):
+    """Duration in seconds from the WAV header or ffprobe, without decoding; None if unknown."""
+    try:
+        _, n_frames, _, sample_rate = wav_layout(audio_path)
+        return n_frames / sample_rate
+    except Exception:
+        pass
+    try:
+        out = subprocess.run(
+            ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", audio_path],
+            capture_output=True, text=True, check=True,
+        ).stdout
+        return float(out.strip())
+    except (OSError, ValueError, subprocess.CalledProcessError):
+        return None
+
+def should_stream(audio_path):
+    if MODE in ("0", "1"):
+        return MODE == "1"
+    duration = probe_duration(audio_path)
+    return duration is not None and duration >= MIN_SECONDS
+
+def decode_to_wav(audio_path, wav_path):
+    """Returns a 44.1 kHz 16-bit PCM WAV of audio_path: the input itself if it already is one."""
+    try:
+        if wav_layout(audio_path)[3] == MIX_RATE:
+            return audio_path
+    except Exception:
+        pass
+    # ffmpeg streams the conversion, so this does not hold the track in memory either
+    subprocess.run(
+        ["ffmpeg", "-nostdin", "-v", "error", "-y", "-i", audio_path,
+         "-ar", str(MIX_RATE), "-c:a", "pcm_s16le", wav_path],
+        check=True,
+    )
+    return wav_path
+
+# -----------------------
+class StreamedVocals:
+    """Vocals of a long track, separated and read window by window instead of held in memory.
+
+    Built by open_vocals() or open_overlapped(). Either vocals_path (cached
+    16 kHz vocals), mix_path (the decoded input on disk) or mix (the decoded
+    input in memory) is set; a mix is separated on the fly. Pipelines pass
+    it where they would pass a vocals array; transcriber.transcribe_stream
+    decodes it window by window.
+    """
+
+    def __init__(self, vocals_path=None, mix_path=None, work_dir=None, key=None,
+                 window_s=WINDOW_SECONDS, overlap_s=OVERLAP_SECONDS, mix=None):
+        self.vocals_path = vocals_path
+        self.mix_path = mix_path
+        self.mix = mix
+        self.work_dir = work_dir
+        self.key = key
+        self.window_s = window_s
+        self.overlap_s = overlap_s
+        # Windows head() separated, handed over to windows() instead of separating them again
+        self._ahead = {}
+        if vocals_path:
+            self.duration_s = vocals_length(vocals_path) / WHISPER_RATE
+        elif mix is not None:
+            self.duration_s = len(mix) / MIX_RATE
+        else:
+            self.layout = wav_layout(mix_path)
+            self.duration_s = self.layout[1] / self.layout[3]
+
+    def __len__(self):
+        return int(self.duration_s * WHISPER_RATE)
+
+    @property
+    def nbytes(self):
+        # What the 16 kHz float32 vocals would take in memory
+        return len(self) * 4
+
+    def plan(self):
+        return plan_windows(self.duration_s, self.window_s, self.overlap_s)
+
+    def read(self, start_s, end_s):
+        """16 kHz mono vocals for [start_s, end_s), separating the mix if needed."""
+        if self.vocals_path:
+            start = int(start_s * WHISPER_RATE)
+            return read_vocals_window(self.vocals_path, start, int(end_s * WHISPER_RATE) - start)
+        ahead = self._ahead.pop((start_s, end_s), None)
+        if ahead is not None:
+            return ahead
+        import preanalysis
+        from separator import separate, separate_where_needed
+        if self.mix is not None:
+            rate = MIX_RATE
+            mix = self.mix[int(start_s * rate):int(end_s * rate)]
+        else:
+            _, _, _, rate = self.layout
+            start = int(start_s * rate)
+            mix = read_wav_window(self.mix_path, start, int(end_s * rate) - start, self.layout)
+        stems = separate_where_needed(mix) if preanalysis.ENABLED else separate(mix)
+        return to_whisper_input(stems["vocals"], rate)
+
+    def head(self, seconds):
+        """The first `seconds` of vocals, e.g. for language detection.
+
+        Before separation the head is assembled from whole windows of plan(),
+        which windows() then reuses.
+        """
+        seconds = min(seconds, self.duration_s)
+        if self.vocals_path:
+            return self.read(0.0, seconds)
+        pieces = []
+        covered = 0.0
+        for start, end in self.plan():
+            if covered >= seconds:
+                break
+            vocals = self._ahead[(start, end)] = self.read(start, end)
+            pieces.append(vocals[int((covered - start) * WHISPER_RATE):])
+            covered = end
+        return np.concatenate(pieces)[:int(seconds * WHISPER_RATE)]
+
+    def _separated(self, windows):
+        """Yields (start_s, vocals) for each window, separating up to PREFETCH windows ahead in a thread."""
+        if self.vocals_path or PREFETCH < 1 or len(windows) < 2:
+            for start, end in windows:
+                yield start, self.read(start, end)
+            return
+        from scheduler import job_context
+        ready = queue.Queue(maxsize=PREFETCH)
+        stop = threading.Event()
+
+        def hand_over(item):
+            while not stop.is_set():
+                try:
+                    ready.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def separate_ahead():
+            try:
+                for start, end in windows:
+                    if not hand_over((start, self.read(start, end))):
+                        return
+            except BaseException as e:
+                hand_over(e)
+
+        thread = threading.Thread(target=job_context(separate_ahead), name="separate-ahead", daemon=True)
+        thread.start()
+        try:
+            for _ in windows:
+                item = ready.get()
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            thread.join()
+
+    def windows(self):
+        """Yields (start_s, 16 kHz vocals) for each window of plan().
+
+        On a first pass the separated vocals are written to the stem cache's
+        16 kHz vocals file as they are produced (each overlap written once),
+        and the entry is stored when the last window is done.
+        """
+        from separator import VOCALS_16K
+        windows = self.plan()
+        writer = None
+        if not self.vocals_path:
+            writer = VocalsWriter(os.path.join(self.work_dir, VOCALS_16K), len(self))
+        written_s = 0.0
+        finished = False
+        separated = self._separated(windows)
+        try:
+            for index, (start, vocals) in enumerate(separated):
+                end = windows[index][1]
+                print(f"[INFO] Streaming window {index + 1}/{len(windows)} ({start:.0f}-{end:.0f}s)", flush=True)
+                if writer is not None:
+                    writer.write(vocals[int((written_s - start) * WHISPER_RATE):])
+                    written_s = end
+                yield start, vocals
+                del vocals
+            finished = True
+        finally:
+            separated.close()  # stops the separation thread
+            if writer is not None:
+                writer.close()
+                self._finish(finished)
+
+    def _finish(self, complete):
+        """Stores the streamed vocals in the stem cache, or drops the partial work."""
+        from separator import VOCALS_16K
+        if not complete:
+            shutil.rmtree(self.work_dir, ignore_errors=True)
+            return
+        mix = os.path.join(self.work_dir, MIX_WAV)
+        if os.path.exists(mix):
+            os.remove(mix)  # only the compact vocals are worth keeping
+        entry = get_stem_cache().store(self.key, self.work_dir)
+        self.vocals_path = os.path.join(entry, VOCALS_16K)
+        self.mix_path = self.mix = self.work_dir = None
+        self._ahead.clear()
+
+    def transcribe(self, size, details, **options):
+        """transcribe_stream's (info, segments) contract, decoding one window at a time."""
+        from transcriber import decode
+        windows = self.plan()
+        duration = self.duration_s
+
+        def stream():
+            # Time spent waiting for separated windows, which the transcribe stage's duration includes
+            separating = not self.vocals_path
+            waited = time.perf_counter()
+            for index, (offset, vocals) in enumerate(self.windows()):
+                if separating:
+                    details["separate_s"] = round(details.get("separate_s", 0.0) + time.perf_counter() - waited, 4)
+                lo, hi = owned_range(index, windows)
+                _, segments = decode(vocals, size, details, **options)
+                for segment, _ in segments:
+                    start, end = segment.start + offset, segment.end + offset
+                    if not lo <= (start + end) / 2 < hi:
+                        continue
+                    progress = min(end / duration, 1.0) if duration else 0.0
+                    yield Segment(start, end, segment.text, segment.avg_logprob,
+                                  segment.no_speech_prob, segment.compression_ratio), progress
+                waited = time.perf_counter()
+
+        return ChunkedInfo(duration, options.get("language")), stream()
+
+def open_vocals(audio_path, key=None):
+    """Returns StreamedVocals for audio_path: cached vocals if separated before, else the decoded mix."""
+    from separator import VOCALS_16K
+    cache = get_stem_cache()
+    key = key or hash_file(audio_path)
+    vocals_path = cache.lookup(key, VOCALS_16K)
+    if vocals_path:
+        print(f"[INFO] Stem cache hit ({key[:12]}), streaming cached vocals.", flush=True)
+        return StreamedVocals(vocals_path=vocals_path)
+    work_dir = cache.new_workdir()
+    try:
+        mix_path = decode_to_wav(audio_path, os.path.join(work_dir, MIX_WAV))
+        return StreamedVocals(mix_path=mix_path, work_dir=work_dir, key=key)
+    except BaseException:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        raise
+
+def open_overlapped(audio_path, load_audio, window_s=WINDOW_SECONDS, key=None, mix=None):
+    """StreamedVocals that separate the decoded mix of audio_path a window ahead of the transcriber.
+
+    Returns None when there is nothing to overlap: the vocals are already in
+    the stem cache, or the song fits in a single window. mix is the decoded
+    input when the caller already has it.
+    """
+    from separator import VOCALS_16K
+    cache = get_stem_cache()
+    key = key or hash_file(audio_path)
+    # Not counted: on a hit, or when this declines, the caller's cached_stem looks the key up
+    if cache.lookup(key, VOCALS_16K, count=False):
+        return None
+    duration = len(mix) / MIX_RATE if mix is not None else probe_duration(audio_path)
+    if duration is not None and duration <= window_s:
+        return None
+    if mix is None:
+        mix = load_audio(audio_path)
+    vocals = StreamedVocals(mix=mix, work_dir=cache.new_workdir(), key=key, window_s=window_s)
+    if len(vocals.plan()) < 2:
+        shutil.rmtree(vocals.work_dir, ignore_errors=True)
+        return None
+    cache.record_miss()
+    print(f"[INFO] Separating and transcribing {vocals.duration_s:.0f}s in {len(vocals.plan())} "
+          f"overlapping windows", flush=True)
+    return vocals
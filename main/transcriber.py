@@ -0,0 +1,180 @@
+import os
+import time
+import threading
+from functools import lru_cache
+from events import emit
+
+# faster_whisper/ctranslate2 are imported on first use so that scripts which
+# only submit jobs to the worker start quickly.
+
+# -----------------------
+# Resident FasterWhisper models, keyed by (size, device, compute_type, cpu_threads, num_workers).
+# Loading a model takes seconds, so every pipeline shares the same instances;
+# the governor sizes a single one per size (see governor.py).
+_models = {}
+_governed = set()  # the keys the governor sized
+_models_lock = threading.Lock()
+
+@lru_cache(maxsize=None)
+def get_device():
+    """Returns the (device, compute_type) pair used for FasterWhisper.
+
+    Asks CTranslate2 (which faster-whisper already depends on) for CUDA
+    devices instead of importing torch just for torch.cuda.is_available().
+    """
+    try:
+        import ctranslate2
+    except ImportError:
+        return "cpu", "int8"
+    if ctranslate2.get_cuda_device_count() > 0:
+        return "cuda", "float16"
+    return "cpu", "int8"
+
+def create_model(size, device, compute_type, cpu_threads, num_workers=1):
+    from faster_whisper import WhisperModel
+    return WhisperModel(size, device=device, compute_type=compute_type, cpu_threads=cpu_threads,
+                        num_workers=num_workers)
+
+# Swappable so the benchmarks can run the pipeline with a stub backend
+model_factory = create_model
+
+def load_model(size, cpu_threads=None, device=None, compute_type=None, num_workers=1):
+    """Returns a resident WhisperModel, loading it on first use.
+
+    Without cpu_threads the thread count and num_workers come from the
+    governor (see governor.py), and a variant the governor sized differently
+    before (the job slots changed) is dropped. cpu_threads=0 lets CTranslate2
+    pick its own. device and compute_type default to get_device().
+    """
+    governed = cpu_threads is None
+    if governed:
+        from governor import governor
+        cpu_threads, num_workers = governor.whisper_threads()
+    if device is None or compute_type is None:
+        default_device, default_compute_type = get_device()
+        device = device or default_device
+        compute_type = compute_type or default_compute_type
+    key = (size, device, compute_type, cpu_threads, num_workers)
+    with _models_lock:
+        model = _models.get(key)
+        if model is None:
+            threads = f", {cpu_threads or 'auto'} threads x {num_workers}" if device == "cpu" else ""
+            print(f"[INFO] Loading FasterWhisper '{size}' model ({device}, {compute_type}{threads})...", flush=True)
+            model = model_factory(size, device, compute_type, cpu_threads, num_workers)
+            if governed:
+                for stale in [k for k in _models if k[:3] == key[:3] and k in _governed]:
+                    del _models[stale]  # jobs still decoding on it keep their reference
+                    _governed.discard(stale)
+                _governed.add(key)
+            _models[key] = model
+    return model
+
+def loaded_models():
+    """Lists the sizes of the models currently held in memory."""
+    with _models_lock:
+        return sorted({key[0] for key in _models})
+
+def transcribe_stream(audio, size, **options):
+    """Starts decoding and returns (info, segments).
+
+    segments yields (segment, progress) pairs as FasterWhisper decodes them,
+    where progress is segment.end / info.duration. With
+    LYRICS_TRANSCRIBE_WORKERS > 1 long tracks are split into overlapping
+    windows and decoded in a process pool (see chunked.py). Unless LYRICS_VAD=0
+    only the active regions of the audio are decoded and the timestamps are
+    mapped back (see vad.py). StreamedVocals are decoded window by window
+    (see streaming.py). The whole run,
+    until segments is exhausted, is reported as the "transcribe" stage.
+    """
+    from streaming import StreamedVocals
+    started = time.perf_counter()
+    emit("stage_start", stage="transcribe", model=size)
+    size_bytes = audio.nbytes if hasattr(audio, "nbytes") else os.path.getsize(audio)
+    details = {"model": size, "beam_size": options.get("beam_size", 5), "bytes": size_bytes, "segments": 0}
+    try:
+        if isinstance(audio, StreamedVocals):
+            info, segments = audio.transcribe(size, details, **options)
+        else:
+            info, segments = decode(audio, size, details, **options)
+    except BaseException as e:
+        emit("stage_end", stage="transcribe", status="error", error=str(e),
+             duration_s=round(time.perf_counter() - started, 4))
+        raise
+    details["audio_s"] = round(info.duration, 2)
+    return info, _reported(segments, started, details)
+
+def decode(audio, size, details, **options):
+    """Returns (info, segments) for a path or 16 kHz array: gated, then decoded in one stream or in chunks.
+
+    Adds the active seconds to details when gating is on.
+    """
+    from chunked import TRANSCRIBE_WORKERS, ChunkedInfo, transcribe_chunked
+    import vad
+    if vad.ENABLED:
+        audio, activity = gate_audio(audio)
+        details["active_s"] = round(details.get("active_s", 0.0) + activity.active_s, 2)
+        if not len(activity.regions):
+            # Nothing but silence and bleed: nothing to decode
+            return ChunkedInfo(activity.duration_s, options.get("language")), iter(())
+    if TRANSCRIBE_WORKERS > 1:
+        info, segments = transcribe_chunked(audio, size, workers=TRANSCRIBE_WORKERS, **options)
+    else:
+        info, segments = transcribe_single(audio, size, **options)
+    if vad.ENABLED:
+        info, segments = ungated(info, segments, activity)
+    return info, segments
+
+def gate_audio(audio):
+    """Returns (active regions packed together, vad.Gate) for a path or 16 kHz array."""
+    import vad
+    from chunked import decode_audio
+    packed, activity = vad.gate(decode_audio(audio))
+    print(f"[INFO] Vocal activity: {activity.active_s:.1f}s of {activity.duration_s:.1f}s in "
+          f"{len(activity.regions)} region(s), skipping {vad.skipped_fraction(activity):.0%}", flush=True)
+    return packed, activity
+
+def ungated(info, segments, activity):
+    """Maps (info, segments) decoded from packed audio back to the original timeline."""
+    import vad
+    from chunked import Segment, ChunkedInfo
+    duration = activity.duration_s
+
+    def stream():
+        for segment, _ in segments:
+            start = vad.to_original(activity, segment.start, starts=True)
+            end = max(start, vad.to_original(activity, segment.end))
+            progress = min(end / duration, 1.0) if duration else 0.0
+            yield Segment(float(start), float(end), segment.text, segment.avg_logprob,
+                          segment.no_speech_prob, segment.compression_ratio), progress
+
+    return ChunkedInfo(duration, info.language), stream()
+
+def _reported(segments, started, details):
+    try:
+        for segment, progress in segments:
+            details["segments"] += 1
+            yield segment, progress
+    except BaseException as e:
+        emit("stage_end", stage="transcribe", status="error", error=str(e) or type(e).__name__,
+             duration_s=round(time.perf_counter() - started, 4), **details)
+        raise
+    if "active_s" in details and details["audio_s"]:
+        details["skipped_fraction"] = round(max(0.0, 1 - details["active_s"] / details["audio_s"]), 4)
+    emit("stage_end", stage="transcribe", status="ok",
+         duration_s=round(time.perf_counter() - started, 4), **details)
+
+def transcribe_single(audio, size, **options):
+    """transcribe_stream on a single decoding stream in this process."""
+    model = load_model(size)
+    segments, info = model.transcribe(audio, **options)
+
+    def stream():
+        for segment in segments:
+            progress = min(segment.end / info.duration, 1.0) if info.duration else 0.0
+            yield segment, progress
+
+    return info, stream()
+
+def report_segment(line, progress):
+    """Publishes a finished lyric line and the transcription progress to live consumers."""
+    emit("segment", text=line, progress=round(progress, 4))
@@ -0,0 +1,105 @@
+# ---------------------------
+# Energy-based vocal-activity gating in front of Whisper.
+#
+# Separated vocals are mostly silence and accompaniment bleed, and Whisper
+# spends time on those stretches and tends to hallucinate text in them. Here
+# the 16 kHz vocals get a vectorized activity map (frame RMS in dB against a
+# threshold LYRICS_VAD_RANGE_DB below the loud frames, padded, with short gaps
+# closed and blips dropped), the active regions are packed into one shorter
+# array with a little silence between them, and segment timestamps are mapped
+# back to the original timeline afterwards. LYRICS_VAD=0 turns it off.
+import os
+from collections import namedtuple
+import numpy as np
+
+ENABLED = os.getenv("LYRICS_VAD", "1") == "1"
+# Frames quieter than the loud frames (95th percentile) by this much are inactive
+RANGE_DB = float(os.getenv("LYRICS_VAD_RANGE_DB", "35"))
+# ... and so is anything under this absolute level
+FLOOR_DB = float(os.getenv("LYRICS_VAD_FLOOR_DB", "-55"))
+FRAME_S = 0.02
+# Activity is widened by PAD_S on each side, gaps shorter than MIN_GAP_S are
+# closed and regions shorter than MIN_ACTIVE_S dropped
+PAD_S = float(os.getenv("LYRICS_VAD_PAD_S", "0.3"))
+MIN_GAP_S = float(os.getenv("LYRICS_VAD_MIN_GAP_S", "1.5"))
+MIN_ACTIVE_S = 0.25
+# Silence inserted between packed regions so words on either side do not run together
+JOIN_S = 0.3
+SAMPLE_RATE = 16000
+
+Gate = namedtuple("Gate", ["regions", "packed_starts", "duration_s", "active_s"])
+
+def frame_db(samples, frame):
+    """RMS level in dBFS of consecutive frames of a 1-D signal (the tail is its own frame)."""
+    samples = np.asarray(samples, dtype=np.float32)
+    usable = len(samples) // frame * frame
+    power = np.square(samples[:usable].reshape(-1, frame), dtype=np.float32).mean(axis=1)
+    if usable < len(samples):
+        power = np.append(power, np.square(samples[usable:], dtype=np.float32).mean())
+    return 10 * np.log10(power + 1e-12)
+
+def activity_map(samples, sample_rate=SAMPLE_RATE, range_db=RANGE_DB, floor_db=FLOOR_DB,
+                 pad_s=PAD_S, min_gap_s=MIN_GAP_S, min_active_s=MIN_ACTIVE_S):
+    """Returns active (start_s, end_s) regions of a 1-D signal as an (n, 2) float array."""
+    frame = int(FRAME_S * sample_rate)
+    levels = frame_db(samples, frame)
+    if not len(levels):
+        return np.zeros((0, 2))
+    threshold = max(floor_db, np.percentile(levels, 95) - range_db)
+    active = levels > threshold
+    if not active.any():
+        return np.zeros((0, 2))
+    # Run boundaries of the active frames
+    edges = np.diff(np.concatenate([[0], active.astype(np.int8), [0]]))
+    starts = np.flatnonzero(edges == 1) * FRAME_S - pad_s
+    ends = np.flatnonzero(edges == -1) * FRAME_S + pad_s
+    # Close short gaps: a region only starts where the gap before it is long enough
+    keep = np.concatenate([[True], starts[1:] - ends[:-1] >= min_gap_s])
+    starts = starts[keep]
+    ends = ends[np.concatenate([keep[1:], [True]])]
+    duration = len(samples) / sample_rate
+    regions = np.stack([np.clip(starts, 0, duration), np.clip(ends, 0, duration)], axis=1)
+    return regions[regions[:, 1] - regions[:, 0] >= min_active_s]
+
+def pack(pieces, sample_rate=SAMPLE_RATE):
+    """Returns (samples, packed start of each piece in seconds): the pieces back to back, JOIN_S apart."""
+    join = np.zeros(int(JOIN_S * sample_rate), dtype=np.float32)
+    parts = []
+    packed_starts = []
+    position = 0
+    for piece in pieces:
+        packed_starts.append(position / sample_rate)
+        parts += [piece, join]
+        position += len(piece) + len(join)
+    packed = np.concatenate(parts[:-1]).astype(np.float32) if parts else np.zeros(0, dtype=np.float32)
+    return packed, np.array(packed_starts, dtype=np.float64)
+
+def gate(samples, sample_rate=SAMPLE_RATE, **options):
+    """Returns (packed samples, Gate): the active regions back to back, JOIN_S apart."""
+    regions = activity_map(samples, sample_rate, **options)
+    lengths = regions[:, 1] - regions[:, 0]
+    packed, packed_starts = pack(
+        (samples[int(start * sample_rate):int(end * sample_rate)] for start, end in regions), sample_rate)
+    duration = len(samples) / sample_rate
+    return packed, Gate(regions, packed_starts, duration, float(lengths.sum()))
+
+def to_original(gate, times, starts=False):
+    """Maps times on the packed timeline back to the original one (vectorized).
+
+    A time inside the silence between two packed regions maps to the end of
+    the region before it, or with starts=True to the start of the one after.
+    """
+    times = np.asarray(times, dtype=np.float64)
+    if not len(gate.regions):
+        return times
+    last = len(gate.regions) - 1
+    index = np.clip(np.searchsorted(gate.packed_starts, times, side="right") - 1, 0, last)
+    offset = times - gate.packed_starts[index]
+    if starts:
+        in_join = (offset > gate.regions[index, 1] - gate.regions[index, 0]) & (index < last)
+        index = np.where(in_join, index + 1, index)
+        offset = np.where(in_join, 0.0, offset)
+    return np.minimum(gate.regions[index, 0] + offset, gate.regions[index, 1])
+
+def skipped_fraction(gate):
+    return round(1 - gate.active_s / gate.duration_s, 4) if gate.duration_s else 0.0
@@ -0,0 +1,277 @@
+# ---------------------------
+# Long-lived transcription worker.
+#
+# Keeps the FasterWhisper models (and the heavy TF imports) resident and runs
+# pipeline jobs submitted over a local socket. Jobs are queued and run
+# concurrently by the scheduler (see scheduler.py), each in its own work
+# directory; clients poll for the job's state, its structured events (see
+# events.py) and the lines it prints.
+#
+#   python worker.py                      # start the worker
+#   python worker.py --preload spleeter large-v2   # start and load models up front
+import os
+import sys
+import time
+import secrets
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.connection import Listener, Client
+from scheduler import Scheduler, QueueFull
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+WORKER_ADDRESS = (
+    os.getenv("LYRICS_WORKER_HOST", "127.0.0.1"),
+    int(os.getenv("LYRICS_WORKER_PORT", "6010")),
+)
+# The socket carries pickles, so the key must stay private: a random one is
+# created on first use in a file only this user can read (see authkey())
+WORKER_KEY_FILE = os.getenv("LYRICS_WORKER_KEY_FILE", os.path.join(BACKEND_DIR, "cache", "worker.key"))
+WORKER_LOG = os.path.join(BACKEND_DIR, "worker.log")
+POLL_INTERVAL = 0.25
+# Threads answering "identify" requests, which decode and fingerprint audio
+IDENTIFY_THREADS = 2
+
+# -----------------------
+def authkey(path=WORKER_KEY_FILE):
+    """The shared secret of the worker and its clients: LYRICS_WORKER_AUTHKEY, or a random key kept in path."""
+    if os.getenv("LYRICS_WORKER_AUTHKEY"):
+        return os.environ["LYRICS_WORKER_AUTHKEY"].encode()
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    try:
+        # O_EXCL: whichever of the worker and a client gets here first creates it, the other reads it
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        if os.stat(path).st_mode & 0o077:
+            os.chmod(path, 0o600)
+        with open(path, "rb") as f:
+            key = f.read().strip()
+        if key:
+            return key
+        # An empty file: the creator has not written it yet
+        time.sleep(0.1)
+        with open(path, "rb") as f:
+            return f.read().strip()
+    key = secrets.token_hex(32).encode()
+    with os.fdopen(fd, "wb") as f:
+        f.write(key)
+    return key
+
+# -----------------------
+# Server side
+def run_job(job, work_dir="."):
+    """Runs one pipeline job in this process, writing its output files to work_dir, and returns the lyrics."""
+    kind = job["kind"]
+    audio_path = job["audio_path"]
+    if kind == "english":
+        import main as pipeline
+        return pipeline.process_song(audio_path, job.get("use_gemini", False), out_dir=work_dir)
+    if kind == "hindi":
+        import hindi1
+        return hindi1.process_song(audio_path, job.get("output_type", "cleaned"), out_dir=work_dir)
+    if kind == "bilingual":
+        import bilingual
+        return bilingual.process_bilingual_song(audio_path, job.get("mode", "1"), out_dir=work_dir)
+    if kind == "auto":
+        import router
+        return router.process_song(audio_path, out_dir=work_dir)
+    if kind == "improve":
+        import improve
+        return improve.improve_song(audio_path, job["segments"], job.get("pipeline", "english"), out_dir=work_dir,
+                                    output_type=job.get("output_type", "cleaned"), mode=job.get("mode", "1"))
+    raise ValueError(f"Unknown job kind: {kind}")
+
+def identify(audio_path):
+    """The song key of audio_path, for looking up results of other encodings of it (see fingerprint.py).
+
+    Decodes no more than the fingerprinted start of a file not seen before.
+    """
+    import fingerprint
+    import separator
+    from streaming import probe_duration
+    duration = probe_duration(audio_path)
+    if duration is None:
+        return fingerprint.song_key(audio_path, separator.load_audio, separator.SAMPLE_RATE)[0]
+    head = lambda path: separator.load_audio(path, duration=fingerprint.SECONDS)
+    return fingerprint.song_key(audio_path, head, separator.SAMPLE_RATE, duration)[0]
+
+def handle(conn, request, scheduler):
+    """Answers one request: ("ping",), ("enqueue", job), ("status", job_id, since), ("pending",)
+    or ("identify", audio_path)."""
+    action = request[0]
+    try:
+        if action == "ping":
+            from transcriber import loaded_models
+            reply = {"pid": os.getpid(), "models": loaded_models()}
+            reply.update(scheduler.stats())
+        elif action == "enqueue":
+            job = request[1]
+            reply = scheduler.submit(job)
+            print(f"[INFO] Job queued: {reply} {job.get('kind')} {job.get('audio_path')}", flush=True)
+        elif action == "status":
+            reply = scheduler.status(request[1], request[2])
+        elif action == "pending":
+            reply = scheduler.pending_paths()
+        elif action == "identify":
+            reply = identify(request[1])
+        else:
+            raise ValueError(f"Unknown request: {action}")
+    except QueueFull as e:
+        conn.send(("busy", str(e)))
+    except Exception as e:
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+    else:
+        conn.send(("done", reply))
+
+def answer(conn, request, scheduler):
+    """Handles one request and closes the connection."""
+    with conn:
+        try:
+            handle(conn, request, scheduler)
+        except (EOFError, BrokenPipeError, ConnectionResetError):
+            pass
+
+def serve(preload=()):
+    # Jobs write into their own work dirs; anything else is relative to the backend directory.
+    os.chdir(BACKEND_DIR)
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+    from transcriber import load_model
+    from separator import get_separator
+    # Created first so the thread budget of preloaded models matches the job slots
+    scheduler = Scheduler(run_job)
+    for name in preload:
+        if name == "spleeter":
+            get_separator()
+        else:
+            load_model(name)
+    with Listener(WORKER_ADDRESS, authkey=authkey()) as listener:
+        print(f"[INFO] Worker listening on {WORKER_ADDRESS[0]}:{WORKER_ADDRESS[1]} "
+              f"(pid {os.getpid()}, {scheduler.max_jobs} concurrent jobs)", flush=True)
+        identify_pool = ThreadPoolExecutor(IDENTIFY_THREADS, thread_name_prefix="identify")
+        while True:
+            try:
+                conn = listener.accept()
+            except Exception as e:
+                print(f"[ERROR] Rejected connection: {e}", flush=True)
+                continue
+            try:
+                request = conn.recv()
+            except (EOFError, BrokenPipeError, ConnectionResetError):
+                conn.close()
+                continue
+            if request[0] == "identify":
+                # Decodes audio: answered on a pool thread so other clients' polls are not held up
+                identify_pool.submit(answer, conn, request, scheduler)
+                continue
+            # Everything else only touches the scheduler's bookkeeping, so this loop answers it
+            answer(conn, request, scheduler)
+
+# -----------------------
+# Client side
+def start_worker():
+    """Starts a detached worker process that outlives the caller."""
+    log = open(WORKER_LOG, "a", encoding="utf-8")
+    env = os.environ.copy()
+    env["PYTHONIOENCODING"] = "utf-8"
+    subprocess.Popen(
+        [sys.executable, os.path.join(BACKEND_DIR, "worker.py")],
+        cwd=BACKEND_DIR,
+        stdout=log,
+        stderr=subprocess.STDOUT,
+        stdin=subprocess.DEVNULL,
+        env=env,
+        start_new_session=True,
+    )
+    log.close()
+
+def connect(autostart=True, timeout=120):
+    """Connects to the worker, starting one first if none is running."""
+    try:
+        return Client(WORKER_ADDRESS, authkey=authkey())
+    except ConnectionRefusedError:
+        if not autostart:
+            raise
+    start_worker()
+    deadline = time.time() + timeout
+    while True:
+        try:
+            return Client(WORKER_ADDRESS, authkey=authkey())
+        except ConnectionRefusedError:
+            if time.time() > deadline:
+                raise RuntimeError(f"Worker did not start within {timeout}s, see {WORKER_LOG}")
+            time.sleep(0.5)
+
+def request(message, autostart=True):
+    """Sends one request to the worker and returns its reply."""
+    with connect(autostart) as conn:
+        conn.send(message)
+        kind, payload = conn.recv()
+    if kind == "done":
+        return payload
+    if kind == "busy":
+        raise QueueFull(payload)
+    raise RuntimeError(payload)
+
+def enqueue(job, autostart=True):
+    """Queues a job on the worker and returns its id; raises QueueFull if the worker is saturated."""
+    job = dict(job)
+    if "audio_path" in job:
+        job["audio_path"] = os.path.abspath(job["audio_path"])
+    return request(("enqueue", job), autostart)
+
+def song_key(audio_path, autostart=True):
+    """Asks the worker for the song key of audio_path (the file hash of its first upload)."""
+    return request(("identify", os.path.abspath(audio_path)), autostart)
+
+def job_status(job_id, since=0):
+    """Returns the job's state, queue position and the messages it produced from index since on."""
+    return request(("status", job_id, since), autostart=False)
+
+def pending_paths():
+    """Audio paths the worker's queued and running jobs still need; none when no worker is running."""
+    try:
+        return request(("pending",), autostart=False)
+    except ConnectionRefusedError:
+        return []
+
+def wait(job_id, on_log=None, on_event=None, on_status=None, poll_interval=POLL_INTERVAL):
+    """Polls a queued job until it finishes and returns its result.
+
+    Printed lines are passed to on_log and structured events to on_event as
+    they arrive; on_status sees every status reply (e.g. to show the queue position).
+    """
+    since = 0
+    while True:
+        status = job_status(job_id, since)
+        since = status["next"]
+        for kind, payload in status["messages"]:
+            if kind == "event":
+                if on_event:
+                    on_event(payload)
+            elif on_log:
+                on_log(payload)
+        if on_status:
+            on_status(status)
+        if status["state"] == "done":
+            return status["result"]
+        if status["state"] == "error":
+            raise RuntimeError(status["error"])
+        time.sleep(poll_interval)
+
+def submit(job, on_log=None, on_event=None, autostart=True):
+    """Queues a job on the worker and waits for its result (see wait)."""
+    return wait(enqueue(job, autostart), on_log, on_event)
+
+def submit_or_run(job, fallback):
+    """CLI helper: uses a running worker if there is one, otherwise calls fallback in-process."""
+    import events
+    try:
+        return submit(job, on_log=print, on_event=events.dispatch, autostart=False)
+    except ConnectionRefusedError:
+        return fallback()
+
+# ---------- Entry ----------
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    preload = args[args.index("--preload") + 1:] if "--preload" in args else []
+    serve(preload)
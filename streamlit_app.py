@@ -1,9 +1,32 @@
 import streamlit as st
-import subprocess
 import os
+import sys
 import base64
+import hashlib
+import tempfile
 import time
 
+# Backend pipeline modules live in main/
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main")
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+from worker import enqueue, wait, song_key, pending_paths
+from scheduler import QueueFull
+from segments import Segments
+from result_cache import ResultCache
+
+# Uploads are kept by content hash so reruns and "Try Improving" reuse them
+UPLOAD_DIR = os.getenv("LYRICS_UPLOAD_DIR", os.path.join(BACKEND_DIR, "cache", "uploads"))
+UPLOAD_KEEP = int(os.getenv("LYRICS_UPLOAD_KEEP", "20"))
+# Selectbox option -> (worker job kind, download file name, flag)
+LANGUAGES = {
+    "Auto-detect": ("auto", "lyrics", "🔎"),
+    "Hindi": ("hindi", "hindi_lyrics", "🇮🇳"),
+    "English": ("english", "english_lyrics", "🇺🇸"),
+    "Bilingual": ("bilingual", "bilingual_lyrics", "🌏"),
+}
+result_cache = ResultCache()
+
 # Set page config for better appearance
 st.set_page_config(
     page_title="🎵 Lyrics Transcription App",
@@ -12,96 +35,212 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-def run_backend_script(script_name, audio_path, use_gemini=False):
-    """Runs the specified backend script and returns the output."""
+def run_backend_script(job):
+    """Submits a job to the resident backend worker and returns (lyrics, Segments, pipeline)."""
     try:
-        # Set environment variable to handle Unicode properly on Windows
-        env = os.environ.copy()
-        env['PYTHONIOENCODING'] = 'utf-8'
-        
         # Create progress bar and status
         progress_bar = st.progress(0)
         status_text = st.empty()
+        live_lyrics = st.empty()
         
-        # Prepare command with optional Gemini flag
-        command = ["python", script_name, audio_path]
-        if use_gemini:
-            command.append("gemini")
-        
-        # Start the subprocess with streaming output
-        process = subprocess.Popen(
-            ["python", script_name, audio_path],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            env=env,
-            encoding='utf-8',
-            bufsize=1,  # Line buffered
-            universal_newlines=True
-        )
-        
-        output_text = ""
-        progress_steps = {
-            "[INFO] Extracting vocals": 25,
-            "[SUCCESS] Vocals extracted": 40,
-            "[INFO] Transcribing": 50,
-            "[SUCCESS] Transcription complete": 80,
-            "[INFO] Cleaning": 90,
-            "[SUCCESS] Cleaned lyrics ready": 95,
-            "[SUCCESS] Cleaned English lyrics saved": 100
+        lyric_lines = []
+        # Progress band owned by each stage, and what to show while it runs
+        stage_progress = {
+            "separate": (5, 40, "🎵 Extracting vocals from audio..."),
+            "detect": (40, 45, "🔎 Detecting the language..."),
+            "transcribe": (45, 95, "🎙️ Transcribing audio to text..."),
+            "improve": (45, 95, "✨ Re-decoding the unclear lines..."),
         }
+        state = {"progress": 0, "lyrics": None, "segments": None, "pipeline": job.get("pipeline", job["kind"])}
         
-        current_progress = 0
+        def set_progress(value):
+            if value > state["progress"]:
+                state["progress"] = value
+                progress_bar.progress(value)
         
-        while True:
-            output = process.stdout.readline()
-            if output == '' and process.poll() is not None:
-                break
-            if output:
-                output_text += output
-                
-                # Update progress based on output
-                for key, progress_value in progress_steps.items():
-                    if key in output and progress_value > current_progress:
-                        current_progress = progress_value
-                        progress_bar.progress(current_progress)
-                        if "Extracting vocals" in key:
-                            status_text.info("🎵 Extracting vocals from audio...")
-                        elif "Vocals extracted" in key:
-                            status_text.success("✅ Vocals extracted successfully!")
-                        elif "Transcribing" in key:
-                            status_text.info("🎙️ Transcribing audio to text...")
-                        elif "Transcription complete" in key:
-                            status_text.success("✅ Transcription completed!")
-                        elif "Cleaning" in key:
-                            status_text.info("🧹 Cleaning and formatting lyrics...")
-                        elif "Cleaned lyrics ready" in key:
-                            status_text.success("✅ Lyrics processed successfully!")
-                        elif "saved" in key:
-                            status_text.success("💾 Lyrics saved! Ready for download.")
-                        break
-        
-        # Wait for process to complete
-        return_code = process.poll()
+        def on_event(event):
+            kind = event["event"]
+            if kind == "stage_start" and event["stage"] in stage_progress:
+                low, _, message = stage_progress[event["stage"]]
+                set_progress(low)
+                status_text.info(message)
+            elif kind == "stage_end" and event["stage"] in stage_progress:
+                _, high, _ = stage_progress[event["stage"]]
+                set_progress(high)
+                if event["stage"] == "separate":
+                    status_text.success("✅ Vocals extracted successfully!")
+                elif event["stage"] == "detect":
+                    pass  # the route event below says what was picked
+                elif event["stage"] == "improve":
+                    status_text.success(
+                        f"✅ Re-decoded {event.get('redecoded_s', 0):.0f}s of {event.get('audio_s', 0):.0f}s: "
+                        f"{event.get('replaced', 0)} of {event.get('spans', 0)} unclear passage(s) improved"
+                    )
+                else:
+                    status_text.success("✅ Transcription completed!")
+            elif kind == "route":
+                status_text.info(
+                    f"🔎 Detected '{event['language']}' ({event['probability']:.0%}) in {event['detect_s']:.1f}s: "
+                    f"{event['pipeline']} lyrics with the {event['model']} model"
+                )
+            elif kind == "segment":
+                # Render each lyric line as soon as it is decoded
+                low, high, message = stage_progress["improve" if job["kind"] == "improve" else "transcribe"]
+                set_progress(low + int(event["progress"] * (high - low)))
+                status_text.info(f"{message} {event['progress']:.0%}")
+                lyric_lines.append(event["text"])
+                live_lyrics.text("\n".join(lyric_lines))
+            elif kind == "result":
+                state["lyrics"] = event["lyrics"]
+                if event.get("segments"):
+                    state["segments"] = Segments.from_dict(event["segments"])
+                state["pipeline"] = event.get("pipeline", state["pipeline"])
+                status_text.success("💾 Lyrics saved! Ready for download.")
         
-        # Get any remaining output
-        remaining_stdout, stderr = process.communicate()
-        if remaining_stdout:
-            output_text += remaining_stdout
+        def on_status(status):
+            # Concurrent users queue up in the worker instead of running over each other
+            if status["state"] == "queued":
+                status_text.info(f"⏳ Waiting in queue (position {status['position']})...")
         
-        if return_code != 0:
-            st.error(f"❌ Processing failed: {stderr}")
-            return None
+        # The worker keeps the models loaded between songs; it is started on first use
+        try:
+            job_id = enqueue(job)
+        except QueueFull:
+            st.warning("🚦 The server is busy with other transcriptions. Please try again in a few minutes.")
+            return None, None, None
+        try:
+            wait(job_id, on_event=on_event, on_status=on_status)
+        except RuntimeError as e:
+            st.error(f"❌ Processing failed: {e}")
+            return None, None, None
         
-        # Complete the progress bar
+        # Complete the progress bar; the final results section replaces the live view
+        live_lyrics.empty()
         progress_bar.progress(100)
         status_text.success("🎉 Processing completed successfully!")
         
-        return output_text
+        return state["lyrics"], state["segments"], state["pipeline"]
         
     except Exception as e:
         st.error(f"❌ An unexpected error occurred: {e}")
+        return None, None, None
+
+def upload_id(audio_file):
+    return getattr(audio_file, "file_id", None) or f"{audio_file.name}:{audio_file.size}"
+
+def save_upload(audio_file, chunk_size=1 << 20):
+    """Streams an upload to UPLOAD_DIR in chunks, hashing it on the way; returns (path, sha256).
+
+    The result is remembered in the session, so reruns neither copy nor hash
+    the upload again.
+    """
+    saved = st.session_state.get("upload")
+    if saved and saved["id"] == upload_id(audio_file) and os.path.exists(saved["path"]):
+        os.utime(saved["path"])  # in use again: the most recent for prune_uploads
+        return saved["path"], saved["digest"]
+
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    suffix = "." + audio_file.name.split(".")[-1].lower()
+    sha = hashlib.sha256()
+    audio_file.seek(0)
+    with tempfile.NamedTemporaryFile(dir=UPLOAD_DIR, prefix=".upload_", suffix=suffix, delete=False) as f:
+        for chunk in iter(lambda: audio_file.read(chunk_size), b""):
+            sha.update(chunk)
+            f.write(chunk)
+    audio_file.seek(0)
+    digest = sha.hexdigest()
+    path = os.path.join(UPLOAD_DIR, digest + suffix)
+    os.replace(f.name, path)
+    st.session_state["upload"] = {"id": upload_id(audio_file), "path": path, "digest": digest}
+    prune_uploads(keep={path})
+    return path, digest
+
+def prune_uploads(keep=()):
+    """Deletes all but the UPLOAD_KEEP most recent uploads (stems and results stay cached).
+
+    Uploads in keep and those the worker's pending jobs still need are kept;
+    when the worker cannot say which those are, nothing is deleted.
+    """
+    try:
+        # The worker stores absolute paths
+        in_use = {os.path.abspath(path) for path in keep} | set(pending_paths())
+    except (QueueFull, RuntimeError, OSError):
+        return
+    uploads = []
+    for name in os.listdir(UPLOAD_DIR):
+        path = os.path.abspath(os.path.join(UPLOAD_DIR, name))
+        try:
+            if not name.startswith("."):
+                uploads.append((os.path.getmtime(path), path))
+        except OSError:
+            pass  # removed by another session meanwhile
+    for _, path in sorted(uploads, reverse=True)[UPLOAD_KEEP:]:
+        if path not in in_use:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+def identify(audio_path, digest):
+    """The song key of an upload: the digest of an earlier upload of the same song in another encoding, or its own."""
+    try:
+        return song_key(audio_path)
+    except (QueueFull, RuntimeError, OSError):
+        return digest  # the worker could not tell; the upload is only matched byte for byte
+
+def transcribe(option, audio_path, digest, use_gemini=False):
+    """Returns the result dict for an upload, from the result cache or by running a worker job."""
+    kind, filename, flag = LANGUAGES[option]
+    key = result_cache.key(digest, kind=kind, use_gemini=use_gemini)
+    result = result_cache.get(key)
+    if result is not None:
+        st.success("⚡ Same song and options as an earlier job: showing its lyrics.")
+        return dict(result, key=key, filename=filename, language_flag=flag)
+    song = identify(audio_path, digest)
+    song_result_key = result_cache.key(song, kind=kind, use_gemini=use_gemini)
+    if song != digest:
+        result = result_cache.get(song_result_key)
+    if result is None:
+        output, segments, pipeline = run_backend_script(
+            {"kind": kind, "audio_path": audio_path, "use_gemini": use_gemini})
+        if not output:
+            return None
+        result = {"output": output, "segments": segments.to_dict() if segments else None, "pipeline": pipeline}
+        if song != digest:
+            result_cache.put(song_result_key, result)
+    else:
+        st.success("⚡ Same song as an earlier upload in another format: showing its lyrics.")
+    result_cache.put(key, result)
+    return dict(result, key=key, filename=filename, language_flag=flag)
+
+def improve(option, result, audio_file):
+    """Re-decodes the unclear lines of a finished result; returns the improved result dict or None."""
+    kind, filename, flag = LANGUAGES[option]
+    pipeline = result.get("pipeline") or (kind if kind != "auto" else None)
+    if not result.get("segments") or not pipeline:
+        st.warning("⚠️ This transcript has no line timings to improve. Please transcribe the song again.")
+        return None
+    try:
+        # Also saves it again if another session's upload pruned it meanwhile
+        save_upload(audio_file)
+    except OSError as e:
+        st.error(f"❌ The uploaded file is no longer available ({e}). Please upload it again.")
         return None
+    upload = st.session_state["upload"]
+    key = result_cache.key(upload["digest"], kind=kind, improve=True)
+    improved = result_cache.get(key)
+    if improved is None:
+        # Reuses the cached vocals and the first pass; only the unclear lines are decoded again
+        output, segments, pipeline = run_backend_script(
+            {"kind": "improve", "audio_path": upload["path"], "pipeline": pipeline, "segments": result["segments"]})
+        if not output:
+            return None
+        improved = {"output": output, "segments": segments.to_dict() if segments else None, "pipeline": pipeline}
+        result_cache.put(key, improved)
+    return dict(improved, key=key, filename=f"{filename}_improved", language_flag=flag)
+
+def result_segments(result):
+    return Segments.from_dict(result["segments"]) if result.get("segments") else None
 
 def get_binary_file_downloader_html(bin_str, file_ext, file_name):
     """Generates a link allowing the data in bin_str to be downloaded."""
@@ -109,20 +248,10 @@ def get_binary_file_downloader_html(bin_str, file_ext, file_name):
     href = f'<a href="data:file/{file_ext};base64,{b64}" download="{file_name}.{file_ext}">Download {file_name}</a>'
     return href
 
-def create_download_button(lyrics_content, filename):
-    """Creates a styled download button for lyrics"""
+def create_download_button(lyrics_content, filename, segments=None):
+    """Creates a styled download button for lyrics, plus synced SRT/LRC files when timings are known"""
     if lyrics_content:
-        # Extract just the lyrics content (remove log messages)
-        lines = lyrics_content.split('\n')
-        clean_lyrics = []
-        for line in lines:
-            # Skip log messages and system output
-            if not any(marker in line for marker in ['[INFO]', '[SUCCESS]', '[ERROR]', 'INFO:spleeter']):
-                clean_line = line.strip()
-                if clean_line and not clean_line.startswith('='):
-                    clean_lyrics.append(clean_line)
-        
-        final_lyrics = '\n'.join(clean_lyrics)
+        final_lyrics = lyrics_content.strip()
         
         if final_lyrics:
             st.download_button(
@@ -133,9 +262,90 @@ def create_download_button(lyrics_content, filename):
                 key=f"download_{filename}",
                 help="Click to download the transcribed lyrics"
             )
+            if segments:
+                for fmt, label in (("srt", "🎬 Download Subtitles (SRT)"), ("lrc", "🎤 Download Synced Lyrics (LRC)")):
+                    data = segments.serialize(fmt)
+                    if not data:
+                        continue  # no timings, e.g. lyrics rewritten by Gemini
+                    st.download_button(
+                        label=label,
+                        data=data,
+                        file_name=f"{filename}.{fmt}",
+                        mime="text/plain",
+                        key=f"download_{filename}_{fmt}",
+                    )
             return True
     return False
 
+def show_results(option, result, audio_file):
+    """Renders a finished job from session state: lyrics, feedback buttons and downloads."""
+    output, filename, language_flag = result["output"], result["filename"], result["language_flag"]
+    segments = result_segments(result)
+    st.markdown("---")
+    st.markdown(f"### {language_flag} Transcription Results")
+    
+    final_lyrics = output.strip()
+    if not final_lyrics:
+        st.warning("⚠️ No lyrics content found in the output. Please try again.")
+        return
+    
+    # Display lyrics in a nice container
+    st.markdown("""
+    <div style="background: #f8f9fa; padding: 1.5rem; border-radius: 10px; 
+                border-left: 4px solid #667eea; margin: 1rem 0;">
+    """, unsafe_allow_html=True)
+    
+    st.text_area(
+        "📝 Your Lyrics:",
+        value=final_lyrics,
+        height=300,
+        help="Your transcribed lyrics are ready!"
+    )
+    
+    st.markdown("</div>", unsafe_allow_html=True)
+    
+    # Feedback section
+    st.markdown("### 🤔 How's the Quality?")
+    col_feedback1, col_feedback2 = st.columns(2)
+    
+    with col_feedback1:
+        if st.button("👍 Good Quality"):
+            st.session_state["feedback"] = "good"
+        if st.session_state.get("feedback") == "good":
+            st.success("Thanks for the feedback! 🌟")
+    
+    with col_feedback2:
+        if st.button("👎 Try Improving") and not st.session_state.get("improved"):
+            st.info("🔄 Re-decoding the unclear lines with a larger model...")
+            improved = improve(option, result, audio_file)
+            if improved:
+                # A failed attempt stores nothing, so the button can be pressed again
+                st.session_state["improved"] = improved
+    
+    improved = st.session_state.get("improved")
+    if improved:
+        # Display improved results
+        st.markdown("### ✨ Improved Lyrics")
+        improved_lyrics = improved["output"].strip()
+        if improved_lyrics:
+            st.text_area(
+                "📝 Improved Lyrics:",
+                value=improved_lyrics,
+                height=300,
+                help="Unclear lines re-decoded with a larger model"
+            )
+        output, filename, segments = improved["output"], improved["filename"], result_segments(improved)
+    
+    # Download section
+    st.markdown("### 📥 Download Options")
+    col_download1, col_download2 = st.columns(2)
+    
+    with col_download1:
+        create_download_button(output, filename, segments)
+    
+    with col_download2:
+        st.success("✅ Processing completed successfully!")
+
 def main():
     # Header with gradient background
     st.markdown("""
@@ -179,7 +389,7 @@ def main():
         st.markdown("### 🌐 Select Language")
         option = st.selectbox(
             "",
-            ("Choose option", "Hindi", "English", "Bilingual"),
+            ("Choose option", "Auto-detect", "Hindi", "English", "Bilingual"),
             help="Select the primary language of your audio file"
         )
 
@@ -196,19 +406,16 @@ def main():
                 st.markdown("### 🎧 Audio Preview")
                 st.audio(audio_file, format="audio/*")
                 
-                # File info
-                file_size = len(audio_file.read()) / (1024 * 1024)  # MB
-                audio_file.seek(0)  # Reset file pointer
+                # File info (the size is known without reading the upload)
+                file_size = audio_file.size / (1024 * 1024)  # MB
                 st.info(f"📊 File: {audio_file.name} | Size: {file_size:.1f} MB")
                 
                 # Process button with custom styling
                 st.markdown("### 🚀 Start Processing")
                 
                 if st.button("🎵 Transcribe Audio", type="primary", use_container_width=True):
-                    # Save the uploaded audio file
-                    temp_audio_path = "temp_audio." + audio_file.name.split(".")[-1]
-                    with open(temp_audio_path, "wb") as f:
-                        f.write(audio_file.read())
+                    # Saved by content hash; stems and results are cached by content, not filename
+                    audio_path, digest = save_upload(audio_file)
 
                     # Processing started message
                     st.markdown("""
@@ -221,112 +428,23 @@ def main():
                     </div>
                     """, unsafe_allow_html=True)
                     
-                    # Process with initial transcription
-                    def process_transcription(use_gemini=False):
-                        if option == "Hindi":
-                            output = run_backend_script("hindi1.py", temp_audio_path, use_gemini)
-                            filename = "hindi_lyrics"
-                            language_flag = "🇮🇳"
-                        elif option == "English":
-                            output = run_backend_script("main.py", temp_audio_path, use_gemini)
-                            filename = "english_lyrics"
-                            language_flag = "🇺🇸"
-                        elif option == "Bilingual":
-                            output = run_backend_script("bilingual.py", temp_audio_path, use_gemini)
-                            filename = "bilingual_lyrics"
-                            language_flag = "🌏"
-                        return output, filename, language_flag
-
-                    # Initial transcription
-                    output, filename, language_flag = process_transcription()
+                    # Results live in the session, so the buttons below (each one a
+                    # rerun of this script) show them again instead of redoing the job
+                    st.session_state["result"] = transcribe(option, audio_path, digest)
+                    st.session_state["result_for"] = (upload_id(audio_file), option)
+                    st.session_state.pop("improved", None)
+                    st.session_state.pop("feedback", None)
 
-                    # Clean up temporary file
-                    try:
-                        os.remove(temp_audio_path)
-                    except:
-                        pass
-
-                    # Results section
-                    if output:
-                        st.markdown("---")
-                        st.markdown(f"### {language_flag} Transcription Results")
-                        
-                        # Extract clean lyrics for display
-                        lines = output.split('\n')
-                        clean_lyrics = []
-                        for line in lines:
-                            if not any(marker in line for marker in ['[INFO]', '[SUCCESS]', '[ERROR]', 'INFO:spleeter']):
-                                clean_line = line.strip()
-                                if clean_line and not clean_line.startswith('='):
-                                    clean_lyrics.append(clean_line)
-                        
-                        final_lyrics = '\n'.join(clean_lyrics)
-                        
-                        if final_lyrics:
-                            # Display lyrics in a nice container
-                            st.markdown("""
-                            <div style="background: #f8f9fa; padding: 1.5rem; border-radius: 10px; 
-                                        border-left: 4px solid #667eea; margin: 1rem 0;">
-                            """, unsafe_allow_html=True)
-                            
-                            st.text_area(
-                                "📝 Your Lyrics:",
-                                value=final_lyrics,
-                                height=300,
-                                help="Your transcribed lyrics are ready!"
-                            )
-                            
-                            st.markdown("</div>", unsafe_allow_html=True)
-                            
-                            # Feedback section
-                            st.markdown("### 🤔 How's the Quality?")
-                            col_feedback1, col_feedback2 = st.columns(2)
-                            
-                            with col_feedback1:
-                                if st.button("👍 Good Quality"):
-                                    st.success("Thanks for the feedback! 🌟")
-                            
-                            with col_feedback2:
-                                if st.button("👎 Try Improving"):
-                                    st.info("🔄 Retrying with enhanced AI model...")
-                                    output, filename, language_flag = process_transcription(use_gemini=True)
-                                    
-                                    # Display improved results
-                                    if output:
-                                        st.markdown("### ✨ Enhanced Translation")
-                                        lines = output.split('\n')
-                                        clean_lyrics = []
-                                        for line in lines:
-                                            if not any(marker in line for marker in ['[INFO]', '[SUCCESS]', '[ERROR]', 'INFO:spleeter']):
-                                                clean_line = line.strip()
-                                                if clean_line and not clean_line.startswith('='):
-                                                    clean_lyrics.append(clean_line)
-                                        
-                                        improved_lyrics = '\n'.join(clean_lyrics)
-                                        if improved_lyrics:
-                                            st.text_area(
-                                                "📝 Improved Lyrics:",
-                                                value=improved_lyrics,
-                                                height=300,
-                                                help="Enhanced translation using Gemini AI"
-                                            )
-                            
-                            # Download section
-                            st.markdown("### 📥 Download Options")
-                            col_download1, col_download2 = st.columns(2)
-                            
-                            with col_download1:
-                                create_download_button(output, filename)
-                            
-                            with col_download2:
-                                st.success("✅ Processing completed successfully!")
-                                
-                        else:
-                            st.warning("⚠️ No lyrics content found in the output. Please try again.")
-                    else:
-                        st.error("❌ Transcription failed. Please check your audio file and try again.")
+                # Only show results that belong to this upload and language
+                result = st.session_state.get("result")
+                current = st.session_state.get("result_for") == (upload_id(audio_file), option)
+                if current and result is None:
+                    st.error("❌ Transcription failed. Please check your audio file and try again.")
+                elif current:
+                    show_results(option, result, audio_file)
 
     # Footer
+
     st.markdown("---")
     
 